@@ -38,12 +38,31 @@ class Bivariate_te(Network_analysis):
             - 'alpha_*' - critical alpha level for statistical significance,
               where * can be 'max_stats',  'min_stats', and 'omnibus'
               (default=0.05)
+            - 'adaptive_perm' - stop permutation tests early once the
+              p-value's confidence interval is clearly above or below alpha,
+              see the stats module for details (default=False)
+            - 'analytic_null' - test against the asymptotic chi-square null
+              distribution instead of surrogates, requires the 'gaussian' or
+              'discrete' estimator (default=False)
+            - 'surr_cache' - re-use surrogates between rounds of candidate
+              selection, can be 'off', 'exact', 'reuse', or 'refresh', see
+              stats.Surrogate_cache for the statistical semantics
+              (default='exact')
+            - 'n_jobs_candidates' - no. candidates whose surrogates are
+              estimated concurrently, -1 uses all cores (default=1)
+            - 'seed' - seed for all permutations and noise used in the
+              analysis, int or numpy SeedSequence; each target is analysed
+              with an independent random stream (default=None, use numpy's
+              global random state)
             - 'cmi_calc_name' - estimator to be used for CMI calculation
               (For estimator options see the respective documentation.)
             - 'add_conditionals' - force the estimator to add these
               conditionals when estimating TE; can either be a list of
               variables, where each variable is described as (idx process, lag
               wrt to current value) or can be a string: 'faes' for Faes-Method
+            - 'plan_calibration' - no. CMI estimations timed before a network
+              analysis to estimate its run time, 0 skips the calibration
+              (default=10)
 
     Attributes:
         selected_vars_full : list of tuples
@@ -141,6 +160,11 @@ class Bivariate_te(Network_analysis):
             For more details on the estimation of multivariate transfer entropy
             see documentation of class method 'analyse_single_target'.
 
+        Before any target is analysed, all permutation tests are checked for
+        feasibility and the no. CMI estimations and run time of the analysis
+        are estimated and printed (see Network_analysis._plan_analysis()).
+        The plan is kept in attribute 'plan'.
+
         Args:
             data : Data instance
                 raw data for analysis
@@ -168,6 +192,7 @@ class Bivariate_te(Network_analysis):
         assert(len(sources) == len(targets)), ('List of targets and list of '
                                                'sources have to have the same '
                                                'same length')
+        self.plan = self._plan_analysis(data, targets, sources)
 
         # Perform TE estimation for each target individually. FDR-correct
         # overall results.
@@ -251,7 +276,8 @@ class Bivariate_te(Network_analysis):
             'omnibus_pval': self.pvalue_omnibus,
             'omnibus_sign': self.sign_omnibus,
             'cond_sources_pval': self.pvalues_sign_sources,
-            'cond_sources_te': self.te_sign_sources}
+            'cond_sources_te': self.te_sign_sources,
+            'perm_tests': self._perm_tests}
         return results
 
     def _initialise(self, data, sources, target):
@@ -281,6 +307,9 @@ class Bivariate_te(Network_analysis):
         # Check the permutation type and no. permutations requested by the
         # user. This tests if there is sufficient data to do all tests.
         # surrogates.check_permutations(self, data)
+        self._perm_tests = []  # decision rules of all permutation tests
+        self._surr_cache = None  # surrogates are not re-used across targets
+        self._init_random_stream(self.target)
 
         # Reset all attributes to inital values if the instance has been used
         # before.
@@ -305,6 +334,42 @@ class Bivariate_te(Network_analysis):
         except KeyError:
             pass
 
+    def _permutation_tests(self):
+        """Return the no. permutations and alpha level of each test."""
+        return {
+            'omnibus': (self.options.get('n_perm_omnibus', 21),
+                        self.options.get('alpha_omnibus', 0.05)),
+            'max_seq': (self.options.get('n_perm_max_seq', 500),
+                        self.options.get('alpha_max_seq', 0.05))}
+
+    def _plan_candidates(self, target, sources, n_processes):
+        """Return current value, target and source candidates of a target."""
+        if sources == 'all':
+            sources = [s for s in range(n_processes) if s != target]
+        elif type(sources) is int:
+            sources = [sources]
+        current_value = (target, max(self.max_lag_sources,
+                                     self.max_lag_target))
+        target_candidates = self._define_candidates(
+                [target], np.arange(current_value[1] - 1,
+                                    current_value[1] - self.max_lag_target - 1,
+                                    -self.tau_target))
+        source_candidates = self._define_candidates(
+                sources, np.arange(current_value[1] - self.min_lag_sources,
+                                   current_value[1] - self.max_lag_sources,
+                                   -self.tau_sources))
+        return current_value, target_candidates, source_candidates
+
+    def _n_estimations(self, n_target, n_source, n_perm):
+        """Return the min. and max. no. CMI estimations for one target.
+
+        Target and source candidates are tested once using sequential max.
+        statistics, followed by the omnibus test.
+        """
+        n = ((n_target + n_source) * (n_perm['max_seq'] + 1) +
+             n_perm['omnibus'] + 1)
+        return n, n
+
     def _check_source_set(self, sources, n_processes):
         """Set default if no source set was provided by the user."""
         if sources == 'all':
@@ -5,10 +5,15 @@ Created on Mon Mar  7 18:13:27 2016
 @author: patricia
 """
 import copy as cp
+from collections import OrderedDict
 import numpy as np
 from . import idtxl_utils as utils
 
 VERBOSE = True
+# Max. no. bytes read at once when passing over out-of-core data.
+_CHUNK_BYTES = 2 ** 27
+# Default max. no. bytes held in the realisation cache.
+_CACHE_BYTES = 2 ** 28
 
 
 class Data():
@@ -32,14 +37,45 @@ class Data():
         d2 = Data(dat, dim_order='ps')            # 1000 samples
         dat_new = np.arange(5000)
         d2.set_data(dat_new, 's')  # set new data for the existing object
+        d3 = Data('meg.npy', dim_order='psr')  # out-of-core data from file
+        d4 = Data(dat, dim_order='psr', dtype=np.float32)  # single precision
+        d1.append_samples(np.arange(200).reshape((2, 20, 5)))  # new samples
 
     Note:
         Realisations are stored as attribute 'data'. This can't be set
         directly, but only via the method 'set_data'
 
+    Note:
+        Data that are passed as a numpy memmap or as the name of a .npy file
+        are not loaded into memory. Normalisation statistics are computed in
+        a single pass over the file and realisations are normalised when they
+        are retrieved (see get_realisations()). Attribute 'data' then holds the
+        raw, non-normalised values.
+
+    Note:
+        Realisations returned by get_realisations() are cached per variable
+        and sample of the current value, such that realisations are retrieved
+        from the data only once per analysis. The least recently used
+        realisations are removed once the cache exceeds cache_bytes. The cache
+        is cleared when new data are set, see cache_info() for its usage.
+
+    Note:
+        Data held in memory and all realisations are stored with the
+        requested dtype, e.g., np.float32 halves memory usage compared to the
+        default double precision. Normalisation statistics are always computed
+        in double precision.
+
+    Note:
+        Samples or replications can be appended to data held in memory (see
+        append_samples() and append_replications()). Data are stored in
+        growable arrays and stored data are not changed when new data are
+        appended. Normalisation statistics are updated with the moments of the
+        new data and realisations are normalised on retrieval. Cached
+        realisations are extended by the appended data.
+
     Args:
-        data : numpy array [optional]
-            1/2/3-dimensional array with raw data
+        data : numpy array, numpy memmap, or str [optional]
+            1/2/3-dimensional array with raw data or name of a .npy file
         dim_order : string [optional]
             order of dimensions, accepts any combination of the characters
             'p', 's', and 'r' for processes, samples, and replications; must
@@ -48,6 +84,12 @@ class Data():
             (default='psr')
         normalise : bool [optional]
             if True, data gets normalised per process (default=True)
+        cache_bytes : int [optional]
+            max. no. bytes held in the realisation cache, 0 disables the cache
+            (default=2^28)
+        dtype : numpy dtype [optional]
+            floating point type of stored data and returned realisations
+            (default=np.float64)
 
     Attributes:
         data : numpy array
@@ -60,11 +102,25 @@ class Data():
             number of samples in time
         normalise : bool
             if true, all data gets z-standardised per process
+        out_of_core : bool
+            if true, data are memory-mapped and normalised on retrieval
+        dtype : numpy dtype
+            floating point type of stored data and returned realisations
 
     """
 
-    def __init__(self, data=None, dim_order='psr', normalise=True):
+    def __init__(self, data=None, dim_order='psr', normalise=True,
+                 cache_bytes=_CACHE_BYTES, dtype=np.float64):
+        if not np.issubdtype(dtype, np.floating):
+            raise TypeError('dtype must be a floating point type.')
         self.normalise = normalise
+        self.dtype = np.dtype(dtype)
+        self.out_of_core = False
+        self._mean = None
+        self._std = None
+        self._buffer = None
+        self.cache_bytes = cache_bytes
+        self._clear_cache()
         if data is not None:
             self.set_data(data, dim_order)
 
@@ -123,13 +179,16 @@ class Data():
         """Overwrite data in an existing Data object.
 
         Args:
-            data : numpy array
-                1- to 3-dimensional array of realisations
+            data : numpy array, numpy memmap, or str
+                1- to 3-dimensional array of realisations, memmaps and .npy
+                files (given by their name) are not loaded into memory
             dim_order : string
                 order of dimensions, accepts any combination of the characters
                 'p', 's', and 'r' for processes, samples, and replications;
                 must have the same length as number of dimensions in data
         """
+        if type(data) is str:
+            data = np.load(data, mmap_mode='r')
         if len(dim_order) > 3:
             raise RuntimeError('dim_order can not have more than three '
                                'entries')
@@ -149,22 +208,187 @@ class Data():
             delattr(self, 'data')
         except AttributeError:
             pass
-        if self.normalise:
+        self.out_of_core = isinstance(data_ordered, np.memmap)
+        self._mean = None
+        self._std = None
+        self._buffer = None
+        if self.normalise and self.out_of_core:
+            [self._mean, self._std] = self._streaming_statistics(data_ordered)
+            self.data = data_ordered
+        elif self.normalise:
             self.data = self._normalise_data(data_ordered)
-        else:
+        elif self.out_of_core:
             self.data = data_ordered
+        else:
+            self.data = np.asarray(data_ordered, dtype=self.dtype)
+        self._nan_samples = self._find_nans(self.data)
+        self._clear_cache()
 
     def _normalise_data(self, d):
-        """Z-standardise data separately for each process."""
-        d_standardised = np.empty(d.shape)
+        """Z-standardise data separately for each process.
+
+        Keep the mean and standard deviation of the raw data, which are used
+        to normalise appended data, and the moments of the standardised data
+        (no. realisations, mean, sum of squared deviations from the mean).
+        """
+        d_standardised = np.empty(d.shape, dtype=self.dtype)
+        self._raw_mean = np.empty(self.n_processes)
+        self._raw_std = np.empty(self.n_processes)
         for process in range(self.n_processes):
-            s = utils.standardise(
-                            d[process, :, :].reshape(1, self.n_realisations()),
-                            dimension=1)
+            p = np.asarray(d[process, :, :], dtype=float).reshape(
+                                                1, self.n_realisations())
+            s = utils.standardise(p, dimension=1)
             d_standardised[process, :, :] = s.reshape(self.n_samples,
                                                       self.n_replications)
+            self._raw_mean[process] = p.mean()
+            self._raw_std[process] = p.std(ddof=1)
+        n = self.n_realisations()
+        self._moments = [n, np.zeros(self.n_processes),
+                         np.full(self.n_processes, n - 1.0)]
         return d_standardised
 
+    def _streaming_statistics(self, d):
+        """Return mean and standard deviation of each process in one pass.
+
+        Read data in chunks of samples and combine the moments of all chunks,
+        such that data never have to be held in memory as a whole.
+        """
+        chunk = max(1, _CHUNK_BYTES // (d.itemsize * self.n_processes *
+                                        self.n_replications))
+        n = 0
+        mean = np.zeros(self.n_processes)
+        m2 = np.zeros(self.n_processes)
+        for i in range(0, self.n_samples, chunk):
+            c = np.asarray(d[:, i:i + chunk, :],
+                           dtype=float).reshape(self.n_processes, -1)
+            mean_c = c.mean(axis=1)
+            m2_c = ((c - mean_c[:, np.newaxis]) ** 2).sum(axis=1)
+            [n, mean, m2] = _combine_moments(n, mean, m2,
+                                             c.shape[1], mean_c, m2_c)
+        return mean, np.sqrt(m2 / (n - 1))
+
+    def _find_nans(self, d):
+        """Return for each process and sample if any replication is NaN.
+
+        Data are scanned in chunks of samples. For out-of-core data, processes
+        with NaN statistics are NaN as a whole after normalisation.
+        """
+        chunk = max(1, _CHUNK_BYTES // (d.itemsize * self.n_processes *
+                                        self.n_replications))
+        nan_samples = np.empty((self.n_processes, self.n_samples), dtype=bool)
+        for i in range(0, self.n_samples, chunk):
+            nan_samples[:, i:i + chunk] = np.isnan(
+                                            d[:, i:i + chunk, :]).any(axis=2)
+        if self._mean is not None:
+            nan_samples[np.isnan(self._mean) | np.isnan(self._std)] = True
+        return nan_samples
+
+    def append_samples(self, data, dim_order='psr'):
+        """Append samples to the data of all processes and replications.
+
+        Appended data are normalised with the running statistics of all data,
+        existing data are not changed (see class documentation). Realisations
+        of a current value are extended by the new samples.
+
+        Args:
+            data : numpy array
+                1- to 3-dimensional array of new samples with the same number
+                of processes and replications as the existing data
+            dim_order : string [optional]
+                order of dimensions, see set_data() (default='psr')
+        """
+        self._append(data, dim_order, axis=1)
+
+    def append_replications(self, data, dim_order='psr'):
+        """Append replications to the data of all processes.
+
+        Appended data are normalised with the running statistics of all data,
+        existing data are not changed (see class documentation).
+
+        Args:
+            data : numpy array
+                1- to 3-dimensional array of new replications with the same
+                number of processes and samples as the existing data
+            dim_order : string [optional]
+                order of dimensions, see set_data() (default='psr')
+        """
+        self._append(data, dim_order, axis=2)
+
+    def _append(self, data, dim_order, axis):
+        """Append data along the sample (1) or replication (2) axis."""
+        if not hasattr(self, 'data'):
+            raise RuntimeError('There are no data to append to, use set_data '
+                               'first.')
+        if self.out_of_core:
+            raise RuntimeError('Can not append data to out-of-core data.')
+        data = np.asarray(data)
+        if len(dim_order) != data.ndim:
+            raise RuntimeError('Data array dimension ({0}) and length of '
+                               'dim_order ({1}) are not equal.'.format(
+                                           data.ndim, len(dim_order)))
+        data = self._reorder_data(data, dim_order)
+        shape = list(self.data.shape)
+        shape[axis] = data.shape[axis]
+        if list(data.shape) != shape:
+            raise RuntimeError('Appended data have shape {0}, expected {1} '
+                               '(processes x samples x replications).'.format(
+                                                        data.shape, shape))
+
+        # Bring new data into the range of the stored data and update the
+        # running statistics of the stored data with the moments of the new
+        # data (Chan et al., 1979).
+        if self.normalise:
+            data = ((np.asarray(data, dtype=float) -
+                     self._raw_mean[:, np.newaxis, np.newaxis]) /
+                    self._raw_std[:, np.newaxis, np.newaxis])
+            d = data.reshape(self.n_processes, -1)
+            mean_d = d.mean(axis=1)
+            m2_d = ((d - mean_d[:, np.newaxis]) ** 2).sum(axis=1)
+            self._moments = _combine_moments(*self._moments,
+                                             d.shape[1], mean_d, m2_d)
+            self._mean = self._moments[1]
+            self._std = np.sqrt(self._moments[2] / (self._moments[0] - 1))
+
+        [n_samples, n_replications] = [self.n_samples, self.n_replications]
+        shape[axis] += self.data.shape[axis]
+        self._reserve(shape)
+        if axis == 1:
+            self._buffer[:, n_samples:shape[1], :n_replications] = data
+            self._nan_buffer[:, n_samples:shape[1]] = np.isnan(data).any(
+                                                                    axis=2)
+        else:
+            self._buffer[:, :n_samples, n_replications:shape[2]] = data
+            self._nan_buffer[:, :n_samples] |= np.isnan(data).any(axis=2)
+        [self.n_samples, self.n_replications] = shape[1:]
+        self._data = self._buffer[:, :shape[1], :shape[2]]
+        self._nan_samples = self._nan_buffer[:, :shape[1]]
+        if self._mean is not None:
+            self._nan_samples[np.isnan(self._mean) | np.isnan(self._std)] = (
+                                                                        True)
+
+    def _reserve(self, shape):
+        """Grow storage such that it holds data of the given shape.
+
+        Storage grows at least by a factor of two along each axis that is too
+        small, such that repeatedly appending data is linear in the data size.
+        The stored data are copied into the new storage.
+        """
+        if self._buffer is not None and all(
+                [n <= c for (n, c) in zip(shape, self._buffer.shape)]):
+            return
+        capacity = list(shape)
+        for axis in [1, 2]:
+            if shape[axis] > self.data.shape[axis]:
+                capacity[axis] = max(shape[axis], 2 * self.data.shape[axis])
+            if self._buffer is not None:
+                capacity[axis] = max(capacity[axis], self._buffer.shape[axis])
+        buffer = np.empty(capacity, dtype=self.dtype)
+        buffer[:, :self.n_samples, :self.n_replications] = self.data
+        nan_buffer = np.zeros(capacity[:2], dtype=bool)
+        nan_buffer[:, :self.n_samples] = self._nan_samples
+        self._buffer = buffer
+        self._nan_buffer = nan_buffer
+
     def _reorder_data(self, data, dim_order):
         """Reorder data dimensions to processes x samples x replications."""
         # add singletons for missing dimensions
@@ -190,7 +414,7 @@ class Data():
         self.n_samples = data.shape[1]
         self.n_replications = data.shape[2]
 
-    def _get_data(self, idx_list, current_value, shuffle=False):
+    def _get_data(self, idx_list, current_value, shuffle=False, rng=None):
         """Return realisations for a list of indices.
 
         Return realisations for indices in list. Optionally, realisations can
@@ -214,6 +438,9 @@ class Data():
                 form (idx process, idx sample)
             shuffle: bool
                 if true permute blocks of replications over trials
+            rng : numpy Generator, int, or SeedSequence [optional]
+                random number generator or seed used for shuffling, see
+                idtxl_utils.get_rng() (default=None)
 
         Returns:
             numpy array
@@ -223,58 +450,106 @@ class Data():
                 replication index for each realisation with dimensions (no.
                 samples * no.replications) x number of indices
         """
-        # Check if requested indices are smaller than the current_value.
-        if not all(np.array([x[1] for x in idx_list]) <= current_value[1]):
-            print('Index list: {0}\ncurrent value: {1}'.format(idx_list,
-                                                               current_value))
-            raise RuntimeError('All indices for which data is retrieved must '
-                               ' be smaller than the current value.')
-
-        # Allocate memory.
+        [procs, first_samples] = self._check_indices(idx_list, current_value)
         n_real_time = self.n_realisations_samples(current_value)
         n_real_repl = self.n_realisations_repl()
-        realisations = np.empty((n_real_time * n_real_repl, len(idx_list)))
 
         # Shuffle the replication order if requested. This creates surrogate
         # data by permuting replications while keeping the order of samples
         # intact.
         if shuffle:
-            replications_order = np.random.permutation(self.n_replications)
+            replications_order = utils.get_rng(rng).permutation(
+                                                        self.n_replications)
         else:
             replications_order = np.arange(self.n_replications)
 
-        # Retrieve data.
-        i = 0
-        for idx in idx_list:
-            r = 0
-            last_sample = idx[1] - current_value[1]  # indexing is much faster
-            if last_sample == 0:                     # than looping over time!
-                last_sample = None
-            for replication in replications_order:
-                try:
-                    realisations[r:r + n_real_time, i] = self.data[
-                                                        idx[0],
-                                                        idx[1]: last_sample,
-                                                        replication]
-                except IndexError:
-                    raise IndexError('You tried to access variable {0} in a '
-                                     'data set with {1} processes and {2} '
-                                     'samples.'.format(idx, self.n_processes,
-                                                       self.n_samples))
-                r += n_real_time
-
-            assert(not np.isnan(realisations[:, i]).any()), ('There are nans '
-                                                             'in the retrieved'
-                                                             ' realisations.')
-            i += 1
+        # A single realisation from a single replication is a view on the
+        # data. Otherwise, retrieve realisations of all indices and
+        # replications in one gather.
+        if (len(idx_list) == 1 and n_real_repl == 1 and
+                self._mean is None and self.data.dtype == self.dtype):
+            assert(not self._nan_samples[
+                        procs[0],
+                        first_samples[0]:first_samples[0] + n_real_time].any()
+                   ), 'There are nans in the retrieved realisations.'
+            realisations = self.data[procs[0],
+                                     first_samples[0]:
+                                     first_samples[0] + n_real_time, :]
+            realisations = realisations.view(np.ndarray)
+            realisations.flags.writeable = False
+        else:
+            realisations = self._gather(
+                            procs, first_samples, np.arange(n_real_time),
+                            replications_order).reshape(
+                                n_real_time * n_real_repl, len(idx_list))
+            if self._mean is not None:
+                self._normalise_realisations(realisations, procs)
 
         # For each realisation keep the index of the replication it came from.
         replications_index = np.repeat(replications_order, n_real_time)
-        assert(replications_index.shape[0] == realisations.shape[0]), (
-               'There seems to be a problem with the replications index.')
 
         return realisations, replications_index
 
+    def _check_indices(self, idx_list, current_value):
+        """Check indices and return their processes and samples as arrays."""
+        # Processes may be given as single-element lists (e.g., the target of
+        # an analysis).
+        procs = np.array([idx[0] for idx in idx_list], dtype=int).reshape(
+                                                                len(idx_list))
+        first_samples = np.array([idx[1] for idx in idx_list],
+                                 dtype=int).reshape(len(idx_list))
+        # Check if requested indices are smaller than the current_value.
+        if not all(first_samples <= current_value[1]):
+            print('Index list: {0}\ncurrent value: {1}'.format(idx_list,
+                                                               current_value))
+            raise RuntimeError('All indices for which data is retrieved must '
+                               ' be smaller than the current value.')
+        if ((procs >= self.n_processes).any() or (procs < 0).any() or
+                (first_samples < 0).any()):
+            raise IndexError('You tried to access variables {0} in a data set '
+                             'with {1} processes and {2} samples.'.format(
+                                idx_list, self.n_processes, self.n_samples))
+        return procs, first_samples
+
+    def _gather(self, procs, first_samples, offsets, replications):
+        """Return stored realisations of variables in a single gather.
+
+        For each variable, realisations are a lagged slice of a process. NaNs
+        were located once when the data were set.
+
+        Args:
+            procs : numpy array
+                process of each variable
+            first_samples : numpy array
+                first sample of each variable
+            offsets : numpy array
+                samples relative to the first sample of each variable
+            replications : numpy array
+                replications, in the requested order
+
+        Returns:
+            numpy array
+                realisations with dimensions replications x samples x
+                variables
+        """
+        samples = first_samples + offsets[:, np.newaxis]
+        assert(not self._nan_samples[procs, samples].any()), (
+                                'There are nans in the retrieved '
+                                'realisations.')
+        return np.asarray(
+                    self.data[procs, samples,
+                              replications[:, np.newaxis, np.newaxis]],
+                    dtype=self.dtype)
+
+    def _normalise_realisations(self, realisations, procs):
+        """Z-standardise realisations in place with the process statistics.
+
+        Used for out-of-core data and data that had data appended, which are
+        normalised on retrieval.
+        """
+        realisations -= self._mean[procs]
+        realisations /= self._std[procs]
+
     def get_realisations(self, current_value, idx_list):
         """Return all realisations of a random variable in the data.
 
@@ -282,7 +557,17 @@ class Data():
         indices. An index is expected to have the form (process index, sample
         index). The analysis_setup contains information like for example the
         current_value in TE analysis, which are needed to identify variable
-        realisations in the raw data.
+        realisations in the raw data. Out-of-core data are read from file and
+        normalised on retrieval, as are data after new data were appended.
+
+        Realisations of all indices are retrieved in a single gather. The
+        realisations of a single index from data with a single replication
+        are returned as a read-only view on the data. Otherwise, realisations
+        are cached for each index and the sample of the current value (the
+        process of the current value does not change realisations). Cached
+        realisations are extended if samples or replications were appended
+        since. The realisations of a single index are returned as a read-only
+        view on the cache, unless they are normalised on retrieval.
 
         Args:
             current_value : tuple
@@ -302,9 +587,133 @@ class Data():
         """
         if type(idx_list) is not list:
             raise TypeError('idx_realisations must be a list of tuples.')
-        return self._get_data(idx_list, current_value, shuffle=False)
+        if self.cache_bytes == 0 or (len(idx_list) == 1 and
+                                     self.n_replications == 1 and
+                                     self._mean is None):
+            return self._get_data(idx_list, current_value, shuffle=False)
+
+        # Take realisations of each index from the cache. Realisations cached
+        # before data were appended are extended by the new samples or
+        # replications. Realisations of all indices missing from the cache are
+        # retrieved in one gather and added to the cache.
+        [procs, first_samples] = self._check_indices(idx_list, current_value)
+        n_real_time = self.n_realisations_samples(current_value)
+        keys = [(int(current_value[1]), int(p), int(s))
+                for (p, s) in zip(procs, first_samples)]
+        columns = {}
+        missing = OrderedDict()
+        for (i, k) in enumerate(keys):
+            if k in columns or k in missing:
+                continue
+            if k not in self._cache:
+                missing[k] = i
+            elif self._cache[k].shape == (self.n_replications, n_real_time):
+                columns[k] = self._cache_get(k)
+            else:
+                self._cache_extensions += 1
+                columns[k] = self._cache_put(k, self._extend_realisations(
+                                    self._cache[k], procs[i:i + 1],
+                                    first_samples[i:i + 1], n_real_time))
+        if missing:
+            i = list(missing.values())
+            realisations = self._gather(procs[i], first_samples[i],
+                                        np.arange(n_real_time),
+                                        np.arange(self.n_replications))
+            for (j, k) in enumerate(missing):
+                self._cache_misses += 1
+                columns[k] = self._cache_put(k, realisations[:, :, j])
+
+        # Stack realisations of all indices, the realisations of a single index
+        # are a view on the cache.
+        replications_index = np.repeat(np.arange(self.n_replications),
+                                       n_real_time)
+        if len(keys) == 1 and self._mean is None:
+            return columns[keys[0]].reshape(-1, 1), replications_index
+        realisations = np.empty((replications_index.shape[0], len(keys)),
+                                dtype=self.dtype)
+        for (i, k) in enumerate(keys):
+            realisations[:, i] = columns[k].ravel()
+        if self._mean is not None:
+            self._normalise_realisations(realisations, procs)
+        return realisations, replications_index
 
-    def permute_replications(self, current_value, idx_list):
+    def _extend_realisations(self, realisations, proc, first_sample,
+                             n_real_time):
+        """Extend cached realisations of a variable by appended data.
+
+        Cached realisations (replications x samples) are copied, only
+        samples and replications appended after caching are retrieved from
+        the data.
+        """
+        [n_repl_cached, n_time_cached] = realisations.shape
+        extended = np.empty((self.n_replications, n_real_time),
+                            dtype=self.dtype)
+        extended[:n_repl_cached, :n_time_cached] = realisations
+        if n_time_cached < n_real_time:
+            extended[:n_repl_cached, n_time_cached:] = self._gather(
+                            proc, first_sample,
+                            np.arange(n_time_cached, n_real_time),
+                            np.arange(n_repl_cached))[:, :, 0]
+        if n_repl_cached < self.n_replications:
+            extended[n_repl_cached:, :] = self._gather(
+                            proc, first_sample, np.arange(n_real_time),
+                            np.arange(n_repl_cached,
+                                      self.n_replications))[:, :, 0]
+        return extended
+
+    def cache_info(self):
+        """Return usage statistics of the realisation cache.
+
+        Returns:
+            dict
+                no. cache hits ('hits') and misses ('misses') of single
+                variables, no. cached variables extended by appended data
+                ('extensions'), no. cached variables ('n_entries'), and no.
+                bytes held in the cache ('n_bytes') and its limit
+                ('max_bytes')
+        """
+        return {'hits': self._cache_hits,
+                'misses': self._cache_misses,
+                'extensions': self._cache_extensions,
+                'n_entries': len(self._cache),
+                'n_bytes': self._cache_n_bytes,
+                'max_bytes': self.cache_bytes}
+
+    def _clear_cache(self):
+        """Remove all realisations from the cache and reset its statistics."""
+        self._cache = OrderedDict()
+        self._cache_n_bytes = 0
+        self._cache_hits = 0
+        self._cache_misses = 0
+        self._cache_extensions = 0
+
+    def _cache_get(self, key):
+        """Return cached realisations and mark them as recently used."""
+        self._cache.move_to_end(key)
+        self._cache_hits += 1
+        return self._cache[key]
+
+    def _cache_put(self, key, realisations):
+        """Cache realisations of a single variable, return the cached copy.
+
+        Realisations larger than the cache are returned but not cached. The
+        least recently used realisations are removed until the new
+        realisations fit into the cache. Realisations already cached under the
+        same key are replaced.
+        """
+        realisations = np.ascontiguousarray(realisations)
+        realisations.flags.writeable = False
+        if key in self._cache:
+            self._cache_n_bytes -= self._cache.pop(key).nbytes
+        if realisations.nbytes > self.cache_bytes:
+            return realisations
+        while self._cache_n_bytes + realisations.nbytes > self.cache_bytes:
+            self._cache_n_bytes -= self._cache.popitem(last=False)[1].nbytes
+        self._cache[key] = realisations
+        self._cache_n_bytes += realisations.nbytes
+        return realisations
+
+    def permute_replications(self, current_value, idx_list, rng=None):
         """Return realisations with permuted replications (time stays intact).
 
         Create surrogate data by permuting realisations over replications while
@@ -326,6 +735,9 @@ class Data():
                 index of the current_value in the data
             idx_list : list of tuples
                 indices of variables
+            rng : numpy Generator, int, or SeedSequence [optional]
+                random number generator or seed, see idtxl_utils.get_rng()
+                (default=None)
 
         Returns:
             numpy array
@@ -339,9 +751,10 @@ class Data():
         """
         if type(idx_list) is not list:
             raise TypeError('idx needs to be a list of tuples.')
-        return self._get_data(idx_list, current_value, shuffle=True)
+        return self._get_data(idx_list, current_value, shuffle=True, rng=rng)
 
-    def permute_samples(self, current_value, idx_list, perm_range='max'):
+    def permute_samples(self, current_value, idx_list, perm_range='max',
+                        rng=None):
         """Return realisations with permuted samples (repl. stays intact).
 
         Create surrogate data by permuting realisations over samples (time)
@@ -373,6 +786,9 @@ class Data():
                 range over which realisations are permuted, if 'max'
                 realisations are permuted over the whole replication, otherwise
                 realisations are permuted over blocks of length perm_range
+            rng : numpy Generator, int, or SeedSequence [optional]
+                random number generator or seed, see idtxl_utils.get_rng()
+                (default=None)
 
         Returns:
             numpy array
@@ -413,20 +829,21 @@ class Data():
                                             'the requested "perm_range" ({1}).'
                                             .format(n_per_repl, perm_range))
 
+        rng = utils.get_rng(rng)
         # Create a permutation of the data that respects the requested permutation
         # range and can be applied to the realisations from each replication in
         # turn.
         if perm_range == n_per_repl:  # permute all realisations in one replication
-            perm = np.random.permutation(n_per_repl)
+            perm = rng.permutation(n_per_repl)
         else:  # build a permutation that permutes only within the perm_range
             perm = np.empty(n_per_repl, dtype=int)
             remainder = n_per_repl % perm_range
             i = 0
             for p in range(n_per_repl // perm_range):
-                perm[i:i + perm_range] = np.random.permutation(perm_range) + i
+                perm[i:i + perm_range] = rng.permutation(perm_range) + i
                 i += perm_range
             if remainder > 0:
-                perm[-remainder:] = np.random.permutation(remainder) + i
+                perm[-remainder:] = rng.permutation(remainder) + i
 
         # Apply the permutation to data from each replication, individually.
         perm_idx = np.empty(realisations_perm.shape[0])
@@ -484,3 +901,17 @@ class Data():
                               term_2 * x[4, n - 1, r] +
                               np.random.normal())
         self.set_data(x[:, 3:, :], 'psr')
+
+
+def _combine_moments(n_a, mean_a, m2_a, n_b, mean_b, m2_b):
+    """Combine the moments of two sets of samples.
+
+    Return the no. samples, mean, and sum of squared deviations from the mean
+    (M2) of the union of two sets of samples from their individual moments
+    (Chan et al., 1979).
+    """
+    n = n_a + n_b
+    delta = mean_b - mean_a
+    mean = mean_a + delta * n_b / n
+    m2 = m2_a + m2_b + delta ** 2 * n_a * n_b / n
+    return n, mean, m2
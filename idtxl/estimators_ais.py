@@ -4,20 +4,16 @@ This module exports methods for active information storage (AIS) estimation in
 the Estimator_ais class.
 
 """
-from pkg_resources import resource_filename
 import numpy as np
-from . import idtxl_exceptions as ex
-try:
-    import jpype as jp
-except ImportError:
-    ex.jpype_missing('Jpype is not available on this system. To use '
-                     'JAVA/JIDT-powered AIS estimation install it from '
-                     'https://pypi.python.org/pypi/JPype1')
+from . import jidt_calculators as jidt
+from . import estimators_cmi
+from . import estimators_te
 
 
 def is_parallel(estimator_name):
     """Check if estimator can estimate AIS for multiple chunks in parallel."""
-    parallel_estimators = {'jidt_kraskov': False}
+    parallel_estimators = {'discrete': True,
+                           'jidt_kraskov': False}
 
     try:
         return parallel_estimators[estimator_name]
@@ -103,24 +99,93 @@ def jidt_kraskov(self, process, opts):
     local_values = opts.get('local_values', False)
     tau = opts.get('tau', 1)
 
-    # Start JAVA virtual machine
-    jarLocation = resource_filename(__name__, 'infodynamics.jar')
-    if not jp.isJVMStarted():
-        jp.startJVM(jp.getDefaultJVMPath(), '-ea', ('-Djava.class.path=' +
-                                                    jarLocation))
-
-    # Estimate AIS.
-    calcClass = (jp.JPackage('infodynamics.measures.continuous.kraskov').
-                 ActiveInfoStorageCalculatorKraskov)
-    calc = calcClass()
-    calc.setProperty('NORMALISE', normalise)
-    calc.setProperty('k', kraskov_k)
-    calc.setProperty('PROP_KRASKOV_ALG_NUM', str(1))
-    calc.setProperty('NOISE_LEVEL_TO_ADD', noise_level)
-    calc.setProperty('DYN_CORR_EXCL', theiler_t)
-    calc.initialise(history, tau)
-    calc.setObservations(process)
-    if local_values:
-        return np.array(calc.computeLocalOfPreviousObservations())
-    else:
-        return calc.computeAverageLocalOfObservations()
+    # Get a (cached) calculator and estimate AIS.
+    calc = jidt.get_calculator(
+                    'infodynamics.measures.continuous.kraskov',
+                    'ActiveInfoStorageCalculatorKraskov',
+                    properties={'NORMALISE': normalise,
+                                'k': kraskov_k,
+                                'PROP_KRASKOV_ALG_NUM': 1,
+                                'NOISE_LEVEL_TO_ADD': noise_level,
+                                'DYN_CORR_EXCL': theiler_t},
+                    init_args=(history, tau))
+    process = jidt.to_java_double_array(process)
+    with jidt.jvm_timer():
+        calc.setObservations(process)
+        if local_values:
+            return np.array(calc.computeLocalOfPreviousObservations())
+        else:
+            return calc.computeAverageLocalOfObservations()
+
+
+def discrete(self, process, n_chunks=1, opts=None):
+    """Calculate active information storage for discrete variables.
+
+    Calculate active information storage (AIS) for some process using plug-in
+    estimates of the joint probabilities computed in numpy (the same estimator
+    as JIDT's discrete AIS calculator). The past state is a uniform embedding
+    defined by history and tau in the opts dictionary. Multiple AIS values can
+    be estimated in parallel, where each instance is called a 'chunk'. See
+    estimators_cmi.discrete for details.
+
+    References:
+
+    Lizier, Joseph T., Mikhail Prokopenko, and Albert Y. Zomaya. (2012). Local
+    measures of information storage in complex distributed computation.
+    Information Sciences, 208, 39-54.
+
+    This function is meant to be imported into the set_estimator module and
+    used as a method in the Estimator_ais class.
+
+    Args:
+        self : instance of Estimator_ais
+            function is supposed to be used as part of the Estimator_ais class
+        process : numpy array (either of integers or doubles to be discretised)
+            time series realisations of the process, where dimensions are
+            realisations x variable dimension
+        n_chunks : int [optional]
+            number of time series or chunks (default=1)
+        opts : dict
+            sets estimation parameters:
+
+            - 'history' - number of samples in the processes' past to consider
+            - 'tau' - the processes' embedding delay (default=1)
+            - 'num_discrete_bins' - number of discrete bins/levels or the base
+              of each dimension of the discrete variable (default=2)
+            - 'discretise_method' - if and how to discretise incoming
+              continuous variables to discrete values: 'max_ent', 'equal', or
+              'none' (default='none')
+            - 'local_values' - return local AIS instead of average AIS
+              (default=False)
+
+    Returns:
+        numpy array
+            active information storage in bits for each chunk
+        OR
+        numpy array
+            local active information storage for each embedded realisation if
+            local_values is set
+    """
+    if type(opts) is not dict:
+        raise TypeError('Opts should be a dictionary.')
+    try:
+        history = opts['history']
+    except KeyError:
+        raise RuntimeError('No history was provided for AIS estimation.')
+    tau = opts.get('tau', 1)
+    alph = int(opts.get('num_discrete_bins', 2))
+    discretise_method = opts.get('discretise_method', 'none')
+
+    process, alph = estimators_cmi._discrete_codes(process, alph,
+                                                   discretise_method, n_chunks)
+    start = (history - 1) * tau + 1
+    past = estimators_te._embedding(process, n_chunks, start,
+                                    1 + tau * np.arange(history))
+    current_value = estimators_te._embedding(process, n_chunks, start,
+                                             np.zeros(1, int))
+    mi_opts = {'alph1': alph,
+               'alph2': alph,
+               'discretise_method': 'none',
+               'local_values': opts.get('local_values', False)}
+    return estimators_cmi.discrete(self, past, current_value, None, n_chunks,
+                                   mi_opts)
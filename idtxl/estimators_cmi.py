@@ -4,19 +4,15 @@ This module exports methods for conditional mutual information (CMI) estimation
 in the Estimator_cmi class.
 
 """
-from pkg_resources import resource_filename
 import numpy as np
 import math
 from scipy.special import digamma
 from . import neighbour_search_opencl as nsocl
+from . import neighbour_search_cpu as nscpu
+from . import realisation_views as rv
 from . import idtxl_exceptions as ex
+from . import jidt_calculators as jidt
 from . import idtxl_utils as utils
-try:
-    import jpype as jp
-except ImportError:
-    ex.jpype_missing('Jpype is not available on this system. To use '
-                     'JAVA/JIDT-powered CMI estimation install it from '
-                     'https://pypi.python.org/pypi/JPype1')
 
 VERBOSE = False
 
@@ -26,6 +22,9 @@ def is_parallel(estimator_name):
     # To add a new parallel estimator, add estimator name to the following
     # dictionary and set the value to True.
     parallel_estimators = {'opencl_kraskov': True,
+                           'kraskov': True,
+                           'discrete': True,
+                           'gaussian': True,
                            'jidt_kraskov': False,
                            'jidt_discrete': False}
     try:
@@ -35,6 +34,165 @@ def is_parallel(estimator_name):
         return False
 
 
+def kraskov(self, var1, var2, conditional=None, n_chunks=1, opts=None):
+    """Calculate conditional mutual infor using a CPU Kraskov implementation.
+
+    Calculate the conditional mutual information between three variables using
+    a Kraskov type 1 estimator, where neighbour searches are performed on the
+    CPU using KD-trees with maximum norm (scipy.spatial.cKDTree). Multiple CMIs
+    can be estimated in parallel, where each instance is called a 'chunk'. If
+    no conditional is given (is None), the function returns the mutual
+    information between var1 and var2. References:
+
+    Kraskov, A., Stoegbauer, H., & Grassberger, P. (2004). Estimating mutual
+    information. Physical review E, 69(6), 066138.
+
+    This function is ment to be imported into the set_estimator module and used
+    as a method in the Estimator_cmi class.
+
+    Args:
+        self : instance of Estimator_cmi
+            function is supposed to be used as part of the Estimator_cmi class
+        var1 : numpy array
+            realisations of the first random variable, where dimensions are
+            realisations x variable dimension
+        var2: numpy array
+            realisations of the second random variable
+        conditional : numpy array [optional]
+            realisations of the random variable for conditioning, if no
+            conditional is provided, return MI between var1 and var2
+        n_chunks : int [optional]
+            number of data sets or chunks (default=1)
+        opts : dict [optional]
+            sets estimation parameters:
+
+            - 'kraskov_k' - no. nearest neighbours for KNN search (default=4)
+            - 'theiler_t' - no. next temporal neighbours ignored in KNN and
+              range searches (default=0)
+            - 'noise_level' - random noise added to the data (default=1e-8)
+            - 'noise_seed' - seed for the noise added to the data, if None,
+              noise is drawn from numpy's global random state (default=None)
+            - 'num_threads' - no. threads used for neighbour searches, -1
+              uses all cores (default=1)
+
+    Returns:
+        numpy array
+            conditional mutual information for each chunk
+
+    Note:
+        The Theiler window ignores trial boundaries. The CMI estimator does add
+        noise to the data as a default. To make analysis runs replicable set
+        noise_level to 0.
+    """
+    if opts is None:
+        opts = {}
+    elif type(opts) is not dict:
+        raise TypeError('Opts should be a dictionary.')
+
+    # Get defaults for estimator options
+    kraskov_k = int(opts.get('kraskov_k', 4))
+    theiler_t = int(opts.get('theiler_t', 0))
+    noise_level = float(opts.get('noise_level', 1e-8))
+    n_threads = int(opts.get('num_threads', 1))
+    assert type(n_chunks) is int, 'No. chunks must be an int.'
+
+    # Add noise to copies of the data, such that the caller's realisations
+    # are not changed.
+    noise = _noise_generator(opts)
+    var1 = _add_noise(var1, noise_level, noise)
+    var2 = _add_noise(var2, noise_level, noise)
+    signallength = var1.shape[0]
+    assert signallength % n_chunks == 0, (
+        'Signal length {0} can not be divided by no. chunks {1}.'.format(
+                                                    signallength, n_chunks))
+    chunksize = signallength // n_chunks
+
+    # If no conditional is passed, compute and return the MI.
+    if conditional is None:
+        pointset_full_space = rv.hstack((var1, var2), n_chunks)
+        indexes, distances = nscpu.knn_search(pointset_full_space,
+                                              pointset_full_space.shape[1],
+                                              kraskov_k, theiler_t, n_chunks,
+                                              n_threads)
+        radii = distances[-1, :]
+        count_var1 = nscpu.range_search(var1, var1.shape[1], radii,
+                                        theiler_t, n_chunks, n_threads)
+        count_var2 = nscpu.range_search(var2, var2.shape[1], radii,
+                                        theiler_t, n_chunks, n_threads)
+        # Average digamma terms over the realisations of each chunk.
+        local_terms = digamma(count_var1 + 1) + digamma(count_var2 + 1)
+        return (digamma(kraskov_k) + digamma(chunksize) -
+                _chunk_mean(local_terms, n_chunks))
+
+    conditional = _add_noise(conditional, noise_level, noise)
+    pointset_full_space = rv.hstack((var1, var2, conditional), n_chunks)
+    pointset_var1_conditional = rv.hstack((var1, conditional), n_chunks)
+    pointset_var2_conditional = rv.hstack((var2, conditional), n_chunks)
+
+    # Define search radii as the distances to the kth (=last) neighbours in
+    # the full space and count neighbours in the marginal spaces.
+    indexes, distances = nscpu.knn_search(pointset_full_space,
+                                          pointset_full_space.shape[1],
+                                          kraskov_k, theiler_t, n_chunks,
+                                          n_threads)
+    radii = distances[-1, :]
+    count_cond = nscpu.range_search(conditional, conditional.shape[1], radii,
+                                    theiler_t, n_chunks, n_threads)
+    count_var1_cond = nscpu.range_search(pointset_var1_conditional,
+                                         pointset_var1_conditional.shape[1],
+                                         radii, theiler_t, n_chunks, n_threads)
+    count_var2_cond = nscpu.range_search(pointset_var2_conditional,
+                                         pointset_var2_conditional.shape[1],
+                                         radii, theiler_t, n_chunks, n_threads)
+
+    # Return the results, one cmi per chunk of data.
+    local_terms = (digamma(count_cond + 1) - digamma(count_var1_cond + 1) -
+                   digamma(count_var2_cond + 1))
+    return digamma(kraskov_k) + _chunk_mean(local_terms, n_chunks)
+
+
+def _add_noise(var, noise_level, noise=np.random):
+    """Add Gaussian noise to a copy of the realisations.
+
+    Single precision realisations stay in single precision.
+    """
+    if isinstance(var, rv.Broadcast_realisations):
+        return rv.Broadcast_realisations(
+                        _add_noise(var.base, noise_level, noise), var.n_chunks)
+    if isinstance(var, rv.Permuted_realisations):
+        return rv.Permuted_realisations(
+                        _add_noise(var.base, noise_level, noise), var.index)
+    n = noise.normal(scale=noise_level, size=var.shape)
+    if var.dtype == np.float32:
+        n = n.astype(np.float32)
+    return var + n
+
+
+def _float32_with_noise(var, noise_level, noise=np.random):
+    """Return a single precision copy of the realisations with added noise.
+
+    Views on re-used realisations are converted into arrays. Realisations that
+    are already in single precision are not cast again.
+    """
+    var = np.asarray(var, dtype=np.float32)
+    return var + noise.normal(scale=noise_level,
+                              size=var.shape).astype(np.float32)
+
+
+def _noise_generator(opts):
+    """Return the random number generator used for adding noise."""
+    if opts.get('noise_seed') is None:
+        return np.random
+    return np.random.default_rng(opts['noise_seed'])
+
+
+def _chunk_mean(values, n_chunks):
+    """Average values over consecutive, equally sized chunks."""
+    chunksize = values.shape[0] // n_chunks
+    chunk_starts = np.arange(0, values.shape[0], chunksize)
+    return np.add.reduceat(values, chunk_starts) / chunksize
+
+
 def opencl_kraskov(self, var1, var2, conditional=None, n_chunks=1, opts=None):
     """Calculate conditional mutual infor using opencl Kraskov implementation.
 
@@ -67,6 +225,8 @@ def opencl_kraskov(self, var1, var2, conditional=None, n_chunks=1, opts=None):
             - 'theiler_t' - no. next temporal neighbours ignored in KNN and
               range searches (default='ACT', the autocorr. time of the target)
             - 'noise_level' - random noise added to the data (default=1e-8)
+            - 'noise_seed' - seed for the noise added to the data, if None,
+              noise is drawn from numpy's global random state (default=None)
             - 'gpuid' - device ID (default=0)
 
     Returns:
@@ -88,6 +248,7 @@ def opencl_kraskov(self, var1, var2, conditional=None, n_chunks=1, opts=None):
     theiler_t = int(opts.get('theiler_t', 0))  # TODO necessary?
     noise_level = np.float32(opts.get('noise_level', 1e-8))
     gpuid = int(opts.get('gpuid', 0))
+    noise = _noise_generator(opts)
 
     nchunkspergpu = n_chunks  # TODO is there a case where it makes sense to
                               # have these two distinct parameters?
@@ -98,14 +259,13 @@ def opencl_kraskov(self, var1, var2, conditional=None, n_chunks=1, opts=None):
     if conditional is None:
         if VERBOSE:
             print('no conditional variable - falling back to MI estimation')
-        var1 += np.random.normal(scale=noise_level, size=var1.shape)
-        var2 += np.random.normal(scale=noise_level, size=var2.shape)
+        # Pointsets are built in single precision as required by the opencl
+        # neighbour search.
+        var1 = _float32_with_noise(var1, noise_level, noise)
+        var2 = _float32_with_noise(var2, noise_level, noise)
         pointset_full_space = np.hstack((var1, var2))
-        pointset_full_space = pointset_full_space.astype('float32')
         n_dim_full = pointset_full_space.shape[1]
-        var1 = var1.astype('float32')
         n_dim_var1 = var1.shape[1]
-        var2 = var2.astype('float32')
         n_dim_var2 = var2.shape[1]
         signallengthpergpu = pointset_full_space.shape[0]
         assert signallengthpergpu % nchunkspergpu == 0, (
@@ -135,29 +295,28 @@ def opencl_kraskov(self, var1, var2, conditional=None, n_chunks=1, opts=None):
                                              (chunknum + 1) * chunksize] + 1)))
             cmi_array[chunknum] = mi
     else:
-        var1 += np.random.normal(size=var1.shape) * noise_level
-        var2 += np.random.normal(size=var2.shape) * noise_level
-        conditional += np.random.normal(size=conditional.shape) * noise_level
+        # Views on re-used realisations are converted into single precision
+        # arrays, noise is added to copies of the data.
+        var1 = _float32_with_noise(var1, noise_level, noise)
+        var2 = _float32_with_noise(var2, noise_level, noise)
+        conditional = _float32_with_noise(conditional, noise_level, noise)
 
         # Build pointsets (note that we assume that pointsets are given in
-        # IDTxl convention.
+        # IDTxl convention. All pointsets are in single precision as required
+        # by the opencl neighbour search.
         # 1. full space
         pointset_full_space = np.hstack((var1, var2, conditional))
-        pointset_full_space = pointset_full_space.astype('float32')
         n_dim_full = pointset_full_space.shape[1]
         # 2. conditional variable only
-        pointset_conditional = np.array(conditional)
-        pointset_conditional = pointset_conditional.astype('float32')
+        pointset_conditional = conditional
         n_dim_conditional = pointset_conditional.shape[1]
         if VERBOSE:
             print("n_dim_conditional is: {0}".format(n_dim_conditional))
         # 3. pointset variable 1 and conditional
         pointset_var1_conditional = np.hstack((var1, conditional))
-        pointset_var1_conditional = pointset_var1_conditional.astype('float32')
         n_dim_var1_conditional = pointset_var1_conditional.shape[1]
         # 4. pointset variable 2 and conditional
         pointset_var2_conditional = np.hstack((var2, conditional))
-        pointset_var2_conditional = pointset_var2_conditional.astype('float32')
         n_dim_var2_conditional = pointset_var2_conditional.shape[1]
 
         signallengthpergpu = pointset_full_space.shape[0]
@@ -285,31 +444,29 @@ def jidt_kraskov(self, var1, var2, conditional=None, opts=None):
     num_threads = str(opts.get('num_threads', 'USE_ALL'))
     # debug = opts.get('debug', 'false')
 
-    # Start JAVA virtual machine.
-    jarLocation = resource_filename(__name__, 'infodynamics.jar')
-    if not jp.isJVMStarted():
-        jp.startJVM(jp.getDefaultJVMPath(), '-ea', ('-Djava.class.path=' +
-                    jarLocation))
-
-    calcClass = (jp.JPackage('infodynamics.measures.continuous.kraskov').
-                 ConditionalMutualInfoCalculatorMultiVariateKraskov1)
-    calc = calcClass()
-    calc.setProperty('NORMALISE', normalise)
-    calc.setProperty('k', kraskov_k)
-    calc.setProperty('DYN_CORR_EXCL', theiler_t)
-    calc.setProperty('NOISE_LEVEL_TO_ADD', noise_level)
-    calc.setProperty('NUM_THREADS', num_threads)
-    # calc.setDebug(debug)
-
     if conditional is None:
         cond_dim = 0
     else:
         cond_dim = conditional.shape[1]
         assert(conditional.size != 0), 'Conditional Array is empty.'
     assert(var1.shape[0] == var2.shape[0]), 'Unequal number of observations.'
-    calc.initialise(var1.shape[1], var2.shape[1], cond_dim)
-    calc.setObservations(var1, var2, conditional)
-    return calc.computeAverageLocalOfObservations()
+
+    calc = jidt.get_calculator(
+                    'infodynamics.measures.continuous.kraskov',
+                    'ConditionalMutualInfoCalculatorMultiVariateKraskov1',
+                    properties={'NORMALISE': normalise,
+                                'k': kraskov_k,
+                                'DYN_CORR_EXCL': theiler_t,
+                                'NOISE_LEVEL_TO_ADD': noise_level,
+                                'NUM_THREADS': num_threads},
+                    init_args=(var1.shape[1], var2.shape[1], cond_dim))
+    if conditional is not None:
+        conditional = jidt.to_java_double_array(conditional)
+    var1 = jidt.to_java_double_array(var1)
+    var2 = jidt.to_java_double_array(var2)
+    with jidt.jvm_timer():
+        calc.setObservations(var1, var2, conditional)
+        return calc.computeAverageLocalOfObservations()
 
 def jidt_discrete(self, var1, var2, conditional, opts=None):
     """Calculate conditional mutual infor with JIDT's implementation for discrete
@@ -461,33 +618,359 @@ def jidt_discrete(self, var1, var2, conditional, opts=None):
         conditional = utils.combine_discrete_dimensions(conditional, alphc)
 
     # And finally make the CMI calculation:
-    jarLocation = resource_filename(__name__, 'infodynamics.jar')
-    if not jp.isJVMStarted():
-        jp.startJVM(jp.getDefaultJVMPath(), '-ea', ('-Djava.class.path=' +
-                    jarLocation))
     if (alphc > 0):
         # We have a non-trivial conditional, so make a proper conditional MI calculation
-        calcClass = (jp.JPackage('infodynamics.measures.discrete').
-                 ConditionalMutualInformationCalculatorDiscrete)
-        calc = calcClass(int(math.pow(alph1, var1_dimensions)),
-                         int(math.pow(alph2, var2_dimensions)),
-                         int(math.pow(alphc, varc_dimensions)))
-        calc.setDebug(debug)
-        calc.initialise()
-        # Unfortunately no faster way to pass numpy arrays in than this list conversion
-        calc.addObservations(jp.JArray(jp.JInt, 1)(var1.tolist()),
-                         jp.JArray(jp.JInt, 1)(var2.tolist()),
-                         jp.JArray(jp.JInt, 1)(conditional.tolist()))
-        return calc.computeAverageLocalOfObservations()
+        calc = jidt.get_calculator(
+                    'infodynamics.measures.discrete',
+                    'ConditionalMutualInformationCalculatorDiscrete',
+                    constructor_args=(int(math.pow(alph1, var1_dimensions)),
+                                      int(math.pow(alph2, var2_dimensions)),
+                                      int(math.pow(alphc, varc_dimensions))),
+                    debug=debug)
+        observations = (jidt.to_java_int_array(var1),
+                        jidt.to_java_int_array(var2),
+                        jidt.to_java_int_array(conditional))
     else:
         # We have no conditional, so make an MI calculation
-        calcClass = (jp.JPackage('infodynamics.measures.discrete').
-                 MutualInformationCalculatorDiscrete)
-        calc = calcClass(int(max(math.pow(alph1, var1_dimensions),
-                                 math.pow(alph2, var2_dimensions))), 0)
-        calc.setDebug(debug)
-        calc.initialise()
-        # Unfortunately no faster way to pass numpy arrays in than this list conversion
-        calc.addObservations(jp.JArray(jp.JInt, 1)(var1.tolist()),
-                         jp.JArray(jp.JInt, 1)(var2.tolist()))
+        calc = jidt.get_calculator(
+                    'infodynamics.measures.discrete',
+                    'MutualInformationCalculatorDiscrete',
+                    constructor_args=(int(max(math.pow(alph1, var1_dimensions),
+                                              math.pow(alph2, var2_dimensions))),
+                                      0),
+                    debug=debug)
+        observations = (jidt.to_java_int_array(var1),
+                        jidt.to_java_int_array(var2))
+    with jidt.jvm_timer():
+        calc.addObservations(*observations)
         return calc.computeAverageLocalOfObservations()
+
+
+def discrete(self, var1, var2, conditional=None, n_chunks=1, opts=None):
+    """Calculate conditional mutual information for discrete variables.
+
+    Calculate the conditional mutual information between two discrete
+    variables given a third, using plug-in estimates of the joint
+    probabilities (the same estimator as JIDT's discrete calculators, but
+    computed in numpy). Multiple CMIs can be estimated in parallel, where each
+    instance is called a 'chunk': joint states are counted for all chunks at
+    once by a single np.bincount over chunk-offset state indices. If no
+    conditional is given (is None), the function returns the mutual
+    information between var1 and var2.
+
+    This function is ment to be imported into the set_estimator module and used
+    as a method in the Estimator_cmi class.
+
+    Args:
+        self : instance of Estimator_cmi
+            function is supposed to be used as part of the Estimator_cmi class
+        var1 : numpy array (either of integers or doubles to be discretised)
+            realisations of the first random variable.
+            Can be multidimensional (i.e. multivariate) where dimensions of the
+            array are realisations x variable dimension
+        var2 : numpy array (either of integers or doubles to be discretised)
+            realisations of the second random variable
+        conditional : numpy array [optional]
+            realisations of the random variable for conditioning, if no
+            conditional is provided, return MI between var1 and var2
+        n_chunks : int [optional]
+            number of data sets or chunks (default=1)
+        opts : dict [optional]
+            sets estimation parameters:
+
+            - 'num_discrete_bins' - number of discrete bins/levels or the base
+              of each dimension of the discrete variables (default=2 for
+              binary). If this is set, then parameters 'alph1', 'alph2' and
+              'alphc' are all set to this value.
+            - 'alph1' - number of discrete bins/levels for var1 (default=2)
+            - 'alph2' - number of discrete bins/levels for var2 (default=2)
+            - 'alphc' - number of discrete bins/levels for conditional
+              (default=2)
+            - 'discretise_method' - if and how to discretise incoming
+              continuous variables to discrete values: 'max_ent' for maximum
+              entropy binning, 'equal' for equal size bins, 'none' if
+              variables are already discrete (default='none')
+            - 'local_values' - return local CMI instead of average CMI
+              (default=False)
+
+    Returns:
+        numpy array
+            conditional mutual information in bits for each chunk
+        OR
+        numpy array
+            local conditional mutual information for each realisation if
+            local_values is set
+
+    Note:
+        Continuous data are discretised for each chunk separately, re-used
+        realisations (see Estimator.estimate_mult) are discretised once.
+    """
+    if opts is None:
+        opts = {}
+    elif type(opts) is not dict:
+        raise TypeError('Opts should be a dictionary.')
+    alph1 = int(opts.get('alph1', 2))
+    alph2 = int(opts.get('alph2', 2))
+    alphc = int(opts.get('alphc', 2))
+    if 'num_discrete_bins' in opts:
+        alph1 = alph2 = alphc = int(opts['num_discrete_bins'])
+    discretise_method = opts.get('discretise_method', 'none')
+    local_values = opts.get('local_values', False)
+    assert type(n_chunks) is int, 'No. chunks must be an int.'
+    assert var1.shape[0] == var2.shape[0], 'Unequal number of observations.'
+    assert var1.shape[0] % n_chunks == 0, (
+        'Signal length {0} can not be divided by no. chunks {1}.'.format(
+                                                    var1.shape[0], n_chunks))
+    chunksize = var1.shape[0] // n_chunks
+
+    # Collapse variables into one integer state per realisation.
+    codes_1, alph_joint_1 = _discrete_codes(var1, alph1, discretise_method,
+                                            n_chunks)
+    codes_2, alph_joint_2 = _discrete_codes(var2, alph2, discretise_method,
+                                            n_chunks)
+
+    # Count the number of realisations within the same chunk that share the
+    # joint state of each realisation and compute local (C)MI values (the
+    # normalisation of probabilities cancels out).
+    if conditional is None:
+        count_1 = _joint_counts([codes_1], [alph_joint_1], n_chunks)
+        count_2 = _joint_counts([codes_2], [alph_joint_2], n_chunks)
+        count_12 = _joint_counts([codes_1, codes_2],
+                                 [alph_joint_1, alph_joint_2], n_chunks)
+        local_cmi = np.log2(count_12 * chunksize / (count_1 * count_2))
+    else:
+        assert conditional.shape[0] == var1.shape[0], (
+            'Unequal number of observations.')
+        codes_c, alph_joint_c = _discrete_codes(conditional, alphc,
+                                                discretise_method, n_chunks)
+        count_c = _joint_counts([codes_c], [alph_joint_c], n_chunks)
+        count_1c = _joint_counts([codes_1, codes_c],
+                                 [alph_joint_1, alph_joint_c], n_chunks)
+        count_2c = _joint_counts([codes_2, codes_c],
+                                 [alph_joint_2, alph_joint_c], n_chunks)
+        count_12c = _joint_counts([codes_1, codes_2, codes_c],
+                                  [alph_joint_1, alph_joint_2, alph_joint_c],
+                                  n_chunks)
+        local_cmi = np.log2(count_12c * count_c / (count_1c * count_2c))
+
+    if local_values:
+        return local_cmi
+    return _chunk_mean(local_cmi, n_chunks)
+
+
+def _discrete_codes(var, alph, discretise_method, n_chunks):
+    """Combine dimensions of a discrete variable into one state per sample.
+
+    Discretise the variable if requested and return one integer code per
+    realisation and the size of the joint alphabet. Re-used (broadcast) and
+    permuted realisations are coded once and repeated or permuted for all
+    chunks (discretisation does not depend on the order of realisations).
+    """
+    if isinstance(var, rv.Broadcast_realisations):
+        codes, alph_joint = _discrete_codes(var.base, alph, discretise_method,
+                                            1)
+        return np.tile(codes, var.n_chunks), alph_joint
+    if isinstance(var, rv.Permuted_realisations):
+        codes, alph_joint = _discrete_codes(var.base, alph, discretise_method,
+                                            1)
+        return codes[var.index.ravel()], alph_joint
+
+    var = np.asarray(var)
+    if var.ndim == 1:
+        var = np.expand_dims(var, axis=1)
+    if discretise_method == 'none':
+        if not np.issubdtype(var.dtype, np.integer):
+            assert np.array_equal(var, np.round(var)), (
+                'No discretisation requested, but input is not discrete.')
+        var = var.astype(np.int64)
+        assert var.min() >= 0, 'Minimum of input is smaller than 0.'
+        assert var.max() < alph, ('Maximum of input is larger than the '
+                                  'alphabet size - 1.')
+    elif discretise_method in ['equal', 'max_ent']:
+        if discretise_method == 'equal':
+            discretise = utils.discretise
+        else:
+            discretise = utils.discretise_max_ent
+        chunksize = var.shape[0] // n_chunks
+        var = np.vstack([discretise(var[c * chunksize:(c + 1) * chunksize, :],
+                                    alph) for c in range(n_chunks)])
+    else:
+        raise ValueError('Unkown discretisation method.')
+
+    alph_joint = alph ** var.shape[1]
+    if alph_joint <= np.iinfo(np.int64).max:
+        codes = np.ravel_multi_index(var.T, (alph,) * var.shape[1])
+    else:  # too many joint states, re-label the observed states
+        codes = np.unique(var, axis=0, return_inverse=True)[1].ravel()
+        alph_joint = int(codes.max()) + 1
+    return codes.astype(np.int64), alph_joint
+
+
+def _joint_counts(codes, alphabets, n_chunks):
+    """Count realisations in the same chunk sharing each realisation's state.
+
+    The joint state of all variables in codes is combined with the chunk index
+    into a single state index, such that all chunks are counted by one call
+    to np.bincount.
+    """
+    n_samples = codes[0].shape[0]
+    chunk_idx = np.repeat(np.arange(n_chunks, dtype=np.int64),
+                          n_samples // n_chunks)
+    dims = (n_chunks,) + tuple(alphabets)
+    n_states = n_chunks
+    for a in alphabets:
+        n_states *= a  # Python ints do not overflow
+    if n_states <= np.iinfo(np.int64).max:
+        state = np.ravel_multi_index([chunk_idx] + list(codes), dims)
+        if n_states > 4 * n_samples:  # sparse states, re-label for bincount
+            state = np.unique(state, return_inverse=True)[1].ravel()
+    else:
+        state = np.unique(np.column_stack([chunk_idx] + list(codes)), axis=0,
+                          return_inverse=True)[1].ravel()
+    return np.bincount(state)[state]
+
+
+def gaussian(self, var1, var2, conditional=None, n_chunks=1, opts=None):
+    """Calculate conditional mutual information for Gaussian variables.
+
+    Calculate the conditional mutual information between two variables given
+    a third, assuming that all variables are jointly Gaussian (i.e., the
+    dependencies between variables are linear). The CMI is then given in
+    closed form by the log-determinants of the covariance matrices of the
+    variables:
+
+    I(X;Y|Z) = 0.5 * (ln|S_XZ| + ln|S_YZ| - ln|S_XYZ| - ln|S_Z|),
+
+    where S_XZ is the covariance matrix of X and Z, etc. Multiple CMIs can be
+    estimated in parallel, where each instance is called a 'chunk'. The
+    covariance matrices of all chunks are stacked and their log-determinants
+    are computed by batched calls to np.linalg.slogdet. Covariances between
+    re-used (broadcast) realisations are computed only once. If no
+    conditional is given (is None), the function returns the mutual
+    information between var1 and var2.
+
+    References:
+
+    Barnett, L., Barrett, A. B., & Seth, A. K. (2009). Granger causality and
+    transfer entropy are equivalent for Gaussian variables. Physical Review
+    Letters, 103(23), 238701.
+
+    This function is ment to be imported into the set_estimator module and used
+    as a method in the Estimator_cmi class.
+
+    Args:
+        self : instance of Estimator_cmi
+            function is supposed to be used as part of the Estimator_cmi class
+        var1 : numpy array
+            realisations of the first random variable, where dimensions are
+            realisations x variable dimension
+        var2: numpy array
+            realisations of the second random variable
+        conditional : numpy array [optional]
+            realisations of the random variable for conditioning, if no
+            conditional is provided, return MI between var1 and var2
+        n_chunks : int [optional]
+            number of data sets or chunks (default=1)
+        opts : dict [optional]
+            sets estimation parameters, not used by this estimator
+
+    Returns:
+        numpy array
+            conditional mutual information in nats for each chunk
+
+    Note:
+        Covariance matrices have to be non-singular, CMI for data with
+        linearly dependent dimensions is not defined (returns nan or inf).
+    """
+    if opts is not None and type(opts) is not dict:
+        raise TypeError('Opts should be a dictionary.')
+    assert type(n_chunks) is int, 'No. chunks must be an int.'
+    variables = [var1, var2]
+    if conditional is not None:
+        variables.append(conditional)
+    cov, idx = _chunk_covariance(variables, n_chunks)
+
+    if conditional is None:
+        return 0.5 * (_logdet(cov, idx[0]) + _logdet(cov, idx[1]) -
+                      _logdet(cov, idx[0] + idx[1]))
+    return 0.5 * (_logdet(cov, idx[0] + idx[2]) +
+                  _logdet(cov, idx[1] + idx[2]) -
+                  _logdet(cov, idx[0] + idx[1] + idx[2]) -
+                  _logdet(cov, idx[2]))
+
+
+def _chunk_covariance(variables, n_chunks):
+    """Return the joint covariance matrix of variables for each chunk.
+
+    Args:
+        variables : list of numpy arrays or views
+            realisations of each variable, where dimensions are realisations
+            x variable dimension, chunks are stacked along the first axis
+        n_chunks : int
+            number of chunks
+
+    Returns:
+        numpy array
+            covariance matrices with dimensions n_chunks x dim x dim, where
+            dim is the sum of all variable dimensions
+        list of lists
+            indices of each variable's dimensions in the covariance matrices
+    """
+    centred = []
+    perm_idx = []
+    idx = []
+    n_dim = 0
+    for var in variables:
+        perm_idx.append(None)
+        if isinstance(var, (rv.Broadcast_realisations,
+                            rv.Permuted_realisations)):
+            assert var.n_chunks == n_chunks, 'No. chunks does not match data.'
+            if isinstance(var, rv.Permuted_realisations):
+                perm_idx[-1] = var.index
+            var = var.base.astype(float, copy=False)
+        else:
+            var = np.asarray(var, dtype=float)
+            if var.ndim == 1:
+                var = np.expand_dims(var, axis=1)
+            assert var.shape[0] % n_chunks == 0, (
+                'Signal length {0} can not be divided by no. chunks {1}.'
+                .format(var.shape[0], n_chunks))
+            var = var.reshape(n_chunks, -1, var.shape[1])
+        centred.append(var - var.mean(axis=-2, keepdims=True))
+        idx.append(list(range(n_dim, n_dim + var.shape[-1])))
+        n_dim += var.shape[-1]
+    chunksize = centred[0].shape[-2]
+    for c in centred:
+        assert c.shape[-2] == chunksize, 'Unequal number of observations.'
+
+    def chunk(i, c):
+        if perm_idx[i] is not None:
+            return centred[i][perm_idx[i][c], :]
+        elif centred[i].ndim == 2:
+            return centred[i]
+        return centred[i][c]
+
+    cov = np.empty((n_chunks, n_dim, n_dim))
+    for i in range(len(centred)):
+        for j in range(i, len(centred)):
+            # Covariances between broadcast variables and of a permuted
+            # variable with itself are computed once and are the same for all
+            # chunks. Covariances involving permuted variables are computed
+            # chunk by chunk to avoid creating all permutations at once.
+            if i != j and (perm_idx[i] is not None or
+                           perm_idx[j] is not None):
+                block = np.empty((n_chunks, len(idx[i]), len(idx[j])))
+                for c in range(n_chunks):
+                    block[c] = np.dot(chunk(i, c).T, chunk(j, c))
+            else:
+                block = np.matmul(np.swapaxes(centred[i], -1, -2), centred[j])
+            cov[:, idx[i][0]:idx[i][-1] + 1, idx[j][0]:idx[j][-1] + 1] = block
+            cov[:, idx[j][0]:idx[j][-1] + 1, idx[i][0]:idx[i][-1] + 1] = (
+                                            np.swapaxes(block, -1, -2))
+    return cov / (chunksize - 1), idx
+
+
+def _logdet(cov, idx):
+    """Return log-determinants of sub-matrices of stacked covariances."""
+    idx = np.array(idx)
+    return np.linalg.slogdet(cov[:, idx[:, np.newaxis], idx])[1]
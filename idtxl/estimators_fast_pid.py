@@ -5,6 +5,7 @@ decomposition (PID) estimator for discrete data. The estimator does not require
 JAVA or GPU modules to run.
 """
 import numpy as np
+from . import idtxl_utils as utils
 
 def pid(s1, s2, t, cfg):
     """Fast implementation of the PID estimator."""
@@ -44,6 +45,7 @@ def pid(s1, s2, t, cfg):
     except KeyError:
         print('"max_iters" is missing from the cfg dictionary.')
         raise
+    rng = utils.get_rng(cfg.get('seed'))  # optional seed for random swaps
 
     # -- DEFINE PARAMETERS -- #
 
@@ -117,15 +119,15 @@ def pid(s1, s2, t, cfg):
         for attempt_swap in range(0, max_iters):
 
             # Pick a random candidate from the targets
-            t_cand = np.random.randint(0, alph_t)
-            s1_cand = np.random.randint(0, alph_s1)
-            s2_cand = np.random.randint(0, alph_s2)
+            t_cand = rng.integers(0, alph_t)
+            s1_cand = rng.integers(0, alph_s1)
+            s2_cand = rng.integers(0, alph_s2)
 
             # Pick a swap candidate
-            s1_prim = np.random.randint(0, alph_s1-1)
+            s1_prim = rng.integers(0, alph_s1-1)
             if (s1_prim >= s1_cand):
                 s1_prim += 1
-            s2_prim = np.random.randint(0, alph_s2-1)
+            s2_prim = rng.integers(0, alph_s2-1)
             if (s2_prim >= s2_cand):
                 s2_prim += 1
 
@@ -1,5 +1,6 @@
 import sys
 import numpy as np
+from . import idtxl_utils as utils
 
 def pid(s1, s2, t, cfg):
     """Provide a fast implementation of the PDI estimator for discrete data.
@@ -53,6 +54,7 @@ the unique information from sources 1 and 2.
     except KeyError:
         print('"max_iters" is missing from the cfg dictionary.')
         raise
+    rng = utils.get_rng(cfg.get('seed'))  # optional seed for random swaps
     
     # -- DEFINE PARAMETERS -- #
 
@@ -163,15 +165,15 @@ the unique information from sources 1 and 2.
         # SWAP LOOP
         for attempt_swap in range(0, max_iters):
             # Pick a random candidate from the targets
-            t_cand = np.random.randint(0, alph_t)
-            s1_cand = np.random.randint(0, alph_s1)
-            s2_cand = np.random.randint(0, alph_s2)
+            t_cand = rng.integers(0, alph_t)
+            s1_cand = rng.integers(0, alph_s1)
+            s2_cand = rng.integers(0, alph_s2)
 
             # Pick a swap candidate
-            s1_prim = np.random.randint(0, alph_s1-1)
+            s1_prim = rng.integers(0, alph_s1-1)
             if (s1_prim >= s1_cand):
                 s1_prim += 1
-            s2_prim = np.random.randint(0, alph_s2-1)
+            s2_prim = rng.integers(0, alph_s2-1)
             if (s2_prim >= s2_cand):
                 s2_prim += 1
 
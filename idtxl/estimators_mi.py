@@ -3,25 +3,21 @@
 This module exports methods for mutual information (MI) estimation
 in the Estimator_mi class.
 """
-from pkg_resources import resource_filename
 import numpy as np
 import math
 from scipy.special import digamma
 from . import neighbour_search_opencl as nsocl
-from . import idtxl_exceptions as ex
+from . import estimators_cmi
+from . import jidt_calculators as jidt
 from . import idtxl_utils as utils
 
-try:
-    import jpype as jp
-except ImportError:
-    ex.jpype_missing('Jpype is not available on this system. To use '
-                     'JAVA/JIDT-powered MI estimation install it from '
-                     'https://pypi.python.org/pypi/JPype1')
-
 
 def is_parallel(estimator_name):
     """Check if estimator can estimate CMI for multiple chunks in parallel."""
     parallel_estimators = {'opencl_kraskov': True,
+                           'kraskov': True,
+                           'discrete': True,
+                           'gaussian': True,
                            'jidt_kraskov': False,
                            'jidt_discrete': False}
     try:
@@ -61,6 +57,8 @@ def opencl_kraskov(self, var1, var2, n_chunks=1, opts=None):
             - 'theiler_t' - no. next temporal neighbours ignored in KNN and
               range searches (default='ACT', the autocorr. time of the target)
             - 'noise_level' - random noise added to the data (default=1e-8)
+            - 'noise_seed' - seed for the noise added to the data, if None,
+              noise is drawn from numpy's global random state (default=None)
             - 'gpuid' - ID of the GPU device to be used (default=0)
 
     Returns:
@@ -84,19 +82,18 @@ def opencl_kraskov(self, var1, var2, n_chunks=1, opts=None):
     gpuid = int(opts.get('gpuid', 0))
     nchunkspergpu = n_chunks
 
-    # Add random noise.
-    var1 += np.random.normal(scale=noise_level, size=var1.shape)
-    var2 += np.random.normal(scale=noise_level, size=var2.shape)
+    # Add random noise to single precision copies of the data (as required by
+    # the opencl neighbour search), views on re-used realisations are
+    # converted into arrays.
+    noise = estimators_cmi._noise_generator(opts)
+    var1 = estimators_cmi._float32_with_noise(var1, noise_level, noise)
+    var2 = estimators_cmi._float32_with_noise(var2, noise_level, noise)
 
     # build pointsets - Note we assume that pointsets are given in IDTxl conv.
-    # also cast to single precision as required by opencl neighbour search
     # 1. full space
     pointset_full_space = np.hstack((var1, var2))
-    pointset_full_space = pointset_full_space.astype('float32')
     n_dim_full = pointset_full_space.shape[1]
-    var1 = var1.astype('float32')
     n_dim_var1 = var1.shape[1]
-    var2 = var2.astype('float32')
     n_dim_var2 = var2.shape[1]
 
     signallengthpergpu = pointset_full_space.shape[0]
@@ -128,6 +125,122 @@ def opencl_kraskov(self, var1, var2, n_chunks=1, opts=None):
     return mi_array
 
 
+def kraskov(self, var1, var2, n_chunks=1, opts=None):
+    """Calculate mutual information using a CPU Kraskov implementation.
+
+    Calculate the mutual information between two variables using a Kraskov
+    type 1 estimator, where neighbour searches are performed on the CPU using
+    KD-trees with maximum norm. Multiple MIs can be estimated in parallel,
+    where each instance is called a 'chunk'. See estimators_cmi.kraskov for
+    details. References:
+
+    Kraskov, A., Stoegbauer, H., & Grassberger, P. (2004). Estimating mutual
+    information. Physical review E, 69(6), 066138.
+
+    This function is ment to be imported into the set_estimator module and used
+    as a method in the Estimator_mi class.
+
+    Args:
+        self : instance of Estimator_mi
+            function is supposed to be used as part of the Estimator_mi class
+        var1 : numpy array
+            realisations of the first random variable, where dimensions are
+            realisations x variable dimension
+        var2 : numpy array
+            realisations of the second random variable
+        n_chunks : int [optional]
+            number of data sets or chunks (default=1)
+        opts : dict [optional]
+            sets estimation parameters:
+
+            - 'kraskov_k' - no. nearest neighbours for KNN search (default=4)
+            - 'theiler_t' - no. next temporal neighbours ignored in KNN and
+              range searches (default=0)
+            - 'noise_level' - random noise added to the data (default=1e-8)
+
+    Returns:
+        numpy array
+            mutual information for each chunk
+    """
+    return estimators_cmi.kraskov(self, var1, var2, conditional=None,
+                                  n_chunks=n_chunks, opts=opts)
+
+
+def discrete(self, var1, var2, n_chunks=1, opts=None):
+    """Calculate mutual information for discrete variables.
+
+    Calculate the mutual information between two discrete variables using
+    plug-in estimates of the joint probabilities computed in numpy. Multiple
+    MIs can be estimated in parallel, where each instance is called a
+    'chunk'. See estimators_cmi.discrete for details.
+
+    This function is ment to be imported into the set_estimator module and used
+    as a method in the Estimator_mi class.
+
+    Args:
+        self : instance of Estimator_mi
+            function is supposed to be used as part of the Estimator_mi class
+        var1 : numpy array (either of integers or doubles to be discretised)
+            realisations of the first random variable, where dimensions are
+            realisations x variable dimension
+        var2 : numpy array (either of integers or doubles to be discretised)
+            realisations of the second random variable
+        n_chunks : int [optional]
+            number of data sets or chunks (default=1)
+        opts : dict [optional]
+            sets estimation parameters:
+
+            - 'num_discrete_bins' - number of discrete bins/levels or the base
+              of each dimension of the discrete variables (default=2)
+            - 'alph1' - number of discrete bins/levels for var1 (default=2)
+            - 'alph2' - number of discrete bins/levels for var2 (default=2)
+            - 'discretise_method' - if and how to discretise incoming
+              continuous variables to discrete values: 'max_ent', 'equal', or
+              'none' (default='none')
+            - 'local_values' - return local MI instead of average MI
+              (default=False)
+
+    Returns:
+        numpy array
+            mutual information in bits for each chunk (or local MI if
+            local_values is set)
+    """
+    return estimators_cmi.discrete(self, var1, var2, conditional=None,
+                                   n_chunks=n_chunks, opts=opts)
+
+
+def gaussian(self, var1, var2, n_chunks=1, opts=None):
+    """Calculate mutual information for Gaussian variables.
+
+    Calculate the mutual information between two variables, assuming that
+    the variables are jointly Gaussian, from the log-determinants of their
+    covariance matrices. Multiple MIs can be estimated in parallel, where each
+    instance is called a 'chunk'. See estimators_cmi.gaussian for details.
+
+    This function is ment to be imported into the set_estimator module and used
+    as a method in the Estimator_mi class.
+
+    Args:
+        self : instance of Estimator_mi
+            function is supposed to be used as part of the Estimator_mi class
+        var1 : numpy array
+            realisations of the first random variable, where dimensions are
+            realisations x variable dimension
+        var2 : numpy array
+            realisations of the second random variable
+        n_chunks : int [optional]
+            number of data sets or chunks (default=1)
+        opts : dict [optional]
+            sets estimation parameters, not used by this estimator
+
+    Returns:
+        numpy array
+            mutual information in nats for each chunk
+    """
+    return estimators_cmi.gaussian(self, var1, var2, conditional=None,
+                                   n_chunks=n_chunks, opts=opts)
+
+
 def jidt_kraskov(self, var1, var2, opts=None):
     """Calculate mutual information with JIDT's Kraskov implementation.
 
@@ -189,24 +302,23 @@ def jidt_kraskov(self, var1, var2, opts=None):
     local_values = opts.get('local_values', False)
     num_threads = str(opts.get('num_threads', 'USE_ALL'))
 
-    jarLocation = resource_filename(__name__, 'infodynamics.jar')
-    if not jp.isJVMStarted():
-        jp.startJVM(jp.getDefaultJVMPath(), '-ea', ('-Djava.class.path=' +
-                    jarLocation))
-    calcClass = (jp.JPackage('infodynamics.measures.continuous.kraskov').
-                 MutualInfoCalculatorMultiVariateKraskov1)
-    calc = calcClass()
-    calc.setProperty('NORMALISE', normalise)
-    calc.setProperty('k', kraskov_k)
-    calc.setProperty('NOISE_LEVEL_TO_ADD', noise_level)
-    calc.setProperty('DYN_CORR_EXCL', theiler_t)
-    calc.setProperty('NUM_THREADS', num_threads)
-    calc.initialise(var1.shape[1], var2.shape[1])
-    calc.setObservations(var1, var2)
-    if local_values:
-        return np.array(calc.computeLocalOfPreviousObservations())
-    else:
-        return calc.computeAverageLocalOfObservations()
+    calc = jidt.get_calculator(
+                    'infodynamics.measures.continuous.kraskov',
+                    'MutualInfoCalculatorMultiVariateKraskov1',
+                    properties={'NORMALISE': normalise,
+                                'k': kraskov_k,
+                                'NOISE_LEVEL_TO_ADD': noise_level,
+                                'DYN_CORR_EXCL': theiler_t,
+                                'NUM_THREADS': num_threads},
+                    init_args=(var1.shape[1], var2.shape[1]))
+    var1 = jidt.to_java_double_array(var1)
+    var2 = jidt.to_java_double_array(var2)
+    with jidt.jvm_timer():
+        calc.setObservations(var1, var2)
+        if local_values:
+            return np.array(calc.computeLocalOfPreviousObservations())
+        else:
+            return calc.computeAverageLocalOfObservations()
 
 
 def jidt_discrete(self, var1, var2, opts=None):
@@ -305,16 +417,12 @@ def jidt_discrete(self, var1, var2, opts=None):
     var2 = utils.combine_discrete_dimensions(var2, num_discrete_bins)
 
     # And finally make the MI calculation:
-    jarLocation = resource_filename(__name__, 'infodynamics.jar')
-    if not jp.isJVMStarted():
-        jp.startJVM(jp.getDefaultJVMPath(), '-ea', ('-Djava.class.path=' +
-                    jarLocation))
-    calcClass = (jp.JPackage('infodynamics.measures.discrete').
-                 MutualInformationCalculatorDiscrete)
-    calc = calcClass(max_base, time_diff)
-    calc.setDebug(debug)
-    calc.initialise()
-    # Unfortunately no faster way to pass numpy arrays in than this list conversion
-    calc.addObservations(jp.JArray(jp.JInt, 1)(var1.tolist()),
-                         jp.JArray(jp.JInt, 1)(var2.tolist()))
-    return calc.computeAverageLocalOfObservations()
+    calc = jidt.get_calculator('infodynamics.measures.discrete',
+                               'MutualInformationCalculatorDiscrete',
+                               constructor_args=(max_base, time_diff),
+                               debug=debug)
+    var1 = jidt.to_java_int_array(var1)
+    var2 = jidt.to_java_int_array(var2)
+    with jidt.jvm_timer():
+        calc.addObservations(var1, var2)
+        return calc.computeAverageLocalOfObservations()
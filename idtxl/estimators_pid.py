@@ -61,6 +61,8 @@ Frankfurt, Germany, 2016
 import sys
 import numpy as np
 from . import idtxl_exceptions as ex
+from . import idtxl_utils as utils
+from . import jidt_calculators as jidt
 try:
     import jpype as jp
 except ImportError:
@@ -86,7 +88,9 @@ def pid(s1_o, s2_o, target_o, cfg):
         cfg (dict): dictionary with estimation parameters, must contain
             values for 'alphabetsize' (no. values in each variable s1, s2,
             target), 'jarpath' (string with path to JIDT jar file),
-            'iterations' (no. iterations of the estimator)
+            'iterations' (no. iterations of the estimator), optionally
+            'seed' (seed for the random swaps, int or numpy SeedSequence,
+            default=None)
 
     Returns:
         est (dict): estimated decomposition, contains: MI/CMI values computed
@@ -142,6 +146,8 @@ def pid(s1_o, s2_o, target_o, cfg):
         print('"iterations" is missing from the cfg dictionary.')
         raise
 
+    rng = utils.get_rng(cfg.get('seed'))
+
     if not jp.isJVMStarted():
         jp.startJVM(jp.getDefaultJVMPath(),
                     '-ea', '-Djava.class.path=' + jarpath, "-Xmx3000M")
@@ -149,10 +155,9 @@ def pid(s1_o, s2_o, target_o, cfg):
 
     # transform variables as far as possible outside the loops below
     # (note: only these variables should change when executing the loop)
-    target_jA = jp.JArray(jp.JInt, target.ndim)(target.tolist())
-    s2_jA = jp.JArray(jp.JInt, s2.ndim)(s2.tolist())
-    s1_list = s1.tolist()
-    s1_dim = s1.ndim
+    target_jA = jidt.to_java_int_array(target)
+    s2_jA = jidt.to_java_int_array(s2)
+    s1_list = np.array(s1, dtype=np.int32)
 
     Cmi_calc_class = (jp.JPackage('infodynamics.measures.discrete')
                       .ConditionalMutualInformationCalculatorDiscrete)
@@ -214,9 +219,9 @@ def pid(s1_o, s2_o, target_o, cfg):
         # swapping: pick sample at random, find all other samples that
         # are potential matches (have the same value in target), pick one of
         # the matches for the actual swap
-        swap_1 = np.random.randint(n)
+        swap_1 = rng.integers(n)
         swap_candidates = np.where(target == target[swap_1])[0]
-        swap_2 = np.random.choice(swap_candidates)
+        swap_2 = rng.choice(swap_candidates)
 
         # swap value in s1 and index to keep track
         s1_new_list[swap_1], s1_new_list[swap_2] = (s1_new_list[swap_2],
@@ -228,7 +233,6 @@ def pid(s1_o, s2_o, target_o, cfg):
         cmi_new = _calculate_cmi_from_jA_list(cmi_calc_target_s1_cond_s2,
                                               target_jA,
                                               s1_new_list,
-                                              s1_dim,
                                               s2_jA)
 
         if (np.less_equal(cmi_new, cmi_q_target_s1_cond_s2_all[i - 1])):
@@ -242,7 +246,7 @@ def pid(s1_o, s2_o, target_o, cfg):
 
     print('Unsuccessful swaps: {0}'.format(unsuccessful))
     # convert the final s1 back to an array
-    s1_final = np.asarray(s1_new_list, dtype=np.int)
+    s1_final = np.asarray(s1_new_list, dtype=int)
     # estimate unq/syn/shd information
     jointmi_q_s1s2_target = _calculate_jointmi(
                                             jointmi_calc, s1_final, s2, target)
@@ -305,33 +309,32 @@ def _calculate_cmi(cmi_calc, var_1, var_2, cond):
         double: conditional mutual information between var_1 and var_2
             conditional on cond
     """
-    var_1_java = jp.JArray(jp.JInt, var_1.ndim)(var_1.tolist())
-    var_2_java = jp.JArray(jp.JInt, var_2.ndim)(var_2.tolist())
-    cond_java = jp.JArray(jp.JInt, cond.ndim)(cond.tolist())
+    var_1_java = jidt.to_java_int_array(var_1)
+    var_2_java = jidt.to_java_int_array(var_2)
+    cond_java = jidt.to_java_int_array(cond)
     cmi_calc.initialise()
     cmi_calc.addObservations(var_1_java, var_2_java, cond_java)
     cmi = cmi_calc.computeAverageLocalOfObservations()
     return cmi
 
-def _calculate_cmi_from_jA_list(cmi_calc, var_1_java, var_2_list, var_2_ndim,
-                                cond_java):
+def _calculate_cmi_from_jA_list(cmi_calc, var_1_java, var_2, cond_java):
     """Calculate conditional MI from three variables usind JIDT.
 
     Args:
         cmi_calc (JIDT calculator object): JIDT calculator for conditio-
             nal mutual information
-        var_1, var_2 (1D numpy array): realizations of two discrete
-            random variables
-        cond (1D numpy array): realizations of a discrete random
-            variable for conditioning
+        var_1_java (JArray of JInt): realizations of a discrete random
+            variable, already converted into a Java array
+        var_2 (1D numpy array): realizations of a discrete random
+            variable
+        cond_java (JArray of JInt): realizations of a discrete random
+            variable for conditioning, already converted into a Java array
 
     Returns:
         double: conditional mutual information between var_1 and var_2
             conditional on cond
     """
-#    var_1_java = jp.JArray(jp.JInt, var_1.ndim)(var_1.tolist())
-    var_2_java = jp.JArray(jp.JInt, var_2_ndim)(var_2_list)
-#    cond_java = jp.JArray(jp.JInt, cond.ndim)(cond.tolist())
+    var_2_java = jidt.to_java_int_array(var_2)
     cmi_calc.initialise()
     cmi_calc.addObservations(var_1_java, var_2_java, cond_java)
     cmi = cmi_calc.computeAverageLocalOfObservations()
@@ -351,8 +354,8 @@ def _calculate_mi(mi_calc, var_1, var_2):
         double: mutual information between input variables
     """
     mi_calc.initialise()
-    mi_calc.addObservations(jp.JArray(jp.JInt, var_1.ndim)(var_1.tolist()),
-                            jp.JArray(jp.JInt, var_2.ndim)(var_2.tolist()))
+    mi_calc.addObservations(jidt.to_java_int_array(var_1),
+                            jidt.to_java_int_array(var_2))
     mi = mi_calc.computeAverageLocalOfObservations()
     return mi
 
@@ -371,12 +374,13 @@ def _calculate_jointmi(jointmi_calc, s1, s2, target):
     """
     mUtils = jp.JPackage('infodynamics.utils').MatrixUtils
     # speed critical line ?
-    s12 = mUtils.computeCombinedValues(jp.JArray(jp.JInt, 2)(np.column_stack((s1, s2)).tolist()), 2)
+    s12 = mUtils.computeCombinedValues(
+                    jidt.to_java_int_array(np.column_stack((s1, s2))), 2)
 #    [s12, alph_joined] = _join_variables(s1, s2, 2, 2)
     jointmi_calc.initialise()
 #    jointmi_calc.addObservations(jp.JArray(jp.JInt, s12.T.ndim)(s12.T.tolist()),
 #                                 jp.JArray(jp.JInt, target.ndim)(target.tolist()))
-    jointmi_calc.addObservations(s12,jp.JArray(jp.JInt, target.ndim)(target.tolist()))
+    jointmi_calc.addObservations(s12, jidt.to_java_int_array(target))
 
     jointmi = jointmi_calc.computeAverageLocalOfObservations()
     return jointmi
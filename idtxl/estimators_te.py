@@ -4,22 +4,18 @@ This module exports methods for transfer entropy (TE) estimation in the
 Estimator_te class.
 
 """
-from pkg_resources import resource_filename
 import math
 import numpy as np
-from . import idtxl_exceptions as ex
 from . import idtxl_utils as utils
-try:
-    import jpype as jp
-except ImportError:
-    ex.jpype_missing('Jpype is not available on this system. To use '
-                     'JAVA/JIDT-powered TE estimation install it from '
-                     'https://pypi.python.org/pypi/JPype1')
+from . import estimators_cmi
+from . import jidt_calculators as jidt
 
 
 def is_parallel(estimator_name):
     """Check if estimator can estimate CMI for multiple chunks in parallel."""
     parallel_estimators = {'opencl_kraskov': True,
+                           'discrete': True,
+                           'gaussian': True,
                            'jidt_kraskov': False,
                            'jidt_discrete': False}
     try:
@@ -119,29 +115,26 @@ def jidt_kraskov(self, source, target, opts):
     noise_level = str(opts.get('noise_level', 1e-8))
     local_values = opts.get('local_values', False)
 
-    # Start JAVA virtual machine.
-    jarLocation = resource_filename(__name__, 'infodynamics.jar')
-    if not jp.isJVMStarted():
-        jp.startJVM(jp.getDefaultJVMPath(), '-ea', ('-Djava.class.path=' +
-                                                    jarLocation))
-    # Estimate TE.
-    calcClass = (jp.JPackage('infodynamics.measures.continuous.kraskov').
-                 TransferEntropyCalculatorKraskov)
-    calc = calcClass()
-    calc.setDebug(debug)
-    calc.setProperty('NORMALISE', normalise)
-    calc.setProperty('k', kraskov_k)
-    calc.setProperty('PROP_KRASKOV_ALG_NUM', str(1))
-    calc.setProperty('NOISE_LEVEL_TO_ADD', noise_level)
-    calc.setProperty('DYN_CORR_EXCL', theiler_t)
-    calc.initialise(history_target, tau_target,
-                    history_source, tau_source,
-                    delay)
-    calc.setObservations(source, target)
-    if local_values:
-        return np.array(calc.computeLocalOfPreviousObservations())
-    else:
-        return calc.computeAverageLocalOfObservations()
+    # Get a (cached) calculator and estimate TE.
+    calc = jidt.get_calculator(
+                    'infodynamics.measures.continuous.kraskov',
+                    'TransferEntropyCalculatorKraskov',
+                    properties={'NORMALISE': normalise,
+                                'k': kraskov_k,
+                                'PROP_KRASKOV_ALG_NUM': 1,
+                                'NOISE_LEVEL_TO_ADD': noise_level,
+                                'DYN_CORR_EXCL': theiler_t},
+                    init_args=(history_target, tau_target, history_source,
+                               tau_source, delay),
+                    debug=debug)
+    source = jidt.to_java_double_array(source)
+    target = jidt.to_java_double_array(target)
+    with jidt.jvm_timer():
+        calc.setObservations(source, target)
+        if local_values:
+            return np.array(calc.computeLocalOfPreviousObservations())
+        else:
+            return calc.computeAverageLocalOfObservations()
 
 
 def jidt_discrete(self, source, target, opts=None):
@@ -282,20 +275,224 @@ def jidt_discrete(self, source, target, opts=None):
     target = utils.combine_discrete_dimensions(target, alph_target)
 
     # And finally make the TE calculation:
-    jarLocation = resource_filename(__name__, 'infodynamics.jar')
-    if not jp.isJVMStarted():
-        jp.startJVM(jp.getDefaultJVMPath(), '-ea', ('-Djava.class.path=' +
-                    jarLocation))
-    calcClass = (jp.JPackage('infodynamics.measures.discrete').
-             TransferEntropyCalculatorDiscrete)
-    calc = calcClass(int(max(math.pow(alph_source, source_dimensions),
-                             math.pow(alph_target, target_dimensions))),
-                     history_target, tau_target,
-                     history_source, tau_source,
-                     delay)
-    calc.setDebug(debug)
-    calc.initialise()
-    # Unfortunately no faster way to pass numpy arrays in than this list conversion
-    calc.addObservations(jp.JArray(jp.JInt, 1)(source.tolist()),
-                     jp.JArray(jp.JInt, 1)(target.tolist()))
-    return calc.computeAverageLocalOfObservations()
+    calc = jidt.get_calculator(
+                'infodynamics.measures.discrete',
+                'TransferEntropyCalculatorDiscrete',
+                constructor_args=(int(max(math.pow(alph_source,
+                                                   source_dimensions),
+                                          math.pow(alph_target,
+                                                   target_dimensions))),
+                                  history_target, tau_target,
+                                  history_source, tau_source,
+                                  delay),
+                debug=debug)
+    source = jidt.to_java_int_array(source)
+    target = jidt.to_java_int_array(target)
+    with jidt.jvm_timer():
+        calc.addObservations(source, target)
+        return calc.computeAverageLocalOfObservations()
+
+
+def discrete(self, source, target, n_chunks=1, opts=None):
+    """Calculate transfer entropy for discrete variables.
+
+    Calculate transfer entropy between a source and a target variable using
+    plug-in estimates of the joint probabilities computed in numpy (the same
+    estimator as JIDT's discrete TE calculator). Past states are uniform
+    embeddings defined by history and tau in the opts dictionary. Multiple
+    TEs can be estimated in parallel, where each instance is called a
+    'chunk'. See estimators_cmi.discrete for details.
+
+    References:
+
+    Schreiber, T. (2000). Measuring information transfer. Physical Review
+    Letters, 85(2), 461.
+
+    This function is ment to be imported into the set_estimator module and used
+    as a method in the Estimator_te class.
+
+    Args:
+        self : instance of Estimator_te
+            function is supposed to be used as part of the Estimator_te class
+        source : numpy array (either of integers or doubles to be discretised)
+            time series realisations of the source variable, where
+            dimensions are realisations x variable dimension
+        target : numpy array (either of integers or doubles to be discretised)
+            time series realisations of the target variable
+        n_chunks : int [optional]
+            number of time series or chunks (default=1)
+        opts : dict [optional]
+            sets estimation parameters:
+
+            - 'num_discrete_bins' - number of discrete bins/levels or the base
+              of each dimension of the discrete variables (default=2)
+            - 'alph_source' - number of discrete bins/levels for source
+              (default=2)
+            - 'alph_target' - number of discrete bins/levels for target
+              (default=2)
+            - 'discretise_method' - if and how to discretise incoming
+              continuous variables to discrete values: 'max_ent', 'equal', or
+              'none' (default='none')
+            - 'history_target' - number of samples in the target's past to
+              consider (mandatory to provide)
+            - 'history_source' - number of samples in the source's past to
+              consider (default=same as the target history)
+            - 'tau_source' - source's embedding delay (default=1)
+            - 'tau_target' - target's embedding delay (default=1)
+            - 'source_target_delay' - information transfer delay between source
+              and target (default=1)
+            - 'local_values' - return local TE instead of average TE
+              (default=False)
+
+    Returns:
+        numpy array
+            transfer entropy in bits for each chunk
+        OR
+        numpy array
+            local transfer entropy for each embedded realisation if
+            local_values is set
+    """
+    if opts is None:
+        opts = {}
+    elif type(opts) is not dict:
+        raise TypeError('Opts should be a dictionary.')
+    alph_source = int(opts.get('alph_source', 2))
+    alph_target = int(opts.get('alph_target', 2))
+    if 'num_discrete_bins' in opts:
+        alph_source = alph_target = int(opts['num_discrete_bins'])
+    discretise_method = opts.get('discretise_method', 'none')
+    try:
+        history_target = opts['history_target']
+    except KeyError:
+        raise RuntimeError('No history was provided for TE estimation.')
+    history_source = opts.get('history_source', history_target)
+    tau_target = opts.get('tau_target', 1)
+    tau_source = opts.get('tau_source', 1)
+    delay = opts.get('source_target_delay', 1)
+    assert source.shape[0] == target.shape[0], (
+        'Unequal number of observations.')
+
+    # Collapse multivariate variables into one discrete state per sample and
+    # build past states within each chunk.
+    source, alph_source = estimators_cmi._discrete_codes(
+                            source, alph_source, discretise_method, n_chunks)
+    target, alph_target = estimators_cmi._discrete_codes(
+                            target, alph_target, discretise_method, n_chunks)
+    start = max((history_target - 1) * tau_target + 1,
+                (history_source - 1) * tau_source + delay)
+    target_past = _embedding(target, n_chunks, start,
+                             1 + tau_target * np.arange(history_target))
+    source_past = _embedding(source, n_chunks, start,
+                             delay + tau_source * np.arange(history_source))
+    current_value = _embedding(target, n_chunks, start, np.zeros(1, int))
+
+    cmi_opts = {'alph1': alph_source,
+                'alph2': alph_target,
+                'alphc': alph_target,
+                'discretise_method': 'none',
+                'local_values': opts.get('local_values', False)}
+    return estimators_cmi.discrete(self, source_past, current_value,
+                                   target_past, n_chunks, cmi_opts)
+
+
+def gaussian(self, source, target, n_chunks=1, opts=None):
+    """Calculate transfer entropy for Gaussian variables.
+
+    Calculate transfer entropy between a source and a target variable,
+    assuming that the variables are jointly Gaussian. TE is calculated as the
+    CMI between the source past and the current target value, conditional on
+    the target past, from the log-determinants of covariance matrices. For
+    Gaussian variables, TE is equivalent to Granger causality (up to a factor
+    of 2). Past states are uniform embeddings defined by history and tau in
+    the opts dictionary. Multiple TEs can be estimated in parallel, where each
+    instance is called a 'chunk'. See estimators_cmi.gaussian for details.
+
+    References:
+
+    Barnett, L., Barrett, A. B., & Seth, A. K. (2009). Granger causality and
+    transfer entropy are equivalent for Gaussian variables. Physical Review
+    Letters, 103(23), 238701.
+
+    This function is ment to be imported into the set_estimator module and used
+    as a method in the Estimator_te class.
+
+    Args:
+        self : instance of Estimator_te
+            function is supposed to be used as part of the Estimator_te class
+        source : numpy array
+            time series realisations of the source variable, where
+            dimensions are realisations x variable dimension
+        target : numpy array
+            time series realisations of the target variable
+        n_chunks : int [optional]
+            number of time series or chunks (default=1)
+        opts : dict [optional]
+            sets estimation parameters:
+
+            - 'history_target' - number of samples in the target's past to
+              consider (mandatory to provide)
+            - 'history_source' - number of samples in the source's past to
+              consider (default=same as the target history)
+            - 'tau_source' - source's embedding delay (default=1)
+            - 'tau_target' - target's embedding delay (default=1)
+            - 'source_target_delay' - information transfer delay between source
+              and target (default=1)
+
+    Returns:
+        numpy array
+            transfer entropy in nats for each chunk
+    """
+    if opts is None:
+        opts = {}
+    elif type(opts) is not dict:
+        raise TypeError('Opts should be a dictionary.')
+    try:
+        history_target = opts['history_target']
+    except KeyError:
+        raise RuntimeError('No history was provided for TE estimation.')
+    history_source = opts.get('history_source', history_target)
+    tau_target = opts.get('tau_target', 1)
+    tau_source = opts.get('tau_source', 1)
+    delay = opts.get('source_target_delay', 1)
+    source = np.asarray(source, dtype=float)
+    target = np.asarray(target, dtype=float)
+    assert source.shape[0] == target.shape[0], (
+        'Unequal number of observations.')
+
+    start = max((history_target - 1) * tau_target + 1,
+                (history_source - 1) * tau_source + delay)
+    target_past = _embedding(target, n_chunks, start,
+                             1 + tau_target * np.arange(history_target))
+    source_past = _embedding(source, n_chunks, start,
+                             delay + tau_source * np.arange(history_source))
+    current_value = _embedding(target, n_chunks, start, np.zeros(1, int))
+    return estimators_cmi.gaussian(self, source_past, current_value,
+                                   target_past, n_chunks)
+
+
+def _embedding(codes, n_chunks, start, lags):
+    """Return past states of a time series within each chunk.
+
+    Args:
+        codes : numpy array
+            time series, either 1D (e.g., discrete states) or realisations x
+            variable dimension, chunks are concatenated
+        n_chunks : int
+            number of chunks
+        start : int
+            first sample in each chunk for which a past state is returned
+        lags : numpy array
+            lags of past samples relative to the current sample
+
+    Returns:
+        numpy array
+            past states with dimensions (n_chunks * (chunksize - start)) x
+            (len(lags) * variable dimension)
+    """
+    n_dim = 1 if codes.ndim == 1 else codes.shape[1]
+    codes = codes.reshape(n_chunks, -1, n_dim)
+    assert codes.shape[1] > start, (
+        'Not enough samples per chunk ({0}) for the requested embedding.'
+        .format(codes.shape[1]))
+    t = np.arange(start, codes.shape[1])
+    return codes[:, t[:, np.newaxis] - lags, :].reshape(-1, len(lags) * n_dim)
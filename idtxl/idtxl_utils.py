@@ -133,35 +133,16 @@ def discretise(a, numBins):
         numpy array
             discretised data
     """
-
-    num_samples = a.shape[0]
-    if (len(a.shape) == 1):
-        # It's a unidimensional array
-        discretised_values = np.zeros(num_samples, dtype=np.int_)
-        theMin = a.min()
-        theMax = a.max()
-        binInterval = (theMax - theMin) / numBins
-        for t in range(num_samples):
-            discretised_values[t] = int((a[t] - theMin) / binInterval)
-            if (discretised_values[t] == numBins):
-                # This occurs for the maximum value; put it in the largest bin (base - 1)
-                discretised_values[t] = discretised_values[t] - 1
-        return discretised_values
-
-    # Else, multivariate array
-    num_dimensions = a.shape[1]
-    discretised_values = np.zeros([num_samples, num_dimensions], dtype=np.int_)
-    for v in range(a.shape[1]):
-        # Bin dimension v:
-        theMin = a[:,v].min()
-        theMax = a[:,v].max()
-        binInterval = (theMax - theMin) / numBins
-        for t in range(num_samples):
-            discretised_values[t,v] = int((a[t,v] - theMin) / binInterval)
-            if (discretised_values[t,v] == numBins):
-                # This occurs for the maximum value; put it in the largest bin (base - 1)
-                discretised_values[t,v] = discretised_values[t,v] - 1
-    return discretised_values
+    a = np.asarray(a)
+    theMin = a.min(axis=0)
+    theMax = a.max(axis=0)
+    binInterval = (theMax - theMin) / numBins
+    # Constant dimensions have no range and go into the lowest bin.
+    binInterval = np.where(binInterval > 0, binInterval, np.inf)
+    discretised_values = np.floor((a - theMin) / binInterval).astype(np.int_)
+    # The maximum value falls on the upper bound of the largest bin
+    # (numBins), put it in the largest bin (base - 1).
+    return np.minimum(discretised_values, numBins - 1)
 
 
 def discretise_max_ent(a, numBins):
@@ -180,38 +161,20 @@ def discretise_max_ent(a, numBins):
         numpy array
             discretised data
     """
+    a = np.asarray(a)
+    if a.ndim == 1:
+        return discretise_max_ent(np.expand_dims(a, axis=1), numBins)[:, 0]
 
+    # Each value is put into the lowest bin whose cut-off value is equal to or
+    # larger than the value.
     num_samples = a.shape[0]
-    if (len(a.shape) == 1):
-        # It's a unidimensional array
-        discretised_values = np.zeros(num_samples, dtype=np.int_)
-        cuttoff_values = np.zeros(numBins)
-        sorted_copy = np.sort(a)
-        for bin in range(numBins):
-            compartmentSize = int((bin+1)*(num_samples)/numBins)-1;
-            cuttoff_values[bin] = sorted_copy[compartmentSize]
-        for t in range(num_samples):
-            for m in range(numBins):
-                if (a[t] <= cuttoff_values[m]):
-                    discretised_values[t] = m
-                    break
-        return discretised_values
-
-    # Else, multivariate array
-    num_dimensions = a.shape[1]
-    discretised_values = np.zeros([num_samples, num_dimensions], dtype=np.int_)
-    for v in range(num_dimensions):
-        # Bin dimension v:
-        cuttoff_values = np.zeros(numBins)
-        sorted_copy = np.sort(a[:,v])
-        for bin in range(numBins):
-            compartmentSize = int((bin+1)*(num_samples)/numBins)-1;
-            cuttoff_values[bin] = sorted_copy[compartmentSize]
-        for t in range(num_samples):
-            for m in range(numBins):
-                if (a[t,v] <= cuttoff_values[m]):
-                    discretised_values[t,v] = m
-                    break
+    compartment_size = np.array([int((bin + 1) * num_samples / numBins) - 1
+                                 for bin in range(numBins)])
+    cutoff_values = np.sort(a, axis=0)[compartment_size, :]
+    discretised_values = np.empty(a.shape, dtype=np.int_)
+    for v in range(a.shape[1]):
+        discretised_values[:, v] = np.searchsorted(cutoff_values[:, v],
+                                                   a[:, v], side='left')
     return discretised_values
 
 
@@ -238,18 +201,66 @@ def combine_discrete_dimensions(a, numBins):
         # It's already a unidimensional array
         return a
 
-    # Else, 2D array assumed
-    num_samples = a.shape[0]
+    # Else, 2D array assumed. The last dimension gets multiplier 1, every
+    # preceding dimension is multiplied by a further power of the base.
     dimensions = a.shape[1]
-    combined_values = np.zeros(num_samples, dtype=np.int_)
-    for t in range(num_samples):
-        combined_value = 0
-        multiplier = 1
-        for c in range(dimensions - 1, -1, -1):
-            combined_value = combined_value + a[t][c] * multiplier
-            multiplier = multiplier * numBins
-            if multiplier <= 0:
-                # Multiplier has overflown
-                raise ArithmaticError('Combination of numBins and number of dimensions of a leads to overflow in making unidimensional array')
-        combined_values[t] = int(combined_value)
-    return combined_values
+    if numBins ** dimensions - 1 > np.iinfo(np.int_).max:
+        raise ArithmeticError('Combination of numBins and number of '
+                              'dimensions of a leads to overflow in making '
+                              'unidimensional array')
+    multipliers = numBins ** np.arange(dimensions - 1, -1, -1, dtype=np.int_)
+    return np.dot(np.asarray(a).astype(np.int_), multipliers)
+
+
+def seed_sequence(seed, *key):
+    """Return the seed sequence of an independent random stream.
+
+    Random streams are identified by a seed and a key of non-negative
+    integers, e.g., (target, idx process, idx sample, idx surrogate). The
+    stream for key (k,) is the k-th child returned by SeedSequence.spawn()
+    for the seed, keys of length > 1 identify grandchildren etc. Streams with
+    different keys are statistically independent and do not depend on the
+    order in which they are requested, such that results are identical if
+    targets, candidates, or surrogates are processed serially or in
+    parallel.
+
+    Args:
+        seed : int, numpy.random.SeedSequence, or None
+            seed or seed sequence of the parent stream
+        *key : int
+            key of the stream relative to the parent stream
+
+    Returns:
+        numpy.random.SeedSequence
+            seed sequence of the requested stream, None if seed is None
+    """
+    if seed is None:
+        return None
+    if isinstance(seed, np.random.SeedSequence):
+        return np.random.SeedSequence(seed.entropy,
+                                      spawn_key=seed.spawn_key + tuple(key))
+    return np.random.SeedSequence(seed, spawn_key=tuple(key))
+
+
+def get_rng(seed=None, *key):
+    """Return a random number generator for an independent random stream.
+
+    See seed_sequence() for the identification of random streams.
+
+    Args:
+        seed : int, numpy.random.SeedSequence, numpy.random.Generator, or
+            None [optional]
+            seed or seed sequence of the parent stream; a generator is
+            returned as is; if None, the generator is seeded from numpy's
+            global random state (default=None)
+        *key : int
+            key of the stream relative to the parent stream
+
+    Returns:
+        numpy.random.Generator
+    """
+    if isinstance(seed, np.random.Generator):
+        return seed
+    if seed is None:
+        return np.random.default_rng(np.random.randint(np.iinfo(np.int32).max))
+    return np.random.default_rng(seed_sequence(seed, *key))
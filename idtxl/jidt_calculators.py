@@ -0,0 +1,191 @@
+"""Provide a cache of JIDT calculators for the JIDT-powered estimators.
+
+JIDT estimators are called many times with identical settings during a
+network analysis. Instead of starting the JVM, looking up the Java class, and
+creating and configuring a new calculator for each call, calculators are
+created once and re-used for all subsequent calls with the same settings.
+Calculators are identified by their class, the arguments passed to the class
+constructor, the properties set, and the arguments passed to initialise().
+
+The module counts cache hits and misses and the time spent in calls to the
+JVM. Use get_stats() to read and reset_stats() to reset these counters.
+
+The module further provides the conversion of numpy arrays into Java arrays
+(to_java_int_array() and to_java_double_array()). Arrays are copied into the
+JVM in one bulk operation through the buffer protocol instead of element by
+element from a Python list.
+
+Note:
+    Calculators are re-initialised before they are handed out, which removes
+    all observations from previous calls. Cached calculators are not thread-
+    safe, each process (e.g., each worker in a process pool) holds its own
+    cache.
+"""
+import time
+from collections import OrderedDict
+from contextlib import contextmanager
+from pkg_resources import resource_filename
+import numpy as np
+from . import idtxl_exceptions as ex
+try:
+    import jpype as jp
+except ImportError:
+    ex.jpype_missing('Jpype is not available on this system. To use '
+                     'JAVA/JIDT-powered estimation install it from '
+                     'https://pypi.python.org/pypi/JPype1')
+
+VERBOSE = False
+MAX_CACHE_SIZE = 128  # max. no. calculators held in the cache
+
+_calculators = OrderedDict()
+_stats = {'hits': 0, 'misses': 0, 'jvm_time': 0.0}
+
+
+def start_jvm():
+    """Start the JAVA virtual machine with JIDT on the class path.
+
+    Nothing is done if the JVM is already running.
+    """
+    if not jp.isJVMStarted():
+        jar_location = resource_filename(__name__, 'infodynamics.jar')
+        jp.startJVM(jp.getDefaultJVMPath(), '-ea',
+                    '-Djava.class.path=' + jar_location)
+
+
+def get_calculator(package, class_name, properties=None, init_args=(),
+                   constructor_args=(), debug=None):
+    """Return an initialised JIDT calculator.
+
+    Return a cached calculator if a calculator with the requested settings was
+    created before, otherwise create a new calculator and add it to the
+    cache. The returned calculator is initialised and holds no observations.
+
+    Args:
+        package : str
+            JIDT package holding the calculator class, e.g.,
+            'infodynamics.measures.continuous.kraskov'
+        class_name : str
+            name of the calculator class
+        properties : dict [optional]
+            properties set via calc.setProperty(), keys and values are
+            converted to str (default=None)
+        init_args : tuple [optional]
+            arguments passed to calc.initialise(), e.g., variable dimensions
+            (default=())
+        constructor_args : tuple [optional]
+            arguments passed to the calculator's constructor (default=())
+        debug : bool [optional]
+            if not None, set debug prints from the calculator on or off
+            (default=None)
+
+    Returns:
+        JIDT calculator object
+    """
+    if properties is None:
+        properties = {}
+    properties = tuple(sorted((str(k), str(v)) for k, v in
+                              properties.items()))
+    key = (package, class_name, tuple(constructor_args), properties,
+           tuple(init_args), debug)
+
+    with jvm_timer():
+        try:
+            calc = _calculators[key]
+        except KeyError:
+            _stats['misses'] += 1
+            if VERBOSE:
+                print('creating JIDT calculator {0}'.format(class_name))
+            start_jvm()
+            calc_class = getattr(jp.JPackage(package), class_name)
+            calc = calc_class(*constructor_args)
+            if debug is not None:
+                calc.setDebug(debug)
+            for (prop, value) in properties:
+                calc.setProperty(prop, value)
+            _calculators[key] = calc
+            if len(_calculators) > MAX_CACHE_SIZE:  # drop least recently used
+                _calculators.popitem(last=False)
+        else:
+            _stats['hits'] += 1
+            _calculators.move_to_end(key)
+        calc.initialise(*init_args)
+    return calc
+
+
+def to_java_int_array(values):
+    """Convert a numpy array into a Java int array.
+
+    Args:
+        values : numpy array
+            1D or 2D array of integers, values are cast to int32
+
+    Returns:
+        JArray of JInt with the same no. dimensions as values
+    """
+    values = np.asarray(values)
+    if values.dtype != np.int32:
+        assert (values.size == 0 or
+                (values.min() >= np.iinfo(np.int32).min and
+                 values.max() <= np.iinfo(np.int32).max)), (
+            'Values exceed the range of Java int.')
+    return _to_java_array(np.ascontiguousarray(values, dtype=np.int32),
+                          jp.JInt)
+
+
+def to_java_double_array(values):
+    """Convert a numpy array into a Java double array.
+
+    Args:
+        values : numpy array
+            1D or 2D array, values are cast to float64
+
+    Returns:
+        JArray of JDouble with the same no. dimensions as values
+    """
+    return _to_java_array(np.ascontiguousarray(values, dtype=np.float64),
+                          jp.JDouble)
+
+
+def _to_java_array(values, java_type):
+    """Copy a contiguous numpy array into a new Java array."""
+    with jvm_timer():
+        try:  # bulk copy through the buffer protocol
+            return jp.JArray(java_type, values.ndim)(values)
+        except TypeError:  # older JPype versions only accept sequences
+            return jp.JArray(java_type, values.ndim)(values.tolist())
+
+
+@contextmanager
+def jvm_timer():
+    """Add the time spent in the with-block to the JVM time counter."""
+    t = time.perf_counter()
+    try:
+        yield
+    finally:
+        _stats['jvm_time'] += time.perf_counter() - t
+
+
+def get_stats():
+    """Return cache statistics.
+
+    Returns:
+        dict
+            'hits' and 'misses' of the calculator cache, 'jvm_time' - time in
+            seconds spent in calls to the JVM, 'n_calculators' - no.
+            calculators currently held in the cache
+    """
+    stats = dict(_stats)
+    stats['n_calculators'] = len(_calculators)
+    return stats
+
+
+def reset_stats():
+    """Reset cache hits, misses, and the JVM time counter."""
+    _stats['hits'] = 0
+    _stats['misses'] = 0
+    _stats['jvm_time'] = 0.0
+
+
+def clear_cache():
+    """Remove all calculators from the cache."""
+    _calculators.clear()
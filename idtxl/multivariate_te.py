@@ -15,6 +15,7 @@ import itertools as it
 from . import stats
 from .network_analysis import Network_analysis
 from .set_estimator import Estimator_cmi
+from .incremental_cmi import Incremental_gaussian_cmi
 
 VERBOSE = True
 
@@ -46,12 +47,35 @@ class Multivariate_te(Network_analysis):
             - 'alpha_*' - critical alpha level for statistical significance,
               where * can be 'max_stats',  'min_stats', 'omnibus', and
               'max_seq' (default=0.05)
+            - 'adaptive_perm' - stop permutation tests early once the
+              p-value's confidence interval is clearly above or below alpha,
+              see the stats module for details (default=False)
+            - 'analytic_null' - test against the asymptotic chi-square null
+              distribution instead of surrogates, requires the 'gaussian' or
+              'discrete' estimator (default=False)
+            - 'surr_cache' - re-use surrogates between rounds of candidate
+              selection, can be 'off', 'exact', 'reuse', or 'refresh', see
+              stats.Surrogate_cache for the statistical semantics
+              (default='exact')
+            - 'n_jobs_candidates' - no. candidates whose surrogates are
+              estimated concurrently, -1 uses all cores (default=1)
+            - 'seed' - seed for all permutations and noise used in the
+              analysis, int or numpy SeedSequence; each target is analysed
+              with an independent random stream (default=None, use numpy's
+              global random state)
             - 'cmi_calc_name' - estimator to be used for CMI calculation
               (For estimator options see the respective documentation.)
             - 'add_conditionals' - force the estimator to add these
               conditionals when estimating TE; can either be a list of
               variables, where each variable is described as (idx process, lag
               wrt to current value) or can be a string: 'faes' for Faes-Method
+            - 'incremental_mode' - update Gaussian CMI estimates incrementally
+              when including and pruning candidates instead of re-estimating
+              them from realisations in each round; requires the 'gaussian'
+              estimator (default=False)
+            - 'plan_calibration' - no. CMI estimations timed before a network
+              analysis to estimate its run time, 0 skips the calibration
+              (default=10)
 
     Attributes:
         selected_vars_full : list of tuples
@@ -120,6 +144,11 @@ class Multivariate_te(Network_analysis):
         except KeyError:
             raise KeyError('Calculator name was not specified!')
         self._cmi_calculator = Estimator_cmi(self.calculator_name)
+        self._incremental_mode = options.get('incremental_mode', False)
+        if self._incremental_mode and self.calculator_name != 'gaussian':
+            raise RuntimeError('Incremental mode requires the gaussian '
+                               'estimator, not {0}.'.format(
+                                                    self.calculator_name))
         super().__init__()
 
     def analyse_network(self, data, targets='all', sources='all'):
@@ -153,6 +182,11 @@ class Multivariate_te(Network_analysis):
             For more details on the estimation of multivariate transfer entropy
             see documentation of class method 'analyse_single_target'.
 
+        Before any target is analysed, all permutation tests are checked for
+        feasibility and the no. CMI estimations and run time of the analysis
+        are estimated and printed (see Network_analysis._plan_analysis()).
+        The plan is kept in attribute 'plan'.
+
         Args:
             data : Data instance
                 raw data for analysis
@@ -181,6 +215,7 @@ class Multivariate_te(Network_analysis):
         assert(len(sources) == len(targets)), ('List of targets and list of '
                                                'sources have to have the same '
                                                'same length')
+        self.plan = self._plan_analysis(data, targets, sources)
 
         # Perform TE estimation for each target individually. FDR-correct
         # overall results.
@@ -264,7 +299,8 @@ class Multivariate_te(Network_analysis):
             'omnibus_pval': self.pvalue_omnibus,
             'omnibus_sign': self.sign_omnibus,
             'cond_sources_pval': self.pvalues_sign_sources,
-            'cond_sources_te': self.te_sign_sources}
+            'cond_sources_te': self.te_sign_sources,
+            'perm_tests': self._perm_tests}
         return results
 
     def _initialise(self, data, sources, target):
@@ -294,6 +330,9 @@ class Multivariate_te(Network_analysis):
         # Check the permutation type and no. permutations requested by the
         # user. This tests if there is sufficient data to do all tests.
         # surrogates.check_permutations(self, data)
+        self._perm_tests = []  # decision rules of all permutation tests
+        self._surr_cache = None  # surrogates are not re-used across targets
+        self._init_random_stream(self.target)
 
         # Reset all attributes to inital values if the instance of
         # Multivariate_te has been used before.
@@ -318,6 +357,57 @@ class Multivariate_te(Network_analysis):
         except KeyError:
             pass
 
+    def _permutation_tests(self):
+        """Return the no. permutations and alpha level of each test."""
+        return {
+            'max_stat': (self.options.get('n_perm_max_stat', 21),
+                         self.options.get('alpha_max_stat', 0.05)),
+            'min_stat': (self.options.get('n_perm_min_stat', 21),
+                         self.options.get('alpha_min_stat', 0.05)),
+            'omnibus': (self.options.get('n_perm_omnibus', 21),
+                        self.options.get('alpha_omnibus', 0.05)),
+            # Without n_perm_max_seq, the sequential test reuses the min.
+            # statistic's surrogates if there are any and uses 500 otherwise.
+            'max_seq': (self.options.get('n_perm_max_seq', 500),
+                        self.options.get('alpha_max_seq', 0.05))}
+
+    def _plan_candidates(self, target, sources, n_processes):
+        """Return current value, target and source candidates of a target."""
+        if sources == 'all':
+            sources = [s for s in range(n_processes) if s != target]
+        elif type(sources) is int:
+            sources = [sources]
+        current_value = (target, max(self.max_lag_sources,
+                                     self.max_lag_target))
+        target_candidates = self._define_candidates(
+                [target], np.arange(current_value[1] - 1,
+                                    current_value[1] - self.max_lag_target - 1,
+                                    -self.tau_target).tolist())
+        source_candidates = self._define_candidates(
+                sources, np.arange(current_value[1] - self.min_lag_sources,
+                                   current_value[1] - self.max_lag_sources,
+                                   -self.tau_sources).tolist())
+        return current_value, target_candidates, source_candidates
+
+    def _n_estimations(self, n_target, n_source, n_perm):
+        """Return the min. and max. no. CMI estimations for one target.
+
+        In each round of candidate selection (max. statistic) and pruning (min.
+        statistic), TE is estimated from all remaining candidates and their
+        surrogates. At least one round is needed for target and source
+        candidates. At most, all candidates are included one by one, all
+        sources are pruned one by one, and final statistics are run on all
+        sources.
+        """
+        def n_rounds(n):
+            return n * (n + 1) // 2
+        max_stat = n_perm['max_stat'] + 1
+        n_min = (n_target + n_source) * max_stat
+        n_max = ((n_rounds(n_target) + n_rounds(n_source)) * max_stat +
+                 n_rounds(n_source) * (n_perm['min_stat'] + 1) +
+                 n_perm['omnibus'] + 1 + n_source * (n_perm['max_seq'] + 1))
+        return n_min, n_max
+
     def _check_source_set(self, sources, n_processes):
         """Set default if no source set was provided by the user."""
         if sources == 'all':
@@ -392,26 +482,14 @@ class Multivariate_te(Network_analysis):
                 realisations of the conditional set
         """
         success = False
+        if self._incremental_mode:
+            cmi_state = self._init_incremental_cmi(candidate_set, data)
         while candidate_set:
             # Find the candidate with maximum TE.
-            candidate_realisations = np.empty(
-                                    (data.n_realisations(self.current_value) *
-                                     len(candidate_set), 1))
-            i_1 = 0
-            i_2 = data.n_realisations(self.current_value)
-            for candidate in candidate_set:
-                candidate_realisations[i_1:i_2, ] = data.get_realisations(
-                                                            self.current_value,
-                                                            [candidate])[0]
-                i_1 = i_2
-                i_2 += data.n_realisations(self.current_value)
-            temp_te = self._cmi_calculator.estimate_mult(
-                                n_chunks=len(candidate_set),
-                                options=self.options,
-                                re_use=['var2', 'conditional'],
-                                var1=candidate_realisations,
-                                var2=self._current_value_realisations,
-                                conditional=self._selected_vars_realisations)
+            if self._incremental_mode:
+                temp_te = cmi_state.cmi(candidate_set)
+            else:
+                temp_te = self._estimate_candidates_te(candidate_set, data)
 
             # Test max TE for significance with maximum statistics.
             te_max_candidate = max(temp_te)
@@ -436,6 +514,8 @@ class Multivariate_te(Network_analysis):
                 self._append_selected_vars_realisations(
                             data.get_realisations(self.current_value,
                                                   [max_candidate])[0])
+                if self._incremental_mode:
+                    cmi_state.condition([max_candidate])
             else:
                 if VERBOSE:
                     print(' -- not significant')
@@ -443,6 +523,50 @@ class Multivariate_te(Network_analysis):
 
         return success
 
+    def _estimate_candidates_te(self, candidate_set, data):
+        """Estimate TE from each candidate given the conditional set."""
+        candidate_realisations = np.empty(
+                                    (data.n_realisations(self.current_value) *
+                                     len(candidate_set), 1))
+        i_1 = 0
+        i_2 = data.n_realisations(self.current_value)
+        for candidate in candidate_set:
+            candidate_realisations[i_1:i_2, ] = data.get_realisations(
+                                                        self.current_value,
+                                                        [candidate])[0]
+            i_1 = i_2
+            i_2 += data.n_realisations(self.current_value)
+        temp_te = self._cmi_calculator.estimate_mult(
+                            n_chunks=len(candidate_set),
+                            options=self.options,
+                            re_use=['var2', 'conditional'],
+                            var1=candidate_realisations,
+                            var2=self._current_value_realisations,
+                            conditional=self._selected_vars_realisations)
+        return temp_te
+
+    def _init_incremental_cmi(self, candidate_set, data):
+        """Set up incremental CMI estimation for a candidate set.
+
+        Compute the covariance of the current value, all candidates and the
+        current conditional set once and condition on the selected variables.
+        """
+        candidate_realisations = data.get_realisations(self.current_value,
+                                                       candidate_set)[0]
+        if self._selected_vars_realisations is None:
+            cmi_state = Incremental_gaussian_cmi(
+                                            self._current_value_realisations,
+                                            candidate_realisations,
+                                            candidate_set)
+        else:
+            cmi_state = Incremental_gaussian_cmi(
+                                self._current_value_realisations,
+                                np.hstack((self._selected_vars_realisations,
+                                           candidate_realisations)),
+                                self.selected_vars_full + candidate_set)
+            cmi_state.condition(self.selected_vars_full)
+        return cmi_state
+
     def _prune_candidates(self, data):
         """Remove uninformative candidates from the final conditional set.
 
@@ -460,46 +584,18 @@ class Multivariate_te(Network_analysis):
         """
         # FOR LATER we don't need to test the last included in the first round
         print(self.selected_vars_sources)
+        if self._incremental_mode and self.selected_vars_sources:
+            cmi_state = Incremental_gaussian_cmi(
+                                    self._current_value_realisations,
+                                    self._selected_vars_realisations,
+                                    self.selected_vars_full)
+            cmi_state.condition(self.selected_vars_full)
         while self.selected_vars_sources:
             # Find the candidate with the minimum TE into the target.
-            temp_te = np.empty(len(self.selected_vars_sources))
-            cond_dim = len(self.selected_vars_full) - 1
-            candidate_realisations = np.empty(
-                                (data.n_realisations(self.current_value) *
-                                 len(self.selected_vars_sources), 1))
-            conditional_realisations = np.empty(
-                (data.n_realisations(self.current_value) *
-                 len(self.selected_vars_sources), cond_dim))
-
-            # calculate TE simultaneously for all candidates
-            i_1 = 0
-            i_2 = data.n_realisations(self.current_value)
-            for candidate in self.selected_vars_sources:
-                # Separate the candidate realisations and all other
-                # realisations to test the candidate's individual contribution.
-                [temp_cond, temp_cand] = self._separate_realisations(
-                                                    self.selected_vars_full,
-                                                    candidate)
-                if temp_cond is None:
-                    conditional_realisations = None
-                else:
-                    conditional_realisations[i_1:i_2, ] = temp_cond
-                candidate_realisations[i_1:i_2, ] = temp_cand
-                i_1 = i_2
-                i_2 += data.n_realisations(self.current_value)
-
-            print(('var1, candidate_realisations: {0}, var2, current_value: '
-                   '{1}, cond: {2}').format(
-                            candidate_realisations.shape,
-                            self._current_value_realisations.shape,
-                            conditional_realisations.shape))
-            temp_te = self._cmi_calculator.estimate_mult(
-                                n_chunks=len(self.selected_vars_sources),
-                                options=self.options,
-                                re_use=['var2'],
-                                var1=candidate_realisations,
-                                var2=self._current_value_realisations,
-                                conditional=conditional_realisations)
+            if self._incremental_mode:
+                temp_te = cmi_state.cmi_conditional(self.selected_vars_sources)
+            else:
+                temp_te = self._estimate_selected_te(data)
 
             # Test min TE for significance with minimum statistics.
             te_min_candidate = min(temp_te)
@@ -522,12 +618,56 @@ class Multivariate_te(Network_analysis):
                 if VERBOSE:
                     print(' -- not significant')
                 self._remove_candidate(min_candidate)
+                if self._incremental_mode:
+                    cmi_state.remove(min_candidate)
             else:
                 if VERBOSE:
                     print(' -- significant')
                 self._min_stats_surr_table = surr_table
                 break
 
+    def _estimate_selected_te(self, data):
+        """Estimate TE from each selected source sample given all others."""
+        temp_te = np.empty(len(self.selected_vars_sources))
+        cond_dim = len(self.selected_vars_full) - 1
+        candidate_realisations = np.empty(
+                            (data.n_realisations(self.current_value) *
+                             len(self.selected_vars_sources), 1))
+        conditional_realisations = np.empty(
+            (data.n_realisations(self.current_value) *
+             len(self.selected_vars_sources), cond_dim))
+
+        # calculate TE simultaneously for all candidates
+        i_1 = 0
+        i_2 = data.n_realisations(self.current_value)
+        for candidate in self.selected_vars_sources:
+            # Separate the candidate realisations and all other
+            # realisations to test the candidate's individual contribution.
+            [temp_cond, temp_cand] = self._separate_realisations(
+                                                self.selected_vars_full,
+                                                candidate)
+            if temp_cond is None:
+                conditional_realisations = None
+            else:
+                conditional_realisations[i_1:i_2, ] = temp_cond
+            candidate_realisations[i_1:i_2, ] = temp_cand
+            i_1 = i_2
+            i_2 += data.n_realisations(self.current_value)
+
+        print(('var1, candidate_realisations: {0}, var2, current_value: '
+               '{1}, cond: {2}').format(
+                        candidate_realisations.shape,
+                        self._current_value_realisations.shape,
+                        conditional_realisations.shape))
+        temp_te = self._cmi_calculator.estimate_mult(
+                            n_chunks=len(self.selected_vars_sources),
+                            options=self.options,
+                            re_use=['var2'],
+                            var1=candidate_realisations,
+                            var2=self._current_value_realisations,
+                            conditional=conditional_realisations)
+        return temp_te
+
     def _test_final_conditional(self, data):  # TODO test this!
         """Perform statistical test on the final conditional set."""
         if not self.selected_vars_sources:
@@ -0,0 +1,170 @@
+"""Provide CPU neighbour searches for Kraskov estimators.
+
+This module provides the same interface as the OpenCL neighbour searches in
+neighbour_search_opencl, but uses KD-trees with maximum norm from SciPy. Point
+sets may hold multiple independent data sets ('chunks'), neighbours are only
+searched for within the chunk a point belongs to. Temporal neighbours within
+the Theiler window are excluded from all searches.
+
+All chunks of a point set are handled in one call: one KD-tree is built per
+chunk, while the removal of neighbours in the Theiler window and the selection
+of the k nearest neighbours are done for all chunks at once.
+
+Point sets may also be given as views from the realisation_views module. Views
+are searched chunk by chunk without creating the full point set, for
+broadcast point sets (identical for all chunks) a single KD-tree is built.
+"""
+import numpy as np
+from scipy.spatial import cKDTree
+from . import realisation_views as rv
+
+VERBOSE = False
+
+
+def knn_search(pointset, n_dim, knn_k, theiler_t, n_chunks=1, n_threads=1):
+    """Find the k nearest neighbours for each point in a point set.
+
+    Args:
+        pointset : numpy array or view
+            points with dimensions (n_points * n_chunks) x n_dim
+        n_dim : int
+            dimensionality of the point set
+        knn_k : int
+            number of nearest neighbours to search for
+        theiler_t : int
+            no. next temporal neighbours ignored in the search
+        n_chunks : int [optional]
+            number of independent data sets in the point set (default=1)
+        n_threads : int [optional]
+            no. threads used for querying the KD-trees, -1 uses all cores
+            (default=1)
+
+    Returns:
+        numpy array
+            indices of the k nearest neighbours within the point's chunk,
+            dimensions knn_k x (n_points * n_chunks)
+        numpy array
+            max-norm distances to the k nearest neighbours, dimensions
+            knn_k x (n_points * n_chunks)
+    """
+    pointset = _check_pointset(pointset, n_dim, n_chunks)
+    chunksize = pointset.shape[0] // n_chunks
+    assert chunksize > knn_k + 2 * theiler_t, (
+        'Not enough points per chunk ({0}) for a KNN search with k={1} and a '
+        'Theiler window of {2}.'.format(chunksize, knn_k, theiler_t))
+
+    # Query enough neighbours, such that k neighbours remain after removing
+    # the query point and all points within the Theiler window.
+    n_points = pointset.shape[0]
+    n_query = knn_k + 2 * theiler_t + 1
+    if isinstance(pointset, rv.Broadcast_realisations):
+        # All chunks are identical, search the first chunk only.
+        tree = cKDTree(pointset.base, balanced_tree=False)
+        dist, idx = tree.query(tree.data, k=n_query, p=np.inf,
+                               workers=n_threads)
+        dist = np.tile(dist, (n_chunks, 1))
+        idx = np.tile(idx, (n_chunks, 1))
+    else:
+        dist = np.empty((n_points, n_query))
+        idx = np.empty((n_points, n_query), dtype=np.int64)
+        for c in range(n_chunks):
+            i_1 = c * chunksize
+            i_2 = i_1 + chunksize
+            tree = cKDTree(rv.get_chunk(pointset, c, n_chunks),
+                           balanced_tree=False)
+            dist[i_1:i_2, :], idx[i_1:i_2, :] = tree.query(
+                            tree.data, k=n_query, p=np.inf, workers=n_threads)
+
+    # Keep the first k neighbours outside the Theiler window in each row
+    # (neighbours are sorted by distance).
+    position = np.arange(n_points) % chunksize
+    valid = np.abs(idx - position[:, np.newaxis]) > theiler_t
+    keep = valid & (np.cumsum(valid, axis=1) <= knn_k)
+    indexes = idx[keep].reshape(n_points, knn_k).T.astype(np.int32)
+    distances = dist[keep].reshape(n_points, knn_k).T
+    return indexes, distances.astype(pointset.dtype)
+
+
+def range_search(pointset, n_dim, radius, theiler_t, n_chunks=1,
+                 n_threads=1):
+    """Count neighbours within a given radius for each point in a point set.
+
+    Count all points within the chunk of a query point, whose max-norm
+    distance to the query point is strictly smaller than the query point's
+    radius. Points within the Theiler window (including the query point
+    itself) are not counted.
+
+    Args:
+        pointset : numpy array or view
+            points with dimensions (n_points * n_chunks) x n_dim
+        n_dim : int
+            dimensionality of the point set
+        radius : numpy array
+            search radius for each point
+        theiler_t : int
+            no. next temporal neighbours ignored in the search
+        n_chunks : int [optional]
+            number of independent data sets in the point set (default=1)
+        n_threads : int [optional]
+            no. threads used for querying the KD-trees, -1 uses all cores
+            (default=1)
+
+    Returns:
+        numpy array
+            neighbour count for each point
+    """
+    pointset = _check_pointset(pointset, n_dim, n_chunks)
+    assert radius.shape[0] == pointset.shape[0], (
+        'No. radii ({0}) does not match no. points ({1}).'.format(
+                                        radius.shape[0], pointset.shape[0]))
+    chunksize = pointset.shape[0] // n_chunks
+    # cKDTree counts points with distance <= r, use the next smaller float to
+    # count points with distance < radius.
+    radius = np.nextafter(radius, 0)
+    count = np.empty(pointset.shape[0], dtype=np.int64)
+    if isinstance(pointset, rv.Broadcast_realisations):
+        # All chunks are identical, build a single tree for all queries.
+        tree = cKDTree(pointset.base, balanced_tree=False)
+    for c in range(n_chunks):
+        i_1 = c * chunksize
+        i_2 = i_1 + chunksize
+        points = rv.get_chunk(pointset, c, n_chunks)
+        if not isinstance(pointset, rv.Broadcast_realisations):
+            tree = cKDTree(points, balanced_tree=False)
+        count[i_1:i_2] = tree.query_ball_point(points, r=radius[i_1:i_2],
+                                               p=np.inf, return_length=True,
+                                               workers=n_threads)
+        count[i_1:i_2] -= _count_theiler(points, radius[i_1:i_2], theiler_t)
+    return count.astype(np.int32)
+
+
+def _check_pointset(pointset, n_dim, n_chunks):
+    """Check point set dimensions and bring it into shape n_points x n_dim."""
+    if rv.is_view(pointset):
+        assert pointset.shape[1] == n_dim, ('Given dimension does not match '
+                                            'data.')
+    elif pointset.ndim == 1:
+        pointset = np.expand_dims(pointset, axis=1)
+    elif n_dim != pointset.shape[1]:
+        assert n_dim == pointset.shape[0], ('Given dimension does not match '
+                                            'data.')
+        pointset = pointset.T
+        if VERBOSE:
+            print('search CPU: fixed shape of input data')
+    assert pointset.shape[0] % n_chunks == 0, (
+        'No. points ({0}) can not be divided by no. chunks ({1}).'.format(
+                                                pointset.shape[0], n_chunks))
+    return pointset
+
+
+def _count_theiler(points, radius, theiler_t):
+    """Count points within radius that lie inside the Theiler window.
+
+    The count includes the query point itself, which is always within range.
+    """
+    count = np.ones(points.shape[0], dtype=np.int64)
+    for lag in range(1, min(theiler_t, points.shape[0] - 1) + 1):
+        dist = np.max(np.abs(points[lag:, :] - points[:-lag, :]), axis=1)
+        count[:-lag] += dist <= radius[:-lag]
+        count[lag:] += dist <= radius[lag:]
+    return count
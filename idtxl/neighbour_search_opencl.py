@@ -23,11 +23,13 @@ def knn_search(pointset, n_dim, knn_k, theiler_t, n_chunks=1, gpuid=0):
     if n_dim != pointset.shape[0]:
         assert n_dim == pointset.shape[1], ('Given dimension does not match '
                                             'data.')
-        pointset = pointset.transpose().copy()
+        pointset = np.ascontiguousarray(pointset.transpose(),
+                                        dtype=np.float32)
         if VERBOSE:
             print('search GPU: fixed shape of input data')
-    if pointset.flags['C_CONTIGUOUS'] is not True:
-        pointset = np.ascontiguousarray(pointset)
+    if (pointset.flags['C_CONTIGUOUS'] is not True or
+            pointset.dtype != np.float32):
+        pointset = np.ascontiguousarray(pointset, dtype=np.float32)
         if VERBOSE:
             print('search GPU: fixed memory layout of input data')
 
@@ -52,9 +54,9 @@ def knn_search(pointset, n_dim, knn_k, theiler_t, n_chunks=1, gpuid=0):
     for r in range(n_runs):
         # print('run: {0}, index 1: {1}, index 2: {2}'.format(r, i_1, i_2))
         # print('no. points: {0}, no. chunks: {1}, pointset shape: {2}'.format(n_points, n_chunks, pointset[:, i_1:i_2].shape))
+        run_points = np.ascontiguousarray(pointset[:, i_1:i_2])
         success = clFindKnn(indexes[:, i_1:i_2], distances[:, i_1:i_2],
-                            pointset[:, i_1:i_2].astype('float32'),
-                            pointset[:, i_1:i_2].astype('float32'),
+                            run_points, run_points,
                             int(knn_k), int(theiler_t), int(n_chunks),
                             int(pointdim), int(n_points), int(gpuid))
         if not success:
@@ -78,11 +80,13 @@ def range_search(pointset, n_dim, radius, theiler_t, n_chunks=1, gpuid=0):
     if n_dim != pointset.shape[0]:
         assert n_dim == pointset.shape[1], ('Given dimension does not match '
                                             'data axis.')
-        pointset = pointset.transpose().copy()
+        pointset = np.ascontiguousarray(pointset.transpose(),
+                                        dtype=np.float32)
         if VERBOSE:
             print('search GPU: fixed shape input data')
-    if pointset.flags['C_CONTIGUOUS'] is not True:
-        pointset = np.ascontiguousarray(pointset)
+    if (pointset.flags['C_CONTIGUOUS'] is not True or
+            pointset.dtype != np.float32):
+        pointset = np.ascontiguousarray(pointset, dtype=np.float32)
         if VERBOSE:
             print('search GPU: fixed memory layout of input data')
 
@@ -104,9 +108,8 @@ def range_search(pointset, n_dim, radius, theiler_t, n_chunks=1, gpuid=0):
     pointdim = pointset.shape[0]
     n_points = pointset[:, i_1:i_2].shape[1]
     for r in range(n_runs):
-        success = clFindRSAll(pointcount[i_1:i_2],
-                              pointset[:, i_1:i_2].astype('float32'),
-                              pointset[:, i_1:i_2].astype('float32'),
+        run_points = np.ascontiguousarray(pointset[:, i_1:i_2])
+        success = clFindRSAll(pointcount[i_1:i_2], run_points, run_points,
                               radius[i_1:i_2], theiler_t, n_chunks, pointdim,
                               n_points, gpuid)
         if not success:
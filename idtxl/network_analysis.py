@@ -4,9 +4,18 @@ Created on Mon Mar  7 18:13:27 2016
 
 @author: patricia
 """
+import time
+import datetime
 import numpy as np
 import copy as cp
 from . import idtxl_utils as utils
+from . import stats
+
+VERBOSE = True
+
+# Key of the random stream for estimates from the original data (keys 0 to 3
+# are used by the statistical tests, see stats).
+_STREAM_DATA = 4
 
 # TODO which 'algorithms' do we want to provide for this? biv TE, mult TE,
 # mult granger, biv granger, ...?
@@ -40,6 +49,9 @@ class Network_analysis():
             indices of the set of conditionals coming from the target process
         selected_vars_sources : list of tuples
             indices of the set of conditionals coming from source processes
+        plan : dict
+            permutation tests and estimated cost of the last network analysis,
+            see _plan_analysis()
     """
 
     def __init__(self):  # TODO a lot of these needs to go into the child class
@@ -51,6 +63,10 @@ class Network_analysis():
         self._current_value_realisations = None
         self._selected_vars_realisations = None
         self._selected_vars_repl_idx = None
+        self._perm_tests = []
+        self._surr_cache = None
+        self._seed = None
+        self.plan = None
 
     @property
     def current_value(self):
@@ -64,6 +80,134 @@ class Network_analysis():
                              'process, index sample).'))
         self._current_value = idx
 
+    def _init_random_stream(self, idx):
+        """Set the random stream for the analysis of a target or process.
+
+        If the option 'seed' is set, all permutations and noise used in the
+        analysis of target/process idx are drawn from an independent random
+        stream, such that results are reproducible and do not depend on the
+        order in which targets are analysed or on the no. workers used. Noise
+        added to the original data by the estimators is seeded as well.
+
+        Args:
+            idx : int
+                index of the target or process analysed
+        """
+        self._seed = utils.seed_sequence(self.options.get('seed'), idx)
+        if self._seed is not None:
+            noise_seed = utils.seed_sequence(self._seed, _STREAM_DATA)
+            self.options = dict(self.options, noise_seed=noise_seed)
+
+    def _plan_analysis(self, data, targets, sources):
+        """Check the permutation tests and estimate the cost of an analysis.
+
+        Check if all permutation tests requested in the options can be
+        realised with the data (see stats.plan_permutation_tests()) and count
+        the CMI estimations required to analyse all targets. The no.
+        estimations is given as a range: the lower bound assumes that no
+        candidate is selected, the upper bound that all candidates are
+        selected (and pruned again); savings from cached surrogates and
+        adaptive tests are not included. The run time is extrapolated from a
+        calibration run with 'plan_calibration' estimations for the first
+        target (default=10, 0 skips the calibration). The plan is printed and
+        returned.
+
+        Args:
+            data : Data instance
+                raw data for analysis
+            targets : list of int
+                index of target processes
+            sources : list
+                sources for each target, see analyse_network()
+
+        Returns:
+            dict
+                the analysis plan with keys 'tests' (plan for each test, see
+                stats.plan_permutation_tests()), 'n_estimations' (min. and
+                max. no. CMI estimations), 'time_per_estimation' (in s, as
+                measured in the calibration run), and 'run_time' (min. and
+                max. run time in s); times are None if the calibration was
+                skipped
+
+        Raises:
+            RuntimeError
+                if any permutation test is infeasible
+        """
+        candidates = [self._plan_candidates(t, s, data.n_processes)
+                      for (t, s) in zip(targets, sources)]
+        tests = stats.plan_permutation_tests(data, candidates[0][0],
+                                             self._permutation_tests(),
+                                             self.options)
+        n_surrogates = {t: tests[t]['n_perm'] for t in tests}
+        n_estimations = np.zeros(2, dtype=int)
+        for (current_value, conditional, test_set) in candidates:
+            n_estimations += self._n_estimations(len(conditional),
+                                                 len(test_set), n_surrogates)
+
+        n_calibration = self.options.get('plan_calibration', 10)
+        time_per_estimation = None
+        run_time = None
+        if n_calibration > 0 and candidates[0][2]:
+            time_per_estimation = self._calibrate(data, n_calibration,
+                                                  *candidates[0])
+            run_time = n_estimations * time_per_estimation
+        plan = {'tests': tests,
+                'n_estimations': n_estimations,
+                'time_per_estimation': time_per_estimation,
+                'run_time': run_time}
+        if VERBOSE:
+            self._print_plan(plan, len(targets))
+        return plan
+
+    def _calibrate(self, data, n_estimations, current_value, conditional,
+                   candidates):
+        """Return the time per CMI estimation in a calibration run.
+
+        Estimate the CMI between n_estimations candidates (candidates are
+        repeated if necessary) and the current value, conditional on the
+        conditional set, as done in candidate selection.
+        """
+        chunks = [candidates[i % len(candidates)]
+                  for i in range(n_estimations)]
+        var1 = data.get_realisations(current_value,
+                                     chunks)[0].T.reshape(-1, 1)
+        var2 = data.get_realisations(current_value, [current_value])[0]
+        if conditional:
+            conditional = data.get_realisations(current_value,
+                                                conditional)[0]
+        else:
+            conditional = None
+        t = time.perf_counter()
+        self._cmi_calculator.estimate_mult(n_chunks=n_estimations,
+                                           options=self.options,
+                                           re_use=['var2', 'conditional'],
+                                           var1=var1,
+                                           var2=var2,
+                                           conditional=conditional)
+        return (time.perf_counter() - t) / n_estimations
+
+    def _print_plan(self, plan, n_targets):
+        """Print the plan of an analysis."""
+        print('\n####### analysis plan for {0} target(s)'.format(n_targets))
+        print('{0:<10}{1:>8}{2:>8}  {3}'.format('test', 'n_perm', 'alpha',
+                                                 'permutation'))
+        for (test, p) in plan['tests'].items():
+            if p['n_available'] is None:
+                available = ''
+            elif p['n_available'] > 10 ** 9:
+                available = ' (>10^9 available)'
+            else:
+                available = ' ({0} available)'.format(p['n_available'])
+            print('{0:<10}{1:>8}{2:>8}  {3}{4}'.format(
+                    test, p['n_perm'], p['alpha'], p['permutation'],
+                    available))
+        print('CMI estimations: {0} to {1}'.format(*plan['n_estimations']))
+        if plan['run_time'] is not None:
+            print('time per estimation: {0:.4f} s, estimated run time: {1} to '
+                  '{2}'.format(plan['time_per_estimation'],
+                               *[datetime.timedelta(seconds=round(t))
+                                 for t in plan['run_time']]))
+
     @property
     def _current_value_realisations(self):
         """Get realisations of the current_value."""
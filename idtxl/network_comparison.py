@@ -1,5 +1,6 @@
 """Perform inference statistics on groups of data."""
 import sys
+import math
 import copy as cp
 import numpy as np
 from .set_estimator import Estimator_cmi
@@ -33,7 +34,7 @@ class Network_comparison():
         except KeyError:
             raise KeyError('You have to provide a "stats_type", "dependent" '
                            'or "independent".')
-        self._check_n_perm()
+        self._rng = idtxl_utils.get_rng(options.get('seed'))
 
 
 class Compare_single_recording(Network_comparison):
@@ -51,6 +52,8 @@ class Compare_single_recording(Network_comparison):
             'n_perm_comp' - number of permutations (default=500)
             'alpha_comp' - critical alpha level for statistical significance
             (default=0.05)
+            'seed' - seed for the permutation of replications, int or numpy
+            SeedSequence (default=None)
 
     Returns:
         numpy array, bool
@@ -64,6 +67,8 @@ class Compare_single_recording(Network_comparison):
         super().__init__(options)
 
     def compare(self, network_a, network_b, data_a, data_b):
+        self._check_n_perm(data_a, data_b)
+
         # Generate union of links from both networks.
         if VERBOSE:
             print('\n------------------- (1) create union of networks')
@@ -91,22 +96,40 @@ class Compare_single_recording(Network_comparison):
             print(' ')
 
         # Test each original difference against its surrogate distribution.
-        significance = np.empty(self.union['n_sources_tot'])
-        pvalue = np.empty(self.union['n_sources_tot'])
-        for c in range(self.union['n_sources_tot']):
-            [s, p] = stats._find_pvalue(cmi_diff[c], surr_distribution[:, c],
-                                        self.alpha, tail=self.tail)
-            significance[c] = s
-            pvalue[c] = p
-
+        [significance, pvalue] = stats._find_pvalues(cmi_diff,
+                                                     surr_distribution.T,
+                                                     self.alpha,
+                                                     tail=self.tail)
         return significance, pvalue
 
-    def _check_n_perm(self):
-        sufficient = True
-        # TODO add this
-        if not sufficient:
-            raise ValueError('The number of realisations is not high enough to'
-                             ' allow for a sufficient number of permuations.')
+    def _check_n_perm(self, data_a, data_b):
+        """Check if the requested no. permutations can be realised.
+
+        For dependent samples, surrogates are created by swapping
+        replications between conditions (2^n_repl permutations), for
+        independent samples by splitting the replications of both conditions
+        into two new groups (2n_repl choose n_repl permutations). The no.
+        permutations further has to be high enough to reach the alpha level.
+        """
+        if data_a.n_replications != data_b.n_replications:
+            raise ValueError('Both data sets need the same number of '
+                             'replications ({0} != {1}).'.format(
+                                data_a.n_replications, data_b.n_replications))
+        n_repl = data_a.n_replications
+        if self.stats_type == 'dependent':
+            n_available = 2 ** n_repl
+        else:
+            n_available = math.comb(2 * n_repl, n_repl)
+        if n_available <= self.n_permutations:
+            raise ValueError('The number of replications ({0}) is not high '
+                             'enough to allow for the requested number of '
+                             'permutations ({1}), only {2} permutations are '
+                             'available.'.format(n_repl, self.n_permutations,
+                                                 n_available))
+        if 1.0 / self.n_permutations >= self.alpha:
+            raise ValueError('The number of permutations ({0}) is too small '
+                             'to test at an alpha level of {1}.'.format(
+                                            self.n_permutations, self.alpha))
 
     def _create_union(self, network_a, network_b):
         """Create the union of sources for two networks."""
@@ -265,7 +288,7 @@ class Compare_single_recording(Network_comparison):
 
         # Swap or permute arrays depending on the stats type.
         if self.stats_type == 'dependent':
-            swap = np.repeat(np.random.randint(2, size=n_repl).astype(bool),
+            swap = np.repeat(self._rng.integers(2, size=n_repl).astype(bool),
                              n_per_repl)
             cond_a_perm[swap, :] = cond_b[swap, :]
             cond_b_perm[swap, :] = cond_a[swap, :]
@@ -273,7 +296,8 @@ class Compare_single_recording(Network_comparison):
             cond_b_perm[np.invert(swap), :] = cond_a[np.invert(swap), :]
 
         elif self.stats_type == 'independent':
-            resample_a = np.random.choice(n_repl * 2, n_repl, replace=False)
+            resample_a = self._rng.choice(n_repl * 2, n_repl,
+                                           replace=False)
             resample_b = np.setdiff1d(np.arange(n_repl * 2), resample_a)
 
             # Resample group A.
@@ -0,0 +1,280 @@
+"""Provide memory-saving views on realisations used for estimation.
+
+Estimators that handle multiple chunks in parallel expect realisations of all
+chunks in one array, where chunks are stacked along the first axis. When
+realisations are re-used for all chunks (e.g., the conditional in surrogate
+testing), replicating them wastes memory. The classes in this module represent
+such data without copying: Broadcast_realisations holds one copy of the
+realisations that is repeated for each chunk, Permuted_realisations holds one
+copy of the realisations and a permutation of the realisations for each chunk
+(e.g., surrogate data), and Stacked_realisations joins variables along the
+variable dimension chunk by chunk.
+
+Views provide the shape of the full array and access to individual chunks.
+Estimators that can not work chunk-wise may convert a view into a numpy array
+using np.asarray(), which creates the full array.
+"""
+import numpy as np
+
+
+class Broadcast_realisations(object):
+    """Realisations that are identical for all chunks.
+
+    Represent realisations of a single chunk repeated n_chunks times along the
+    first axis. Only one copy of the realisations is held in memory.
+
+    Args:
+        base : numpy array
+            realisations of one chunk, where dimensions are realisations x
+            variable dimension
+        n_chunks : int
+            number of times the realisations are repeated
+
+    Attributes:
+        base : numpy array
+            realisations of one chunk
+        n_chunks : int
+            number of chunks
+        shape : tuple
+            shape of the full array, (n_chunks * chunk size) x variable
+            dimension
+    """
+
+    def __init__(self, base, n_chunks):
+        base = np.asarray(base)
+        if base.ndim == 1:
+            base = np.expand_dims(base, axis=1)
+        assert base.ndim == 2, 'Realisations must be a 2D array.'
+        assert n_chunks > 0, 'n_chunks must be positive.'
+        self.base = base
+        self.n_chunks = n_chunks
+
+    @property
+    def shape(self):
+        """Shape of the full array."""
+        return (self.base.shape[0] * self.n_chunks, self.base.shape[1])
+
+    @property
+    def ndim(self):
+        """No. dimensions of the full array."""
+        return 2
+
+    @property
+    def dtype(self):
+        """Data type of the realisations."""
+        return self.base.dtype
+
+    @property
+    def nbytes(self):
+        """Bytes held in memory by the view."""
+        return self.base.nbytes
+
+    def __len__(self):
+        return self.shape[0]
+
+    def __array__(self, dtype=None, copy=None):
+        if copy is False:
+            raise ValueError('Broadcast realisations can not be converted to '
+                             'an array without copying.')
+        base = self.base if dtype is None else self.base.astype(dtype,
+                                                                 copy=False)
+        return np.tile(base, (self.n_chunks, 1))
+
+    def chunk(self, chunk_idx):
+        """Return realisations of a single chunk."""
+        assert 0 <= chunk_idx < self.n_chunks, (
+            'Chunk index {0} out of range.'.format(chunk_idx))
+        return self.base
+
+
+class Permuted_realisations(object):
+    """Realisations that are permuted differently for each chunk.
+
+    Represent permutations of the realisations of a single chunk, e.g.,
+    surrogate data created by shuffling realisations. Only one copy of the
+    realisations and one permutation index per chunk are held in memory.
+    Chunk i is given by base[index[i], :].
+
+    Args:
+        base : numpy array
+            realisations of one chunk, where dimensions are realisations x
+            variable dimension
+        index : numpy array
+            permutation index with dimensions n_chunks x no. realisations,
+            where each row is a permutation of the realisations in base
+
+    Attributes:
+        base : numpy array
+            realisations of one chunk
+        index : numpy array
+            permutation index for each chunk
+        n_chunks : int
+            number of chunks
+        shape : tuple
+            shape of the full array, (n_chunks * chunk size) x variable
+            dimension
+    """
+
+    def __init__(self, base, index):
+        base = np.asarray(base)
+        if base.ndim == 1:
+            base = np.expand_dims(base, axis=1)
+        assert base.ndim == 2, 'Realisations must be a 2D array.'
+        index = np.asarray(index)
+        assert index.ndim == 2, 'Permutation index must be a 2D array.'
+        assert index.shape[1] == base.shape[0], (
+            'Permutation index length ({0}) does not match no. realisations '
+            '({1}).'.format(index.shape[1], base.shape[0]))
+        self.base = base
+        if base.shape[0] <= np.iinfo(np.int32).max:
+            self.index = index.astype(np.int32, copy=False)
+        else:
+            self.index = index
+        self.n_chunks = index.shape[0]
+
+    @property
+    def shape(self):
+        """Shape of the full array."""
+        return (self.base.shape[0] * self.n_chunks, self.base.shape[1])
+
+    @property
+    def ndim(self):
+        """No. dimensions of the full array."""
+        return 2
+
+    @property
+    def dtype(self):
+        """Data type of the realisations."""
+        return self.base.dtype
+
+    @property
+    def nbytes(self):
+        """Bytes held in memory by the view."""
+        return self.base.nbytes + self.index.nbytes
+
+    def __len__(self):
+        return self.shape[0]
+
+    def __array__(self, dtype=None, copy=None):
+        if copy is False:
+            raise ValueError('Permuted realisations can not be converted to '
+                             'an array without copying.')
+        permuted = self.base[self.index.ravel(), :]
+        return permuted if dtype is None else permuted.astype(dtype,
+                                                              copy=False)
+
+    def chunk(self, chunk_idx):
+        """Return realisations of a single chunk."""
+        return self.base[self.index[chunk_idx], :]
+
+    def chunks(self, chunk_1, chunk_2):
+        """Return a view on chunks chunk_1 to chunk_2 (exclusive)."""
+        return Permuted_realisations(self.base, self.index[chunk_1:chunk_2])
+
+
+class Stacked_realisations(object):
+    """Realisations of multiple variables joined along the variable dimension.
+
+    Represent the result of np.hstack() on realisations (numpy arrays or
+    views) with the same number of realisations and chunks. Chunks of the
+    joint realisations are created on request.
+
+    Args:
+        variables : list of numpy arrays or views
+            realisations to be joined
+        n_chunks : int
+            number of chunks in the realisations
+
+    Attributes:
+        variables : list of numpy arrays or views
+            realisations of the individual variables
+        n_chunks : int
+            number of chunks
+        shape : tuple
+            shape of the full array
+    """
+
+    def __init__(self, variables, n_chunks):
+        n_realisations = variables[0].shape[0]
+        for v in variables:
+            assert v.shape[0] == n_realisations, (
+                'All variables need the same no. realisations.')
+        assert n_realisations % n_chunks == 0, (
+            'No. realisations ({0}) can not be divided by no. chunks '
+            '({1}).'.format(n_realisations, n_chunks))
+        self.variables = variables
+        self.n_chunks = n_chunks
+
+    @property
+    def shape(self):
+        """Shape of the full array."""
+        return (self.variables[0].shape[0],
+                sum([v.shape[1] for v in self.variables]))
+
+    @property
+    def ndim(self):
+        """No. dimensions of the full array."""
+        return 2
+
+    @property
+    def dtype(self):
+        """Data type of the joint realisations."""
+        return np.result_type(*[v.dtype for v in self.variables])
+
+    def __len__(self):
+        return self.shape[0]
+
+    def __array__(self, dtype=None, copy=None):
+        if copy is False:
+            raise ValueError('Stacked realisations can not be converted to an '
+                             'array without copying.')
+        stacked = np.hstack([np.asarray(v) for v in self.variables])
+        return stacked if dtype is None else stacked.astype(dtype, copy=False)
+
+    def chunk(self, chunk_idx):
+        """Return realisations of a single chunk."""
+        return np.hstack([get_chunk(v, chunk_idx, self.n_chunks)
+                          for v in self.variables])
+
+
+def is_view(realisations):
+    """Test if realisations are represented by a view."""
+    return isinstance(realisations,
+                      (Broadcast_realisations, Permuted_realisations,
+                       Stacked_realisations))
+
+
+def get_chunk(realisations, chunk_idx, n_chunks):
+    """Return realisations of a single chunk.
+
+    Args:
+        realisations : numpy array or view
+            realisations of all chunks, stacked along the first axis
+        chunk_idx : int
+            index of the requested chunk
+        n_chunks : int
+            number of chunks in the realisations
+
+    Returns:
+        numpy array
+            realisations of the requested chunk
+    """
+    if is_view(realisations):
+        return realisations.chunk(chunk_idx)
+    chunk_size = realisations.shape[0] // n_chunks
+    return realisations[chunk_idx * chunk_size:(chunk_idx + 1) * chunk_size]
+
+
+def hstack(variables, n_chunks):
+    """Join realisations along the variable dimension.
+
+    Returns a numpy array if all variables are numpy arrays, a
+    Broadcast_realisations view if all variables are broadcast, and a
+    Stacked_realisations view otherwise.
+    """
+    if all([isinstance(v, Broadcast_realisations) for v in variables]):
+        return Broadcast_realisations(np.hstack([v.base for v in variables]),
+                                      n_chunks)
+    if any([is_view(v) for v in variables]):
+        return Stacked_realisations(variables, n_chunks)
+    return np.hstack(variables)
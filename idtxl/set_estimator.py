@@ -1,6 +1,12 @@
 """Manage different estimators for information theoretic measures."""
+import os
 import types
+import atexit
+import multiprocessing as mp
+from concurrent.futures import (ProcessPoolExecutor, ThreadPoolExecutor,
+                                as_completed)
 import numpy as np
+from . import realisation_views as rv
 from . import estimators_te
 from . import estimators_ais
 from . import estimators_cmi
@@ -72,17 +78,32 @@ class Estimator(object):
 
         Each numpy array with realisations can hold either the realisations for
         multiple chunks or can hold the realisation for a single chunk, which
-        gets replicated for parallel estimation and gets re-used for iterative
-        estimation, in order to save memory. The variables for re-use are
+        gets re-used for all chunks, in order to save memory. Realisations
+        that are permutations of a single chunk (e.g., surrogate data) may be
+        passed as realisation_views.Permuted_realisations. For parallel
+        estimators, re-used realisations are passed as
+        realisation_views.Broadcast_realisations, which hold a single copy of
+        the realisations. The variables for re-use are
         provided in re-use as list of dictionary keys indicating entries in
         data for re-use.
 
+        Estimators that do not support parallel estimation can be run on
+        multiple processes by setting 'n_jobs' in the options. Chunks are then
+        distributed over a pool of worker processes, where each worker holds
+        its own instance of the estimator. Pools are kept alive and re-used in
+        subsequent calls until shutdown_pools() is called or the interpreter
+        exits. Worker processes require Python 3.8 or later.
+
         Args:
             self : instance of Estimator_cmi
             n_chunks : int [optional]
                 number of data chunks (default=1)
             options : dict [optional]
-                sets estimation parameters (default=None)
+                sets estimation parameters (default=None), additionally:
+
+                - 'n_jobs' - no. worker processes used for estimators that do
+                  not support parallel estimation, -1 uses all cores
+                  (default=1, no worker processes are used)
             re_use : list of keys [optional}
                 realisatins to be re-used (default=None)
             data: dict of numpy arrays
@@ -94,43 +115,154 @@ class Estimator(object):
         assert n_chunks > 0, 'n_chunks must be positive.'
         if re_use is None:
             re_use = []
+        if options is None:
+            options = {}
 
         # If the estimator supports parallel estimation, pass the variables
         # and number of chunks on to the estimator.
         if self.is_parallel:
-            for k in re_use:  # multiply data for re-use
+            for k in re_use:  # repeat data for re-use without copying
                 if data[k] is not None:
-                    data[k] = np.tile(data[k], (n_chunks, 1))
+                    data[k] = rv.Broadcast_realisations(data[k], n_chunks)
             return self.estimate(n_chunks=n_chunks, opts=options, **data)
 
         # If estimator does not support parallel estimation, loop over chunks
-        # and estimate iteratively for individual chunks.
+        # and estimate iteratively for individual chunks. If requested, spread
+        # the chunks over a pool of worker processes.
         else:
             assert data['var1'].shape[0] % n_chunks == 0, (
                     'No. chunks does not match data length.')
-            chunk_size = int(data['var1'].shape[0] / n_chunks)
-            idx_1 = 0
-            idx_2 = chunk_size
-            res = np.empty((n_chunks))
-            # Find arrays that have to be cut up into chunks because they are
-            # not re-used.
-            slice_vars = list(set(data.keys()).difference(set(re_use)))
-            i = 0
-            for c in range(n_chunks):
-                chunk_data = {}
-                for v in slice_vars:  # NOTE: I am consciously not creating a deep copy here to save memory
-                    if data[v] is not None:
-                        chunk_data[v] = data[v][idx_1:idx_2, :]
+            n_jobs = _get_n_jobs(options)
+            if n_jobs > 1 and n_chunks > 1:
+                return self._estimate_pool(n_jobs, n_chunks, options, re_use,
+                                           data)
+            return _estimate_serial(self, n_chunks, options, re_use, data)
+
+    def _estimate_pool(self, n_jobs, n_chunks, options, re_use, data):
+        """Estimate chunks in parallel using a pool of worker processes.
+
+        Chunks are distributed in batches over a process pool, whose workers
+        hold their own instance of the current estimator. Pools are kept alive
+        between calls, such that workers stay initialised (e.g., a running
+        JVM for JIDT estimators). Re-used realisations are copied once into
+        shared memory blocks, which are read by all workers, instead of being
+        sent to each worker with every batch.
+        """
+        pool = _get_pool(type(self), self.estimator_name, n_jobs)
+        chunk_size = data['var1'].shape[0] // n_chunks
+        shared = {}
+        try:
+            for v in re_use:
+                if data[v] is not None:
+                    shared[v] = _SharedArray.from_array(data[v])
+            # Split chunks into batches, use a few batches per worker to
+            # balance the load.
+            n_batches = min(n_chunks, 4 * n_jobs)
+            batches = np.array_split(np.arange(n_chunks), n_batches)
+            futures = []
+            for b in batches:
+                i_1 = b[0] * chunk_size
+                i_2 = (b[-1] + 1) * chunk_size
+                batch_data = {}
+                for v in data.keys():
+                    if v in shared:
+                        batch_data[v] = shared[v].descriptor()
+                    elif v in re_use or data[v] is None:
+                        batch_data[v] = data[v]
+                    elif isinstance(data[v], rv.Permuted_realisations):
+                        batch_data[v] = data[v].chunks(b[0], b[-1] + 1)
                     else:
-                        chunk_data[v] = data[v]
-                for v in re_use:
-                    chunk_data[v] = data[v]
-                res[i] = self.estimate(opts=options, **chunk_data)
-                idx_1 = idx_2
-                idx_2 += chunk_size
-                i += 1
+                        batch_data[v] = data[v][i_1:i_2, :]
+                futures.append(pool.submit(_estimate_batch, b.shape[0],
+                                           options, re_use, batch_data))
+            return np.hstack([f.result() for f in futures])
+        finally:
+            for s in shared.values():
+                s.close(unlink=True)
+
+    def estimate_mult_jobs(self, jobs, n_jobs=1, options=None, re_use=None,
+                           **shared_data):
+        """Estimate measure for multiple independent jobs concurrently.
+
+        Each job is a call to estimate_mult() with its own data and no.
+        chunks. Variables in shared_data are identical for all jobs (e.g., the
+        current value and conditioning set when creating surrogate tables for
+        multiple candidates). Jobs are run in a pool of worker processes or,
+        for OpenCL estimators, in a pool of threads, where each thread submits
+        to its own command queue. Shared variables are copied once into
+        shared memory blocks that are read by all worker processes.
+
+        Each job's noise is seeded by the job's seed (option 'noise_seed'),
+        such that results are identical for any no. jobs run concurrently,
+        including serial estimation (n_jobs=1).
 
-            return res
+        Args:
+            jobs : list of tuples
+                (n_chunks, seed, data) for each job, where data is a dict of
+                realisations not in shared_data
+            n_jobs : int [optional]
+                no. jobs run concurrently, -1 uses all cores (default=1)
+            options : dict [optional]
+                sets estimation parameters (default=None)
+            re_use : list of keys [optional]
+                realisations to be re-used within each job, see
+                estimate_mult() (default=None)
+            shared_data : dict of numpy arrays
+                realisations shared by all jobs
+
+        Yields:
+            int
+                index of the job in jobs
+            numpy array
+                estimates for each chunk of the job
+
+        Note:
+            Results are yielded as jobs complete, i.e., not necessarily in
+            the order of jobs.
+        """
+        if options is None:
+            options = {}
+        n_jobs = _resolve_n_jobs(n_jobs)
+        if n_jobs == 1 or len(jobs) < 2:
+            for (i, (n_chunks, seed, data)) in enumerate(jobs):
+                data = dict(data, **shared_data)
+                yield i, self.estimate_mult(n_chunks,
+                                            dict(options, noise_seed=seed),
+                                            re_use, **data)
+            return
+
+        # Workers estimate each job in a single process.
+        options = dict(options)
+        options.pop('n_jobs', None)
+        shared = {}
+        try:
+            if self.estimator_name.startswith('opencl'):
+                pool = _get_thread_pool(n_jobs)
+                futures = {pool.submit(self.estimate_mult, n_chunks,
+                                       dict(options, noise_seed=seed),
+                                       re_use, **dict(data, **shared_data)): i
+                           for (i, (n_chunks, seed, data)) in enumerate(jobs)}
+            else:
+                pool = _get_pool(type(self), self.estimator_name, n_jobs)
+                for v in shared_data.keys():
+                    if shared_data[v] is not None:
+                        shared[v] = _SharedArray.from_array(shared_data[v])
+                futures = {}
+                for (i, (n_chunks, seed, data)) in enumerate(jobs):
+                    job_data = dict(data)
+                    for v in shared_data.keys():
+                        if v in shared:
+                            job_data[v] = shared[v].descriptor()
+                        else:
+                            job_data[v] = shared_data[v]
+                    futures[pool.submit(_estimate_job, n_chunks,
+                                        dict(options, noise_seed=seed),
+                                        re_use, job_data)] = i
+            for f in as_completed(futures):
+                yield futures[f], f.result()
+        finally:
+            for s in shared.values():
+                s.close(unlink=True)
 
 
 class Estimator_te(Estimator):
@@ -195,3 +327,167 @@ class Estimator_mi(Estimator):
             self.add_estimator(estimator,
                                estimators_mi.is_parallel(estimator_name),
                                estimator_name)
+
+
+def _estimate_serial(estimator, n_chunks, options, re_use, data):
+    """Estimate measure for individual chunks iteratively."""
+    res = np.empty((n_chunks))
+    # Find arrays that have to be cut up into chunks because they are
+    # not re-used.
+    slice_vars = list(set(data.keys()).difference(set(re_use)))
+    i = 0
+    for c in range(n_chunks):
+        chunk_data = {}
+        for v in slice_vars:  # NOTE: I am consciously not creating a deep copy here to save memory
+            if data[v] is not None:
+                chunk_data[v] = rv.get_chunk(data[v], c, n_chunks)
+            else:
+                chunk_data[v] = data[v]
+        for v in re_use:
+            chunk_data[v] = data[v]
+        res[i] = estimator.estimate(opts=options, **chunk_data)
+        i += 1
+
+    return res
+
+
+def _get_n_jobs(options):
+    """Get no. worker processes requested in the options."""
+    return _resolve_n_jobs(options.get('n_jobs', 1))
+
+
+def _resolve_n_jobs(n_jobs):
+    """Get no. worker processes, where negative values count from all cores."""
+    if n_jobs is None:
+        return 1
+    n_jobs = int(n_jobs)
+    if n_jobs < 0:  # -1 uses all cores, -2 all but one, etc.
+        n_jobs = max(os.cpu_count() + 1 + n_jobs, 1)
+    assert n_jobs > 0, 'n_jobs must be positive or negative, not 0.'
+    return n_jobs
+
+
+# Process pools and the estimator instance living in each worker process.
+# Pools are created on first use and re-used for all subsequent calls with the
+# same estimator and no. jobs until shutdown_pools() is called.
+_pools = {}
+_worker_estimator = None
+
+
+def shutdown_pools():
+    """Shut down all worker pools and release their processes.
+
+    Worker processes (each possibly running its own JVM) are kept alive
+    between estimations. Pools are shut down when the interpreter exits, call
+    this function to release workers earlier, e.g., after an analysis. New
+    pools are created on the next parallel estimation.
+    """
+    while _pools:
+        _pools.popitem()[1].shutdown(wait=True)
+
+
+atexit.register(shutdown_pools)
+
+
+def _get_pool(estimator_class, estimator_name, n_jobs):
+    """Return a (cached) process pool for an estimator."""
+    key = (estimator_class, estimator_name, n_jobs)
+    if key not in _pools:
+        # Use 'spawn' to start workers: forking a process that runs a JVM is
+        # not safe.
+        _pools[key] = ProcessPoolExecutor(
+                                    max_workers=n_jobs,
+                                    mp_context=mp.get_context('spawn'),
+                                    initializer=_init_worker,
+                                    initargs=(estimator_class, estimator_name))
+    return _pools[key]
+
+
+def _get_thread_pool(n_jobs):
+    """Return a (cached) thread pool."""
+    key = ('threads', n_jobs)
+    if key not in _pools:
+        _pools[key] = ThreadPoolExecutor(max_workers=n_jobs)
+    return _pools[key]
+
+
+def _init_worker(estimator_class, estimator_name):
+    """Create the estimator used by a worker process."""
+    global _worker_estimator
+    _worker_estimator = estimator_class(estimator_name)
+
+
+def _estimate_batch(n_chunks, options, re_use, data):
+    """Estimate a batch of chunks in a worker process."""
+    shared = []
+    try:
+        for v in data.keys():
+            if isinstance(data[v], _SharedArray):
+                shared.append(data[v])
+                data[v] = data[v].attach()
+        return _estimate_serial(_worker_estimator, n_chunks, options, re_use,
+                                data)
+    finally:
+        data.clear()  # release views into shared memory before closing
+        for s in shared:
+            s.close()
+
+
+def _estimate_job(n_chunks, options, re_use, data):
+    """Estimate all chunks of a job in a worker process."""
+    shared = []
+    try:
+        for v in data.keys():
+            if isinstance(data[v], _SharedArray):
+                shared.append(data[v])
+                data[v] = data[v].attach()
+        return _worker_estimator.estimate_mult(n_chunks, options, re_use,
+                                               **data)
+    finally:
+        data.clear()  # release views into shared memory before closing
+        for s in shared:
+            s.close()
+
+
+class _SharedArray(object):
+    """Numpy array held in a shared memory block.
+
+    Only the name, shape, and dtype of the block are pickled when the object
+    is sent to another process, where the array is accessed through attach().
+    """
+
+    def __init__(self, name, shape, dtype):
+        self.name = name
+        self.shape = shape
+        self.dtype = dtype
+        self._shm = None
+
+    @classmethod
+    def from_array(cls, array):
+        """Copy an array into a new shared memory block."""
+        from multiprocessing import shared_memory  # requires Python >= 3.8
+        shm = shared_memory.SharedMemory(create=True,
+                                         size=max(array.nbytes, 1))
+        shared = cls(shm.name, array.shape, array.dtype)
+        shared._shm = shm
+        shared.attach()[:] = array
+        return shared
+
+    def descriptor(self):
+        """Return a copy that can be sent to other processes."""
+        return _SharedArray(self.name, self.shape, self.dtype)
+
+    def attach(self):
+        """Return the array backed by the shared memory block."""
+        if self._shm is None:
+            from multiprocessing import shared_memory
+            self._shm = shared_memory.SharedMemory(name=self.name)
+        return np.ndarray(self.shape, dtype=self.dtype, buffer=self._shm.buf)
+
+    def close(self, unlink=False):
+        """Close access to the shared memory block, unlink if requested."""
+        if self._shm is not None:
+            self._shm.close()
+            if unlink:
+                self._shm.unlink()
+            self._shm = None
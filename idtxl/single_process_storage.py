@@ -39,6 +39,22 @@ class Single_process_storage(Network_analysis):
               'min_stat', 'mi' (default=500)
             - 'alpha_*' - critical alpha level for statistical significance,
               where * can be 'max_stat', 'min_stat', 'mi' (default=0.05)
+            - 'adaptive_perm' - stop permutation tests early once the
+              p-value's confidence interval is clearly above or below alpha,
+              see the stats module for details (default=False)
+            - 'analytic_null' - test against the asymptotic chi-square null
+              distribution instead of surrogates, requires the 'gaussian' or
+              'discrete' estimator (default=False)
+            - 'surr_cache' - re-use surrogates between rounds of candidate
+              selection, can be 'off', 'exact', 'reuse', or 'refresh', see
+              stats.Surrogate_cache for the statistical semantics
+              (default='exact')
+            - 'n_jobs_candidates' - no. candidates whose surrogates are
+              estimated concurrently, -1 uses all cores (default=1)
+            - 'seed' - seed for all permutations and noise used in the
+              analysis, int or numpy SeedSequence; each target is analysed
+              with an independent random stream (default=None, use numpy's
+              global random state)
             - 'cmi_calc_name' - estimator to be used for CMI calculation. Note
               that this estimator is also used to estimate MI later on.
               (For estimator options see the respective documentation.)
@@ -46,6 +62,9 @@ class Single_process_storage(Network_analysis):
               conditionals when estimating AIS; can be a list of
               variables, where each variable is described as (idx process, lag
               wrt to current value)
+            - 'plan_calibration' - no. CMI estimations timed before a network
+              analysis to estimate its run time, 0 skips the calibration
+              (default=10)
 
     Attributes:
         selected_vars_full : list of tuples
@@ -115,6 +134,11 @@ class Single_process_storage(Network_analysis):
             For more details on the estimation of active information storage
             see documentation of class method 'analyse_single_process'.
 
+        Before any process is analysed, all permutation tests are checked for
+        feasibility and the no. CMI estimations and run time of the analysis
+        are estimated and printed (see Network_analysis._plan_analysis()).
+        The plan is kept in attribute 'plan'.
+
         Args:
             data : Data instance
                 raw data for analysis
@@ -132,6 +156,8 @@ class Single_process_storage(Network_analysis):
         else:
             ValueError('Processes were not specified correctly: {0}.'.format(
                                                                     processes))
+        self.plan = self._plan_analysis(data, processes,
+                                        [None for p in processes])
 
         # Perform AIS estimation for each target individually.
         results = {}
@@ -206,7 +232,8 @@ class Single_process_storage(Network_analysis):
             'selected_vars': self._idx_to_lag(self.selected_vars_full),
             'ais': self.ais,
             'ais_pval': self.pvalue,
-            'ais_sign': self.sign}
+            'ais_sign': self.sign,
+            'perm_tests': self._perm_tests}
         return results
 
     def _initialise(self, data, process):
@@ -230,6 +257,9 @@ class Single_process_storage(Network_analysis):
         # Check the permutation type and no. permutations requested by the
         # user. This tests if there is sufficient data to do all tests.
         # surrogates.check_permutations(self, data)
+        self._perm_tests = []  # decision rules of all permutation tests
+        self._surr_cache = None  # surrogates are not re-used across targets
+        self._init_random_stream(self.process)
 
         # Reset all attributes to inital values if the instance has been used
         # before.
@@ -419,6 +449,40 @@ class Single_process_storage(Network_analysis):
         self.sign = s
         self.pvalue = p
 
+    def _permutation_tests(self):
+        """Return the no. permutations and alpha level of each test."""
+        return {
+            'max_stat': (self.options.get('n_perm_max_stat', 21),
+                         self.options.get('alpha_max_stat', 0.05)),
+            'min_stat': (self.options.get('n_perm_min_stat', 21),
+                         self.options.get('alpha_min_stat', 0.05)),
+            'mi': (self.options.get('n_perm_mi', 500),
+                   self.options.get('alpha_mi', 0.05))}
+
+    def _plan_candidates(self, process, sources, n_processes):
+        """Return current value and candidates of a process.
+
+        AIS is estimated without sources, such that the set of target
+        candidates (conditional) is empty and all candidates are tested.
+        """
+        current_value = (process, self.max_lag)
+        samples = np.arange(current_value[1] - 1,
+                            current_value[1] - self.max_lag - 1, -self.tau)
+        candidates = [(process, s) for s in samples]
+        return current_value, [], candidates
+
+    def _n_estimations(self, n_target, n_candidates, n_perm):
+        """Return the min. and max. no. CMI estimations for one process.
+
+        At least one round of candidate selection is needed. At most, all
+        candidates are included and pruned one by one and AIS is tested.
+        """
+        n_rounds = n_candidates * (n_candidates + 1) // 2
+        n_min = n_candidates * (n_perm['max_stat'] + 1)
+        n_max = (n_rounds * (n_perm['max_stat'] + n_perm['min_stat'] + 2) +
+                 n_perm['mi'] + 1)
+        return n_min, n_max
+
     def _define_candidates(self):
         """Build a list of candidate indices.
 
@@ -1,14 +1,82 @@
 """Provide statistics functions.
 
+All permutation tests can be run in an adaptive mode, where surrogates are
+created and estimated in batches and testing stops as soon as the
+Clopper-Pearson confidence interval of the p-value lies entirely above or
+below the critical alpha level (see _permutation_test()). Set the following
+in the analysis options:
+
+    - 'adaptive_perm' - stop permutation tests early (default=False)
+    - 'adaptive_batch_size' - no. surrogates added per batch (default=20)
+    - 'adaptive_conf' - confidence level of the p-value's confidence
+      interval over all batches of a test, which is split over the batches
+      (default=0.99)
+
+Each test's decision rule and the no. surrogates used are appended to the
+analysis' list of permutation tests, which is returned as 'perm_tests' in
+the results.
+
+Surrogate values for the candidates tested during candidate selection are
+cached by the analysis and re-used between rounds (see Surrogate_cache). Set
+the following in the analysis options:
+
+    - 'surr_cache' - cache policy, 'off', 'exact', 'reuse', or 'refresh'
+      (default='exact')
+    - 'surr_refresh_fraction' - fraction of cached surrogates re-estimated
+      per round for policy 'refresh' (default=0.2)
+    - 'n_jobs_candidates' - no. candidates whose surrogates are estimated
+      concurrently, -1 uses all cores (default=1)
+
+If the data contain too few replications to create the requested no.
+surrogates by permuting replications, samples are permuted over time within
+replications (see surrogates.permute_over_time()). Set the following in the
+analysis options:
+
+    - 'perm_type' - 'random', 'local', 'blocks', or 'circular'
+      (default='local')
+    - 'perm_range' - range over which samples are permuted for type 'local'
+      (default='max', permute over whole replications)
+    - 'block_size', 'swap_range' - no. samples per block and range in blocks
+      over which blocks are swapped for type 'blocks'
+    - 'max_shift' - max. no. samples by which time series are shifted for
+      type 'circular' (default=no. samples per replication - 1)
+
+If the analysis is seeded ('seed' in the analysis options), all permutations
+and the noise added by estimators are drawn from independent random streams
+(see idtxl_utils.seed_sequence()). Streams are identified by the target, the
+test, the candidate, and the index of the first surrogate of a batch, such
+that results do not depend on the order of computation, e.g., they are
+identical for serial and concurrent estimation of candidates. Unseeded
+analyses draw from numpy's global random state.
+
+For the 'gaussian' and 'discrete' estimators, tests can alternatively use
+the asymptotic null distribution of the (conditional) mutual information
+instead of surrogate data (see _analytic_test()). Set 'analytic_null' to
+True in the analysis options to test without creating any surrogates.
+
+Network analyses check all permutation tests before the analysis starts (see
+plan_permutation_tests()). The permutation type of a test is chosen once for
+its full no. permutations, such that all batches of an adaptive test are
+created the same way.
+
 Created on Mon Mar  7 18:13:27 2016
 
 @author: patricia
 """
 import copy as cp
 import numpy as np
+from scipy.stats import beta, binom, chi2
 from . import idtxl_utils as utils
+from . import realisation_views as rv
+from . import surrogates
 
 VERBOSE = True
+# Keys of the random streams used by the tests (see idtxl_utils.get_rng()).
+_STREAM_CANDIDATES = 0
+_STREAM_OMNIBUS = 1
+_STREAM_MI = 2
+_STREAM_NOISE = 3
+_ANALYTIC_INFO = {'n_perm': 0, 'decision': 'analytic'}
 
 
 def network_fdr(results, alpha=0.05, correct_by_target=True):
@@ -42,25 +110,21 @@ def network_fdr(results, alpha=0.05, correct_by_target=True):
     res = cp.copy(results)
 
     # Get candidates and their test results from the results dictionary, i.e.,
-    # collect results over targets.
-    pval = np.arange(0)
-    target_idx = np.arange(0).astype(int)
-    cands = []
+    # collect results over targets into pre-allocated arrays.
+    targets = [t for t in res.keys() if res[t]['omnibus_sign']]
     if correct_by_target:  # correct p-value of whole target (all candidates)
-        for target in res.keys():
-            if not res[target]['omnibus_sign']:  # skip if not significant
-                continue
-            pval = np.append(pval, res[target]['omnibus_pval'])
-            target_idx = np.append(target_idx, target)
+        pval = np.array([np.squeeze(res[t]['omnibus_pval']) for t in targets],
+                        dtype=float)
+        target_idx = np.array(targets, dtype=int)
     else:   # correct p-value of single candidates
-        for target in res.keys():
-            if not res[target]['omnibus_sign']:  # skip if not significant
-                continue
-            n_sign = res[target]['cond_sources_pval'].size
-            pval = np.append(pval, res[target]['cond_sources_pval'])
-            target_idx = np.append(target_idx,
-                                   np.ones(n_sign) * target).astype(int)
-            cands = cands + res[target]['selected_vars_sources']
+        n_sign = np.array([res[t]['cond_sources_pval'].size for t in targets],
+                          dtype=int)
+        pval = np.empty(n_sign.sum())
+        target_idx = np.repeat(np.array(targets, dtype=int), n_sign)
+        i_1 = 0
+        for (t, n) in zip(targets, n_sign):
+            pval[i_1:i_1 + n] = res[t]['cond_sources_pval']
+            i_1 += n
 
     if pval.size == 0:
         print('No links in final results. Return ...')
@@ -68,48 +132,50 @@ def network_fdr(results, alpha=0.05, correct_by_target=True):
 
     # Sort all p-values in ascending order.
     sort_idx = np.argsort(pval)
-    pval.sort()
 
     # Calculate threshold (exact or by approximating the harmonic sum).
     n = pval.size
     if n < 1000:
         thresh = ((np.arange(1, n + 1) / n) * alpha /
-                  sum(1 / np.arange(1, n + 1)))
+                  np.sum(1 / np.arange(1, n + 1)))
     else:
         thresh = ((np.arange(1, n + 1) / n) * alpha /
                   (np.log(n) + np.e))  # aprx. harmonic sum with Euler's number
 
     # Compare data to threshold.
-    sign = pval <= thresh
-    if np.invert(sign).any():
-        first_false = np.where(np.invert(sign))[0][0]
-        sign[first_false:] = False  # avoids false positives due to equal pvals
-
-    # Go over list of all candidates and remove them from the results dict.
-    sign = sign[sort_idx]
-    for s in range(sign.shape[0]):
-        if sign[s]:
-            continue
-        else:  # remove non-significant candidate and it's p-value from results
-            if correct_by_target:
-                t = target_idx[s]
-                res[t]['selected_vars_full'] = res[t]['selected_vars_target']
-                res[t]['cond_sources_te'] = None
-                res[t]['cond_sources_pval'] = None
-                res[t]['selected_vars_sources'] = []
-                res[t]['omnibus_pval'] = 1
-                res[t]['omnibus_sign'] = False
-            else:
-                t = target_idx[s]
-                cand = cands[s]
-                cand_ind = res[t]['selected_vars_sources'].index(cand)
-                res[t]['selected_vars_sources'].pop(cand_ind)
-                res[t]['cond_sources_pval'] = np.delete(
-                                    res[t]['cond_sources_pval'], cand_ind)
-                res[t]['cond_sources_te'] = np.delete(
-                                    res[t]['cond_sources_te'], cand_ind)
-                res[t]['selected_vars_full'].pop(
-                                    res[t]['selected_vars_full'].index(cand))
+    sign_sorted = pval[sort_idx] <= thresh
+    if not sign_sorted.all():  # avoids false positives due to equal pvals
+        sign_sorted[np.argmin(sign_sorted):] = False
+    sign = np.empty(n, dtype=bool)  # back to the original order
+    sign[sort_idx] = sign_sorted
+
+    # Remove non-significant targets or candidates and their p-values from
+    # the results dict.
+    if correct_by_target:
+        for t in target_idx[np.invert(sign)]:
+            res[t]['selected_vars_full'] = res[t]['selected_vars_target']
+            res[t]['cond_sources_te'] = None
+            res[t]['cond_sources_pval'] = None
+            res[t]['selected_vars_sources'] = []
+            res[t]['omnibus_pval'] = 1
+            res[t]['omnibus_sign'] = False
+    else:
+        i_1 = 0
+        for (t, n) in zip(targets, n_sign):
+            keep = sign[i_1:i_1 + n]
+            i_1 += n
+            if keep.all():
+                continue
+            removed = [c for (c, k) in zip(res[t]['selected_vars_sources'],
+                                           keep) if not k]
+            res[t]['selected_vars_sources'] = [
+                    c for (c, k) in zip(res[t]['selected_vars_sources'], keep)
+                    if k]
+            res[t]['cond_sources_pval'] = res[t]['cond_sources_pval'][keep]
+            res[t]['cond_sources_te'] = res[t]['cond_sources_te'][keep]
+            res[t]['selected_vars_full'] = [
+                    v for v in res[t]['selected_vars_full']
+                    if v not in removed]
     return res
 
 
@@ -132,8 +198,15 @@ def omnibus_test(analysis_setup, data, opts=None):
 
             - 'n_perm_omnibus' - number of permutations (default=500)
             - 'alpha_omnibus' - critical alpha level (default=0.05)
+            - 'adaptive_perm', 'adaptive_batch_size', 'adaptive_conf' -
+              settings for adaptive testing (see module documentation)
             - 'perm_range' - permutation range if permutation over samples is
               used to create surrogates (default='max')
+            - 'perm_type', 'block_size', 'swap_range', 'max_shift' -
+              settings for permutations over samples (see module
+              documentation)
+            - 'analytic_null' - test against the asymptotic null
+              distribution instead of surrogates (default=False)
 
     Returns:
         bool
@@ -145,7 +218,9 @@ def omnibus_test(analysis_setup, data, opts=None):
         opts = {}
     n_permutations = opts.get('n_perm_omnibus', 21)
     alpha = opts.get('alpha_omnibus', 0.05)
-    perm_range = opts.get('perm_range_omnibus', 'max')
+    perm_settings = _time_permutation_settings(
+                        opts, opts.get('perm_range_omnibus', 'max'))
+    permute_replications = _sufficient_replications(data, n_permutations)
     print('no. target sources: {0}, no. sources: {1}'.format(
                                     len(analysis_setup.selected_vars_target),
                                     len(analysis_setup.selected_vars_sources)))
@@ -162,6 +237,13 @@ def omnibus_test(analysis_setup, data, opts=None):
                             var2=analysis_setup._current_value_realisations,
                             conditional=cond_target_realisations,
                             opts=analysis_setup.options)
+    if opts.get('analytic_null', False):
+        [significance, pvalue] = _analytic_test(
+                    analysis_setup, te_orig,
+                    (len(analysis_setup.selected_vars_sources), 1,
+                     len(analysis_setup.selected_vars_target)), alpha)
+        _log_permutation_test(analysis_setup, 'omnibus_test', _ANALYTIC_INFO)
+        return significance, pvalue, te_orig
 
     # Create the surrogate distribution by permuting the conditional sources.
     if VERBOSE:
@@ -185,20 +267,28 @@ def omnibus_test(analysis_setup, data, opts=None):
         i_1 = i_2
         i_2 += data.n_realisations(analysis_setup.current_value)
         '''
-    surr_cond_real = _generate_surrogates(data,
-                                          analysis_setup.current_value,
-                                          analysis_setup.selected_vars_sources,
-                                          n_permutations,
-                                          perm_range)
-
-    surr_distribution = analysis_setup._cmi_calculator.estimate_mult(
-                            n_chunks=n_permutations,
-                            options=analysis_setup.options,
+    def surrogate_te(n_perm, first_perm):
+        surr_cond_real = _surrogate_view(data,
+                                         analysis_setup.current_value,
+                                         analysis_setup.selected_vars_sources,
+                                         n_perm,
+                                         perm_settings,
+                                         _get_rng(analysis_setup,
+                                                  _STREAM_OMNIBUS, first_perm),
+                                         permute_replications)
+        return analysis_setup._cmi_calculator.estimate_mult(
+                            n_chunks=n_perm,
+                            options=_noise_options(
+                                analysis_setup, _STREAM_OMNIBUS, first_perm),
                             re_use=['var2', 'conditional'],
                             var1=surr_cond_real,
                             var2=analysis_setup._current_value_realisations,
-                            conditional=cond_target_realisations)
-    [significance, pvalue] = _find_pvalue(te_orig, surr_distribution, alpha)
+                            conditional=cond_target_realisations)[np.newaxis]
+
+    [significance, pvalue, surr_table, test_info] = _permutation_test(
+                                            te_orig, surrogate_te, _first_row,
+                                            n_permutations, alpha, opts)
+    _log_permutation_test(analysis_setup, 'omnibus_test', test_info)
     if VERBOSE:
         if significance:
             print(' -- significant')
@@ -228,6 +318,10 @@ def max_statistic(analysis_setup, data, candidate_set, te_max_candidate,
 
             - 'n_perm_max_stat' - number of permutations (default=500)
             - 'alpha_max_stat' - critical alpha level (default=0.05)
+            - 'adaptive_perm', 'adaptive_batch_size', 'adaptive_conf' -
+              settings for adaptive testing (see module documentation)
+            - 'analytic_null' - test against the asymptotic null
+              distribution instead of surrogates (default=False)
 
     Returns:
         bool
@@ -235,19 +329,28 @@ def max_statistic(analysis_setup, data, candidate_set, te_max_candidate,
         float
             the test's p-value
         numpy array
-            surrogate table
+            surrogate table, None if 'analytic_null' is set
     """
     if opts is None:
         opts = {}
     n_perm = opts.get('n_perm_max_stat', 21)
     alpha = opts.get('alpha_max_stat', 0.05)
     assert(candidate_set), 'The candidate set is empty.'
-
-    surr_table = _create_surrogate_table(analysis_setup, data, candidate_set,
-                                         n_perm)
-    max_distribution = _find_table_max(surr_table)
-    [significance, pvalue] = _find_pvalue(te_max_candidate, max_distribution,
-                                          alpha)
+    if opts.get('analytic_null', False):
+        [significance, pvalue] = _analytic_test(
+                    analysis_setup, te_max_candidate,
+                    (1, 1, len(analysis_setup.selected_vars_full)), alpha,
+                    rank=1, n_tests=len(candidate_set))
+        _log_permutation_test(analysis_setup, 'max_statistic', _ANALYTIC_INFO)
+        return significance, pvalue, None
+
+    [significance, pvalue, surr_table, test_info] = _permutation_test(
+                te_max_candidate,
+                lambda n, first: _create_surrogate_table(
+                                analysis_setup, data, candidate_set, n, first,
+                                _sufficient_replications(data, n_perm)),
+                _find_table_max, n_perm, alpha, opts)
+    _log_permutation_test(analysis_setup, 'max_statistic', test_info)
     return significance, pvalue, surr_table
 
 
@@ -277,6 +380,10 @@ def max_statistic_sequential(analysis_setup, data, opts=None):
             - 'n_perm_max_seq' - number of permutations
               (default='n_perm_min_stat'|500)
             - 'alpha_max_seq' - critical alpha level (default=0.05)
+            - 'adaptive_perm', 'adaptive_batch_size', 'adaptive_conf' -
+              settings for adaptive testing (see module documentation)
+            - 'analytic_null' - test against the asymptotic null
+              distribution instead of surrogates (default=False)
 
     Returns:
         numpy array, bool
@@ -332,32 +439,69 @@ def max_statistic_sequential(analysis_setup, data, opts=None):
     individual_te_sorted = utils.sort_descending(individual_te)
 
     # Re-use or create surrogate table and sort it, this saves some time
-    if (analysis_setup._min_stats_surr_table is not None and
+    if opts.get('analytic_null', False):
+        n_sources = len(analysis_setup.selected_vars_sources)
+        significance = np.zeros(n_sources).astype(bool)
+        pvalue = np.ones(n_sources)
+        for c in range(n_sources):
+            [significance[c], pvalue[c]] = _analytic_test(
+                    analysis_setup, individual_te_sorted[c],
+                    (1, 1, len(analysis_setup.selected_vars_full) - 1), alpha,
+                    rank=c + 1, n_tests=n_sources)
+            if not significance[c]:
+                break
+        test_info = _ANALYTIC_INFO
+    elif (analysis_setup._min_stats_surr_table is not None and
             n_permutations <= analysis_setup._min_stats_surr_table.shape[1]):
         surr_table = analysis_setup._min_stats_surr_table[:, :n_permutations]
         assert len(analysis_setup.selected_vars_sources) == surr_table.shape[0]
+        [significance, pvalue] = _sequential_pvalues(individual_te_sorted,
+                                                     surr_table, alpha)
+        test_info = {'n_perm': n_permutations, 'decision': 'reused_table'}
+    elif opts.get('adaptive_perm', False):
+        # Add batches of surrogates until the test of each rank up to the
+        # first non-significant rank is decided.
+        batch_size = opts.get('adaptive_batch_size', 20)
+        conf = _look_conf(opts.get('adaptive_conf', 0.99), n_permutations,
+                          batch_size)
+        surr_table = np.empty((len(analysis_setup.selected_vars_sources), 0))
+        while surr_table.shape[1] < n_permutations:
+            n_perm = min(batch_size, n_permutations - surr_table.shape[1])
+            surr_table = np.hstack((surr_table, _create_surrogate_table(
+                                        analysis_setup,
+                                        data,
+                                        analysis_setup.selected_vars_sources,
+                                        n_perm,
+                                        first_perm=surr_table.shape[1],
+                                        permute_replications=(
+                                            _sufficient_replications(
+                                                data, n_permutations)))))
+            if surr_table.shape[1] == n_permutations:
+                break
+            if _sequential_decided(individual_te_sorted, surr_table, alpha,
+                                   conf):
+                break
+        [significance, pvalue] = _sequential_pvalues(
+                                        individual_te_sorted, surr_table,
+                                        alpha, adaptive=True, conf=conf)
+        test_info = {'n_perm': surr_table.shape[1],
+                     'decision': ('n_perm_exhausted'
+                                  if surr_table.shape[1] == n_permutations
+                                  else 'ci_decided')}
     else:
         surr_table = _create_surrogate_table(
                                         analysis_setup,
                                         data,
                                         analysis_setup.selected_vars_sources,
-                                        n_permutations)
-    max_distribution = _sort_table_max(surr_table)
-
-    # Compare each TE value with the distribution of the same rank, starting
-    # with the highest TE.
-    significance = np.zeros(individual_te.shape[0]).astype(bool)
-    pvalue = np.ones(individual_te.shape[0])
-    for c in range(individual_te.shape[0]):
-        [s, p] = _find_pvalue(individual_te_sorted[c],
-                              max_distribution[c, ], alpha)
-        significance[c] = s
-        pvalue[c] = p
-        if not s:  # break as soon as a candidate is no longer significant
-            if VERBOSE:
-                print('Stopping sequential max stats at candidate with rank '
-                      '{0}.'.format(c))
-            break
+                                        n_permutations,
+                                        permute_replications=(
+                                            _sufficient_replications(
+                                                data, n_permutations)))
+        [significance, pvalue] = _sequential_pvalues(individual_te_sorted,
+                                                     surr_table, alpha)
+        test_info = {'n_perm': n_permutations, 'decision': 'fixed'}
+    _log_permutation_test(analysis_setup, 'max_statistic_sequential',
+                          test_info)
 
     # Get back original order and return results.
     significance = significance[selected_vars_order]
@@ -387,6 +531,10 @@ def min_statistic(analysis_setup, data, candidate_set, te_min_candidate,
 
             - 'n_perm_min_stat' - number of permutations (default=500)
             - 'alpha_min_stat' - critical alpha level (default=0.05)
+            - 'adaptive_perm', 'adaptive_batch_size', 'adaptive_conf' -
+              settings for adaptive testing (see module documentation)
+            - 'analytic_null' - test against the asymptotic null
+              distribution instead of surrogates (default=False)
 
     Returns:
         bool
@@ -394,19 +542,28 @@ def min_statistic(analysis_setup, data, candidate_set, te_min_candidate,
         float
             the test's p-value
         numpy array
-            surrogate table
+            surrogate table, None if 'analytic_null' is set
     """
     if opts is None:
         opts = {}
     n_perm = opts.get('n_perm_min_stat', 21)
     alpha = opts.get('alpha_min_stat', 0.05)
     assert(candidate_set), 'The candidate set is empty.'
-
-    surr_table = _create_surrogate_table(analysis_setup, data, candidate_set,
-                                         n_perm)
-    min_distribution = _find_table_min(surr_table)
-    [significance, pvalue] = _find_pvalue(te_min_candidate, min_distribution,
-                                          alpha)
+    if opts.get('analytic_null', False):
+        [significance, pvalue] = _analytic_test(
+                    analysis_setup, te_min_candidate,
+                    (1, 1, len(analysis_setup.selected_vars_full) - 1), alpha,
+                    rank=len(candidate_set), n_tests=len(candidate_set))
+        _log_permutation_test(analysis_setup, 'min_statistic', _ANALYTIC_INFO)
+        return significance, pvalue, None
+
+    [significance, pvalue, surr_table, test_info] = _permutation_test(
+                te_min_candidate,
+                lambda n, first: _create_surrogate_table(
+                                analysis_setup, data, candidate_set, n, first,
+                                _sufficient_replications(data, n_perm)),
+                _find_table_min, n_perm, alpha, opts)
+    _log_permutation_test(analysis_setup, 'min_statistic', test_info)
     return significance, pvalue, surr_table
 
 
@@ -428,10 +585,17 @@ def mi_against_surrogates(analysis_setup, data, opts=None):
 
             - 'n_perm_mi' - number of permutations (default=500)
             - 'alpha_mi' - critical alpha level (default=0.05)
+            - 'adaptive_perm', 'adaptive_batch_size', 'adaptive_conf' -
+              settings for adaptive testing (see module documentation)
             - 'tail_mi' - tail for testing, can be 'one' or 'two'
               (default='one')
             - 'perm_range' - permutation range if permutation over samples is
               used to create surrogates (default='max')
+            - 'perm_type', 'block_size', 'swap_range', 'max_shift' -
+              settings for permutations over samples (see module
+              documentation)
+            - 'analytic_null' - test against the asymptotic null
+              distribution instead of surrogates (default=False)
 
     Returns:
         float
@@ -446,7 +610,7 @@ def mi_against_surrogates(analysis_setup, data, opts=None):
     n_perm = analysis_setup.options.get('n_perm_mi', 500)
     alpha = analysis_setup.options.get('alpha_mi', 0.05)
     tail = analysis_setup.options.get('tail_mi', 'one')
-    perm_range = analysis_setup.options.get('perm_range', 'max')
+    perm_settings = _time_permutation_settings(analysis_setup.options)
     '''
     surr_realisations = np.empty(
                         (data.n_realisations(analysis_setup.current_value) *
@@ -475,38 +639,436 @@ def mi_against_surrogates(analysis_setup, data, opts=None):
                                             analysis_setup.current_value,
                                             [analysis_setup.current_value])
         '''
-    surr_realisations = _generate_surrogates(data,
-                                             analysis_setup.current_value,
-                                             [analysis_setup.current_value],
-                                             n_perm,
-                                             perm_range)
-
-    surr_dist = analysis_setup._cmi_calculator.estimate_mult(
+    def surrogate_mi(n_perm, first_perm):
+        surr_realisations = _surrogate_view(data,
+                                            analysis_setup.current_value,
+                                            [analysis_setup.current_value],
+                                            n_perm,
+                                            perm_settings,
+                                            _get_rng(analysis_setup,
+                                                     _STREAM_MI, first_perm),
+                                            permute_replications)
+        return analysis_setup._cmi_calculator.estimate_mult(
                             n_chunks=n_perm,
-                            options=analysis_setup.options,
+                            options=_noise_options(
+                                analysis_setup, _STREAM_MI, first_perm),
                             re_use=['var2'],
                             var1=surr_realisations,
                             var2=analysis_setup._selected_vars_realisations,
-                            conditional=None)
+                            conditional=None)[np.newaxis]
+
     orig_mi = analysis_setup._cmi_calculator.estimate(
                             opts=analysis_setup.options,
                             var1=analysis_setup._current_value_realisations,
                             var2=analysis_setup._selected_vars_realisations,
                             conditional=None
                             )
-    [significance, p_value] = _find_pvalue(statistic=orig_mi,
-                                           distribution=surr_dist,
-                                           alpha=alpha,
-                                           tail=tail)
+    if analysis_setup.options.get('analytic_null', False):
+        [significance, p_value] = _analytic_test(
+                    analysis_setup, orig_mi,
+                    (1, analysis_setup._selected_vars_realisations.shape[1],
+                     0),
+                    alpha, tail=tail)
+        _log_permutation_test(analysis_setup, 'mi_against_surrogates',
+                              _ANALYTIC_INFO)
+        return [orig_mi, significance, p_value]
+    permute_replications = _sufficient_replications(data, n_perm)
+    [significance, p_value, surr_table, test_info] = _permutation_test(
+                                    orig_mi, surrogate_mi, _first_row, n_perm,
+                                    alpha, analysis_setup.options, tail)
+    _log_permutation_test(analysis_setup, 'mi_against_surrogates', test_info)
     return [orig_mi, significance, p_value]
 
 
-def _create_surrogate_table(analysis_setup, data, idx_test_set, n_perm):
+def plan_permutation_tests(data, current_value, tests, opts=None):
+    """Check the permutation tests of an analysis before running them.
+
+    Check for each test if the requested no. permutations can be realised
+    with the data and if it is high enough to reach the test's alpha level.
+    Surrogates are created by permuting replications if reps! > n_perm, and
+    by permuting samples over time (as specified by 'perm_type' and its
+    parameters in the options) otherwise.
+
+    Args:
+        data : Data instance
+            raw data for analysis
+        current_value : tuple
+            index of the current value, has to have the form (idx process,
+            idx sample)
+        tests : dict
+            requested tests, keys are test names ('max_stat', 'min_stat',
+            'omnibus', 'max_seq', 'mi'), values are tuples (no. permutations,
+            alpha level)
+        opts : dict [optional]
+            analysis options, see module documentation (default=None)
+
+    Returns:
+        dict
+            the plan for each test, keys are test names, values are dicts
+            with keys 'n_perm', 'alpha', 'permutation' ('replications', the
+            perm_type used to permute samples, or 'analytic' if
+            'analytic_null' is set), and 'n_available' (no. permutations that
+            can be drawn, counting is stopped above 10^9)
+
+    Raises:
+        RuntimeError
+            if any test is infeasible, all infeasible tests are listed in the
+            error message
+    """
+    if opts is None:
+        opts = {}
+    perm_settings = _time_permutation_settings(opts)
+    perm_type = perm_settings.pop('perm_type')
+    n_per_repl = data.n_realisations_samples(current_value)
+    count_limit = 10 ** 9
+    plan = {}
+    errors = []
+    for (test, (n_perm, alpha)) in tests.items():
+        if opts.get('analytic_null', False):
+            plan[test] = {'n_perm': 0, 'alpha': alpha,
+                          'permutation': 'analytic', 'n_available': None}
+            continue
+        if _sufficient_replications(data, n_perm):
+            permutation = 'replications'
+            n_available = surrogates.n_permutations(data.n_replications,
+                                                    limit=count_limit)
+        else:
+            permutation = perm_type
+            settings = dict(perm_settings)
+            if test == 'omnibus':  # see omnibus_test()
+                settings['perm_range'] = opts.get('perm_range_omnibus', 'max')
+            try:
+                n_available = surrogates.n_permutations(
+                                n_per_repl, perm_type, count_limit, **settings)
+            except (KeyError, ValueError) as err:
+                errors.append('{0}: {1}'.format(test, err))
+                continue
+            if n_available <= n_perm:
+                errors.append(
+                    '{0}: {1} permutations requested, but only {2} '
+                    'replications and {3} permutations of type "{4}" of {5} '
+                    'samples per replication are available'.format(
+                        test, n_perm, data.n_replications, n_available,
+                        perm_type, n_per_repl))
+        if 1.0 / n_perm >= alpha:
+            errors.append('{0}: {1} permutations are too few for an alpha '
+                          'level of {2}'.format(test, n_perm, alpha))
+        plan[test] = {'n_perm': n_perm, 'alpha': alpha,
+                      'permutation': permutation, 'n_available': n_available}
+    if errors:
+        raise RuntimeError('Infeasible permutation tests:\n' +
+                           '\n'.join(errors))
+    return plan
+
+
+def _sequential_decided(te_sorted, surr_table, alpha, conf):
+    """Test if the sequential test is decided for all relevant ranks.
+
+    The test is decided if the confidence intervals of the p-values of all
+    ranks up to the first non-significant rank lie above or below alpha.
+    Pass the confidence level for a single check, see _look_conf().
+    """
+    max_distribution = _sort_table_max(surr_table)
+    for c in range(te_sorted.shape[0]):
+        decision = _ci_decision(
+                        _count_extreme(te_sorted[c], max_distribution[c, ]),
+                        surr_table.shape[1], alpha, conf)
+        if decision is None:
+            return False
+        if not decision:  # all remaining ranks are non-significant
+            return True
+    return True
+
+
+def _sequential_pvalues(te_sorted, surr_table, alpha, adaptive=False,
+                        conf=0.99):
+    """Test sorted TE values against the surrogate maxima of the same rank.
+
+    Compare each TE value with the distribution of the same rank, starting
+    with the highest TE. Stop at the first non-significant value, all smaller
+    values are considered non-significant as well. If adaptive is True and
+    fewer surrogates than required for the alpha level are available,
+    significance is decided by the p-value's confidence interval (see
+    _permutation_test()), pass the confidence level for a single check of
+    the test (see _look_conf()).
+    """
+    max_distribution = _sort_table_max(surr_table)
+    n_perm = surr_table.shape[1]
+    if adaptive and 1.0 / n_perm >= alpha:
+        k = _count_bigger_smaller(te_sorted, max_distribution)[0]
+        significance = np.array([bool(_ci_decision(k_c, n_perm, alpha, conf))
+                                 for k_c in k])
+        pvalue = np.maximum(k, 1) / n_perm
+    else:
+        [significance, pvalue] = _find_pvalues(te_sorted, max_distribution,
+                                               alpha)
+    # All values after the first non-significant value are non-significant.
+    if not significance.all():
+        c = np.argmin(significance)
+        if VERBOSE:
+            print('Stopping sequential max stats at candidate with rank '
+                  '{0}.'.format(c))
+        significance[c + 1:] = False
+        pvalue[c + 1:] = 1
+    return significance, pvalue
+
+
+def _permutation_test(statistic, create_table, find_distribution, n_perm,
+                      alpha, opts, tail='one'):
+    """Test a statistic against a distribution of surrogate values.
+
+    Create surrogates and test the statistic against the resulting test
+    distribution. If 'adaptive_perm' is set in opts, surrogates are created
+    in batches of 'adaptive_batch_size' and testing stops early if the
+    Clopper-Pearson confidence interval (confidence level 'adaptive_conf') of
+    the p-value after the current batch lies entirely below alpha (the
+    statistic is significant) or entirely above alpha (it is not). The
+    p-value of an early decision is the fraction of surrogates exceeding the
+    statistic (at least 1/no. surrogates). Otherwise, all n_perm surrogates
+    are used and the test is performed as in the non-adaptive case.
+
+    The confidence interval covers the p-value that would be estimated with
+    infinitely many surrogates. The interval is checked after every batch,
+    such that the error 1 - 'adaptive_conf' is split evenly over the
+    checks (see _look_conf()). With the default confidence level, the
+    probability that an early decision differs from that limit is then below
+    1% over all checks of a test.
+
+    Args:
+        statistic : float
+            value to be tested
+        create_table : function
+            returns a surrogate table of shape (n rows, n) for arguments n
+            and first, where first is the no. surrogates created previously
+        find_distribution : function
+            returns the test distribution (1D) from a surrogate table
+        n_perm : int
+            (maximum) number of permutations
+        alpha : float
+            critical alpha level
+        opts : dict
+            parameters for adaptive testing, see above
+        tail : str [optional]
+            'one' or 'two' for one-/two-tailed testing (default='one')
+
+    Returns:
+        bool
+            statistical significance
+        float
+            the test's p-value
+        numpy array
+            surrogate table
+        dict
+            no. surrogates used ('n_perm') and decision rule ('decision'):
+            'fixed' for non-adaptive tests, 'ci_significant' or
+            'ci_not_significant' for early decisions, 'n_perm_exhausted' if
+            all n_perm surrogates were required
+    """
+    if not opts.get('adaptive_perm', False):
+        surr_table = create_table(n_perm, 0)
+        [significance, pvalue] = _find_pvalue(
+                        statistic, find_distribution(surr_table), alpha, tail)
+        return (significance, pvalue, surr_table,
+                {'n_perm': n_perm, 'decision': 'fixed'})
+
+    batch_size = opts.get('adaptive_batch_size', 20)
+    conf = _look_conf(opts.get('adaptive_conf', 0.99), n_perm, batch_size)
+    alpha_tail = alpha / 2 if tail == 'two' else alpha
+    surr_table = None
+    while surr_table is None or surr_table.shape[1] < n_perm:
+        n_batch = min(batch_size, n_perm - (0 if surr_table is None else
+                                            surr_table.shape[1]))
+        if surr_table is None:
+            surr_table = create_table(n_batch, 0)
+        else:
+            surr_table = np.hstack(
+                    (surr_table, create_table(n_batch, surr_table.shape[1])))
+        n = surr_table.shape[1]
+        if n == n_perm:
+            break
+        k = _count_extreme(statistic, find_distribution(surr_table), tail)
+        decision = _ci_decision(k, n, alpha_tail, conf)
+        if decision is not None:
+            if VERBOSE:
+                print(' (stopped after {0} surrogates)'.format(n), end='')
+            return (decision, max(k, 1) / n, surr_table,
+                    {'n_perm': n, 'decision': ('ci_significant' if decision
+                                               else 'ci_not_significant')})
+    [significance, pvalue] = _find_pvalue(
+                        statistic, find_distribution(surr_table), alpha, tail)
+    return (significance, pvalue, surr_table,
+            {'n_perm': n_perm, 'decision': 'n_perm_exhausted'})
+
+
+def _analytic_test(analysis_setup, statistic, n_dim, alpha, rank=1,
+                   n_tests=1, tail='one'):
+    """Test a (conditional) mutual information against its null distribution.
+
+    Under the null hypothesis of conditional independence, 2 * N * CMI (in
+    nats) estimated from N realisations is asymptotically chi-square
+    distributed. The degrees of freedom are d1 * d2 for the 'gaussian'
+    estimator, where d1 and d2 are the dimensions of the two variables, and
+    (a1^d1 - 1) * (a2^d2 - 1) * ac^dc for the 'discrete' estimator, where a1,
+    a2, and ac are the alphabet sizes of the two variables and the
+    conditional with dimension dc.
+
+    If the statistic was selected as the rank-th largest of n_tests
+    estimates (e.g., the maximum (rank 1) or minimum (rank n_tests) over all
+    candidates), it is tested against the distribution of that order
+    statistic for n_tests independent null estimates: the probability that
+    at least rank of n_tests null estimates exceed the statistic.
+
+    Args:
+        analysis_setup : Multivariate_te instance
+            information on the current analysis, the test uses the current
+            estimator, its options, and the no. realisations of the current
+            value
+        statistic : float
+            CMI value to be tested
+        n_dim : tuple of int
+            dimensions of the first and second variable and of the
+            conditional (0 if no conditional is used)
+        alpha : float
+            critical alpha level
+        rank : int [optional]
+            rank of the statistic among n_tests estimates (default=1)
+        n_tests : int [optional]
+            no. estimates the statistic was selected from (default=1)
+        tail : str [optional]
+            'one' or 'two' for one-/two-tailed testing, two-tailed tests are
+            only possible for a single estimate (default='one')
+
+    Returns:
+        bool
+            statistical significance
+        float
+            the test's p-value
+    """
+    estimator_name = analysis_setup._cmi_calculator.estimator_name
+    [dim_1, dim_2, dim_cond] = n_dim
+    if estimator_name == 'gaussian':
+        dof = dim_1 * dim_2
+        to_nats = 1.0
+    elif estimator_name == 'discrete':
+        opts = analysis_setup.options
+        alph1 = int(opts.get('alph1', 2))
+        alph2 = int(opts.get('alph2', 2))
+        alphc = int(opts.get('alphc', 2))
+        if 'num_discrete_bins' in opts:
+            alph1 = alph2 = alphc = int(opts['num_discrete_bins'])
+        dof = (alph1 ** dim_1 - 1) * (alph2 ** dim_2 - 1) * alphc ** dim_cond
+        to_nats = np.log(2)  # the discrete estimator returns bits
+    else:
+        raise RuntimeError('Analytic null distributions are only available '
+                           'for the gaussian and discrete estimators, not '
+                           'for {0}.'.format(estimator_name))
+    n_samples = analysis_setup._current_value_realisations.shape[0]
+    g_statistic = 2 * n_samples * to_nats * float(np.squeeze(statistic))
+
+    p_single = chi2.sf(g_statistic, dof)
+    if tail == 'one':
+        pvalue = binom.sf(rank - 1, n_tests, p_single)
+    elif tail == 'two':
+        assert n_tests == 1, 'Two-tailed tests require a single estimate.'
+        pvalue = min(p_single, chi2.cdf(g_statistic, dof))
+        alpha = alpha / 2
+    else:
+        raise ValueError(('Unkown value for "tail" (should be "one" or "two"):'
+                          ' {0}'.format(tail)))
+    return bool(pvalue < alpha), float(pvalue)
+
+
+def _count_extreme(statistic, distribution, tail='one'):
+    """Count surrogate values more extreme than the statistic."""
+    if tail == 'one':
+        return int(np.sum(distribution > statistic))
+    elif tail == 'two':
+        return int(min(np.sum(distribution > statistic),
+                       np.sum(distribution < statistic)))
+    else:
+        raise ValueError(('Unkown value for "tail" (should be "one" or "two"):'
+                          ' {0}'.format(tail)))
+
+
+def _look_conf(conf, n_perm, batch_size):
+    """Return the confidence level for a single check of an adaptive test.
+
+    An adaptive test checks the p-value's confidence interval after each
+    batch of surrogates, i.e., at most ceil(n_perm / batch_size) times. The
+    probability of a wrong decision in any check is bounded by 1 - conf by
+    splitting the error evenly over all checks (Bonferroni correction).
+    """
+    n_looks = int(np.ceil(n_perm / batch_size))
+    return 1 - (1 - conf) / max(n_looks, 1)
+
+
+def _clopper_pearson(k, n, conf=0.99):
+    """Return the Clopper-Pearson confidence interval of a binomial rate.
+
+    Args:
+        k : int
+            no. successes (surrogates exceeding the statistic)
+        n : int
+            no. trials (surrogates)
+        conf : float [optional]
+            confidence level (default=0.99)
+
+    Returns:
+        float
+            lower bound of the confidence interval
+        float
+            upper bound of the confidence interval
+    """
+    a = 1 - conf
+    lower = 0.0 if k == 0 else beta.ppf(a / 2, k, n - k + 1)
+    upper = 1.0 if k == n else beta.ppf(1 - a / 2, k + 1, n - k)
+    return lower, upper
+
+
+def _ci_decision(k, n, alpha, conf=0.99):
+    """Decide significance from the p-value's confidence interval.
+
+    Returns:
+        bool or None
+            True if the interval lies below alpha, False if it lies above
+            alpha, None if the interval contains alpha
+    """
+    [lower, upper] = _clopper_pearson(k, n, conf)
+    if upper < alpha:
+        return True
+    elif lower > alpha:
+        return False
+    return None
+
+
+def _log_permutation_test(analysis_setup, test, test_info):
+    """Append the decision rule of a permutation test to the analysis."""
+    test_info = dict(test_info, test=test)
+    try:
+        analysis_setup._perm_tests.append(test_info)
+    except AttributeError:
+        analysis_setup._perm_tests = [test_info]
+
+
+def _first_row(table):
+    """Return the first row of a table as test distribution."""
+    return table[0]
+
+
+def _create_surrogate_table(analysis_setup, data, idx_test_set, n_perm,
+                            first_perm=0, permute_replications=None):
     """Create a table of surrogate transfer entropy values.
 
     Calculate transfer entropy between surrogates for each source in the test
     set and the target in the analysis setup using the current conditional in
-    the analysis setup.
+    the analysis setup. Surrogate values are taken from the analysis'
+    surrogate cache if possible (see Surrogate_cache).
+
+    Candidates are independent and can be estimated concurrently by setting
+    'n_jobs_candidates' in the analysis options (see
+    Estimator.estimate_mult_jobs()). Permutations and noise seeds are drawn
+    in the order of candidates before estimation, such that the table is
+    identical for any no. jobs.
 
     Args:
         analysis_setup : Multivariate_te instance
@@ -517,67 +1079,293 @@ def _create_surrogate_table(analysis_setup, data, idx_test_set, n_perm):
             list of indices indicating samples to be used as sources
         n_perm : int
             number of permutations for testing
+        first_perm : int [optional]
+            index of the first surrogate, surrogates first_perm to first_perm
+            + n_perm are returned (e.g., if surrogates are added in batches,
+            first_perm is the no. surrogates created previously) (default=0)
+        permute_replications : bool [optional]
+            if True permute replications, else permute samples, if None, the
+            permutation type is chosen for n_perm (see
+            _sufficient_replications()); set this if surrogates of one test
+            are created in batches, such that all batches are created the same
+            way (default=None)
 
     Returns:
         numpy array
             surrogate TE values, dimensions: (length test set, number of
             surrogates)
     """
-    # Check if n_replications is high enough to allow for the requested number
-    # of permutations. If not permute samples over time
-
-    # permute_over_replications = _permute_over_replications(data, n_perm)
-    perm_range = analysis_setup.options.get('perm_range', 'max')
-
-    # Create surrogate table.
+    perm_settings = _time_permutation_settings(analysis_setup.options)
+    if permute_replications is None:
+        permute_replications = _sufficient_replications(data, n_perm)
+    seed = getattr(analysis_setup, '_seed', None)
+    n_jobs = analysis_setup.options.get('n_jobs_candidates', 1)
+    cache = _get_surrogate_cache(analysis_setup)
+    signature = tuple(sorted(analysis_setup.selected_vars_full))
+    # Surrogates are only re-used if they were created by the same
+    # permutation scheme, e.g., surrogates of a test with fewer permutations
+    # may have been created by permuting replications.
+    scheme = (permute_replications, tuple(sorted(perm_settings.items())))
+
+    # Collect the surrogates that are not cached for each candidate, draw
+    # permutations and noise seeds.
     if VERBOSE:
         print('\ncreate surrogates table with {0} permutations'.format(n_perm))
-    surr_table = np.zeros((len(idx_test_set), n_perm))  # surrogate TE values
-    current_value_realisations = analysis_setup._current_value_realisations
-    idx_c = 0
-    for candidate in idx_test_set:
+    requests = []
+    jobs = []
+    job_candidate = []
+    for (idx_c, candidate) in enumerate(idx_test_set):
         if VERBOSE:
             print('\tcand. {0}'.format(
                                 analysis_setup._idx_to_lag([candidate])[0]))
-        '''
-        surr_candidate_realisations = np.empty(
-                (data.n_realisations(analysis_setup.current_value) * n_perm,
-                1))
-        i_1 = 0
-        i_2 = data.n_realisations(analysis_setup.current_value)
-        for perm in range(n_perm):
-            # Check the permutation type for the current candidate.
-            if permute_over_replications:
-                sur_temp = data.permute_data(analysis_setup.current_value,
-                                             [candidate])[0]
-            else:
-                [real, repl_idx] = data.get_realisations(
-                                                analysis_setup.current_value,
-                                                [candidate])
-                sur_temp = _permute_realisations(real, repl_idx, perm_range)
-
-            surr_candidate_realisations[i_1:i_2, ] = sur_temp
-            i_1 = i_2
-            i_2 += data.n_realisations(analysis_setup.current_value)
-        '''
-        surr_candidate_realisations = _generate_surrogates(
+        requests.append(cache.plan(candidate, signature, first_perm, n_perm,
+                                   scheme))
+        for (n, first) in requests[-1]:
+            if seed is None:
+                rng = None
+                noise_seed = np.random.randint(np.iinfo(np.int32).max)
+            else:  # streams by candidate and surrogate index
+                rng = utils.get_rng(seed, _STREAM_CANDIDATES, candidate[0],
+                                    candidate[1], first)
+                noise_seed = utils.seed_sequence(seed, _STREAM_NOISE,
+                                                 candidate[0], candidate[1],
+                                                 first)
+            surr_candidate_realisations = _surrogate_view(
                                                  data,
                                                  analysis_setup.current_value,
                                                  [candidate],
-                                                 n_perm,
-                                                 perm_range)
-        surr_table[idx_c, :] = analysis_setup._cmi_calculator.estimate_mult(
-                    n_chunks=n_perm,
-                    options=analysis_setup.options,
-                    re_use=['var2', 'conditional'],
-                    var1=surr_candidate_realisations,  # too long
-                    var2=current_value_realisations,
-                    conditional=analysis_setup._selected_vars_realisations)
-        idx_c += 1
-
+                                                 n,
+                                                 perm_settings,
+                                                 rng,
+                                                 permute_replications)
+            jobs.append((n, noise_seed,
+                         {'var1': surr_candidate_realisations}))
+            job_candidate.append(idx_c)
+
+    # Estimate surrogates and add them to the table as soon as all
+    # surrogates of a candidate are estimated.
+    surr_table = np.zeros((len(idx_test_set), n_perm))  # surrogate TE values
+    estimates = [None] * len(jobs)
+    n_open = [len(r) for r in requests]
+    for (idx_c, candidate) in enumerate(idx_test_set):
+        if n_open[idx_c] == 0:
+            surr_table[idx_c, :] = cache.update(candidate, signature,
+                                                first_perm, n_perm, [], [],
+                                                scheme)
+    for (i, estimate) in analysis_setup._cmi_calculator.estimate_mult_jobs(
+                jobs,
+                n_jobs,
+                options=analysis_setup.options,
+                re_use=['var2', 'conditional'],
+                var2=analysis_setup._current_value_realisations,
+                conditional=analysis_setup._selected_vars_realisations):
+        idx_c = job_candidate[i]
+        estimates[i] = estimate
+        n_open[idx_c] -= 1
+        if n_open[idx_c] == 0:
+            surr_table[idx_c, :] = cache.update(
+                idx_test_set[idx_c], signature, first_perm, n_perm,
+                requests[idx_c],
+                [estimates[j] for j in range(len(jobs))
+                 if job_candidate[j] == idx_c], scheme)
     return surr_table
 
 
+def _get_rng(analysis_setup, *key):
+    """Return the generator of an analysis' random stream, None if unseeded."""
+    seed = getattr(analysis_setup, '_seed', None)
+    if seed is None:
+        return None
+    return utils.get_rng(seed, *key)
+
+
+def _noise_options(analysis_setup, *key):
+    """Return analysis options with a seed for the estimator's noise."""
+    seed = getattr(analysis_setup, '_seed', None)
+    if seed is None:
+        return analysis_setup.options
+    return dict(analysis_setup.options,
+                noise_seed=utils.seed_sequence(seed, _STREAM_NOISE, *key))
+
+
+def _get_surrogate_cache(analysis_setup):
+    """Return the analysis' surrogate cache, create it if necessary."""
+    cache = getattr(analysis_setup, '_surr_cache', None)
+    if cache is None:
+        cache = Surrogate_cache(
+                    analysis_setup.options.get('surr_cache', 'exact'),
+                    analysis_setup.options.get('surr_refresh_fraction', 0.2))
+        analysis_setup._surr_cache = cache
+    return cache
+
+
+class Surrogate_cache(object):
+    """Cache surrogate values of candidates between rounds of an analysis.
+
+    Hold the latest surrogate values for each candidate, together with the
+    conditioning set they were estimated for and the scheme they were created
+    by (e.g., the permutation type). Surrogates created by a different scheme
+    are never re-used, independent of the policy. In the greedy inclusion and
+    pruning of candidates, the same candidates are tested in many rounds,
+    while the conditioning set changes by a single variable between rounds.
+    The cache policy defines which surrogate values are re-used:
+
+    - 'off' - never re-use surrogates, estimate new surrogates for each test
+    - 'exact' - re-use surrogates estimated for the same candidate,
+      and conditioning set; re-used values are a valid sample from the
+      same null distribution as newly estimated values (and identical to
+      them if the analysis is seeded)
+    - 'reuse' - additionally re-use surrogates of a candidate estimated for a
+      different (previous) conditioning set; this assumes that the null
+      distribution changes little if a single variable is added to or
+      removed from the conditioning set, the test is approximate
+    - 'refresh' - as 'reuse', but re-estimate a fraction of the re-used
+      surrogates for the current conditioning set in each round (round
+      robin); after 1/refresh_fraction rounds, all surrogates of a candidate
+      have been estimated for a conditioning set that differs at most by
+      the variables added in these rounds
+
+    Additional surrogates are estimated and appended if more surrogates are
+    requested than cached.
+
+    Surrogates are requested by get(), which calls an estimation function
+    for missing surrogates. Alternatively, plan() returns the surrogates to
+    be estimated for a request, which are then passed to update(), e.g., if
+    surrogates for multiple candidates are estimated concurrently.
+
+    Args:
+        policy : str [optional]
+            cache policy, see above (default='exact')
+        refresh_fraction : float [optional]
+            fraction of surrogates re-estimated per round if policy is
+            'refresh' (default=0.2)
+
+    Attributes:
+        policy : str
+            cache policy
+        n_hits : int
+            no. surrogate values taken from the cache (including values
+            refreshed in the same call)
+        n_estimated : int
+            no. surrogate values estimated
+    """
+
+    def __init__(self, policy='exact', refresh_fraction=0.2):
+        if policy not in ['off', 'exact', 'reuse', 'refresh']:
+            raise ValueError('Unknown surrogate cache policy: {0}.'.format(
+                                                                    policy))
+        assert 0 < refresh_fraction <= 1, (
+            'Refresh fraction must be in (0, 1].')
+        self.policy = policy
+        self.refresh_fraction = refresh_fraction
+        self.n_hits = 0
+        self.n_estimated = 0
+        self._tables = {}  # candidate -> [scheme, signature, surr. values]
+        self._refresh_pos = {}  # candidate -> next surrogate to refresh
+        self._pending = {}  # candidate -> cached values of open requests
+
+    def get(self, candidate, signature, first_perm, n_perm, estimate,
+            scheme=None):
+        """Return surrogate values of a candidate.
+
+        Args:
+            candidate : tuple
+                index of the candidate
+            signature : hashable
+                identifies the conditioning set
+            first_perm : int
+                index of the first requested surrogate
+            n_perm : int
+                no. requested surrogates
+            estimate : function
+                estimate(n, first) returns n new surrogate values, where first
+                is the index of the first new surrogate
+            scheme : hashable [optional]
+                identifies how surrogates are created (default=None)
+
+        Returns:
+            numpy array
+                surrogate values first_perm to first_perm + n_perm
+        """
+        requests = self.plan(candidate, signature, first_perm, n_perm, scheme)
+        return self.update(candidate, signature, first_perm, n_perm, requests,
+                           [estimate(n, first) for (n, first) in requests],
+                           scheme)
+
+    def plan(self, candidate, signature, first_perm, n_perm, scheme=None):
+        """Return the surrogates that have to be estimated for a request.
+
+        Args:
+            see get()
+
+        Returns:
+            list of tuples
+                (n, first) for each block of n surrogates that have to be
+                estimated, starting at surrogate index first
+        """
+        if self.policy == 'off':
+            self.n_estimated += n_perm
+            return [(n_perm, first_perm)]
+
+        last = first_perm + n_perm
+        values = np.empty(0)
+        requests = []
+        if (candidate in self._tables and
+                self._tables[candidate][0] == scheme):
+            [_, cached_signature, cached_values] = self._tables[candidate]
+            if cached_signature == signature or self.policy != 'exact':
+                values = cached_values
+            if cached_signature != signature and self.policy == 'refresh':
+                requests = self._refresh(candidate, values.shape[0])
+        n_cached = values.shape[0]
+        self.n_hits += min(n_cached, last) - min(n_cached, first_perm)
+        if n_cached < last:
+            requests.append((last - n_cached, n_cached))
+        self.n_estimated += sum([n for (n, first) in requests])
+        self._pending[candidate] = values
+        return requests
+
+    def update(self, candidate, signature, first_perm, n_perm, requests,
+               estimates, scheme=None):
+        """Add estimated surrogates to the cache and return a request.
+
+        Args:
+            candidate, signature, first_perm, n_perm, scheme : see get()
+            requests : list of tuples
+                surrogates to be estimated as returned by plan()
+            estimates : list of numpy arrays
+                estimated surrogate values for each entry in requests
+
+        Returns:
+            numpy array
+                surrogate values first_perm to first_perm + n_perm
+        """
+        if self.policy == 'off':
+            return estimates[0]
+
+        values = self._pending.pop(candidate)
+        if requests:
+            values = values.copy()
+        for ((n, first), estimate) in zip(requests, estimates):
+            if first < values.shape[0]:
+                values[first:first + n] = estimate
+            else:
+                values = np.hstack((values, estimate))
+        self._tables[candidate] = [scheme, signature, values]
+        return values[first_perm:first_perm + n_perm]
+
+    def _refresh(self, candidate, n_cached):
+        """Return the next surrogates to be re-estimated (round robin)."""
+        n_refresh = int(np.ceil(self.refresh_fraction * n_cached))
+        start = self._refresh_pos.get(candidate, 0) % n_cached
+        stop = min(start + n_refresh, n_cached)
+        requests = [(stop - start, start)]
+        if n_refresh > stop - start:  # wrap around
+            requests.append((n_refresh - (stop - start), 0))
+        self._refresh_pos[candidate] = (start + n_refresh) % n_cached
+        return requests
+
+
 def _find_table_max(table):
     """Find maximum for each column of a table."""
     return np.max(table, axis=0)
@@ -590,18 +1378,12 @@ def _find_table_min(table):
 
 def _sort_table_min(table):
     """Sort each column in a table in ascending order."""
-    for permutation in range(table.shape[1]):
-        table[:, permutation].sort()
-    return table
+    return np.sort(table, axis=0)
 
 
 def _sort_table_max(table):
     """Sort each column in a table in descending order."""
-    table_sorted = np.empty(table.shape)
-    for permutation in range(0, table.shape[1]):
-        table_sorted[:, permutation] = utils.sort_descending(
-                                            table[:, permutation])
-    return table_sorted
+    return np.sort(table, axis=0)[::-1, :]
 
 
 def _find_pvalue(statistic, distribution, alpha=0.05, tail='one'):
@@ -624,50 +1406,96 @@ def _find_pvalue(statistic, distribution, alpha=0.05, tail='one'):
             the test's p-value
     """
     assert(distribution.ndim == 1)
-    assert(1.0 / distribution.shape[0] < alpha), ('The number of permutations '
-                                                  'is to small ({0}) to test '
-                                                  'the requested alpha level '
-                                                  '({1}).'.format(
-                                                       distribution.shape[0],
-                                                       alpha))
-#    if (1.0 / distribution.shape[0] >= alpha):
-#        print('The number of permutations is to small ({0}) to test the '
-#              'requested alpha level ({1}).'.format(distribution.shape[0],
-#                                                    alpha))
+    [significance, pvalue] = _find_pvalues(np.squeeze(statistic),
+                                           distribution, alpha, tail)
+    return bool(significance), float(pvalue)
+
+
+def _find_pvalues(statistics, distributions, alpha=0.05, tail='one'):
+    """Find p-values of multiple test statistics at once.
+
+    Test statistics against a single test distribution or test each row of
+    statistics against the corresponding row of a table of test
+    distributions (e.g., each candidate's statistics against its surrogate
+    values). Distributions are sorted once and the no. more extreme
+    surrogate values is found for all statistics by binary search. P-values
+    are defined as in _find_pvalue().
+
+    Args:
+        statistics : numpy array
+            values to be tested, if distributions is 2D, the first axis has
+            to match the first axis of distributions
+        distributions : numpy array
+            test distribution, either 1D or 2D with dimensions (no.
+            distributions x no. surrogates)
+        alpha : float [optional]
+            critical alpha level for statistical significance (default=0.05)
+        tail : str [optional]
+            'one' or 'two' for one-/two-tailed testing (default='one')
+
+    Returns:
+        numpy array, bool
+            statistical significance of each statistic
+        numpy array, float
+            p-value of each statistic
+    """
+    distributions = np.asarray(distributions)
+    statistics = np.asarray(statistics)
+    n_perm = distributions.shape[-1]
+    assert(1.0 / n_perm < alpha), ('The number of permutations is to small '
+                                   '({0}) to test the requested alpha level '
+                                   '({1}).'.format(n_perm, alpha))
+    [n_bigger, n_smaller] = _count_bigger_smaller(statistics, distributions)
     if tail == 'one':
-        pvalue = sum(distribution > statistic) / distribution.shape[0]
+        pvalue = n_bigger / n_perm
     elif tail == 'two':
-        p_bigger = sum(distribution > statistic) / distribution.shape[0]
-        p_smaller = sum(distribution < statistic) / distribution.shape[0]
-        pvalue = min(p_bigger, p_smaller)
+        pvalue = np.minimum(n_bigger, n_smaller) / n_perm
         alpha = alpha / 2
     else:
         raise ValueError(('Unkown value for "tail" (should be "one" or "two"):'
                           ' {0}'.format(tail)))
 
-    # If the statistic is larger than all values in the test distribution, set
+    # If a statistic is larger than all values in the test distribution, set
     # the p-value to the smallest possible value 1/n_perm.
-    if pvalue == 0:
-        pvalue = 1.0 / distribution.shape[0]
+    pvalue = np.maximum(pvalue, 1.0 / n_perm)
     significance = pvalue < alpha
-
     return significance, pvalue
 
 
+def _count_bigger_smaller(statistics, distributions):
+    """Count values in test distributions bigger/smaller than statistics."""
+    if distributions.ndim == 1:
+        d_sorted = np.sort(distributions)
+        n_smaller = np.searchsorted(d_sorted, statistics, side='left')
+        n_bigger = d_sorted.shape[0] - np.searchsorted(d_sorted, statistics,
+                                                       side='right')
+        return n_bigger, n_smaller
+    assert statistics.shape[0] == distributions.shape[0], (
+        'No. statistics ({0}) does not match no. distributions ({1}).'.format(
+                            statistics.shape[0], distributions.shape[0]))
+    d_sorted = np.sort(distributions, axis=1)
+    n_smaller = np.empty(statistics.shape, dtype=int)
+    n_bigger = np.empty(statistics.shape, dtype=int)
+    for i in range(d_sorted.shape[0]):
+        n_smaller[i] = np.searchsorted(d_sorted[i], statistics[i], side='left')
+        n_bigger[i] = d_sorted.shape[1] - np.searchsorted(
+                                    d_sorted[i], statistics[i], side='right')
+    return n_bigger, n_smaller
+
+
 def _sufficient_replications(data, n_perm):
     """Test if no. replications is high enough for surrogate creation.
 
     Test if the number of replications is high enough to allow for the required
-    number of permutations.
+    number of permutations, i.e., if no. replications! > n_perm.
     """
-    if np.math.factorial(data.n_replications) > n_perm:
-        return True
-    else:
-        return False
+    return surrogates.n_permutations(data.n_replications,
+                                     limit=n_perm) > n_perm
 
 
 def _generate_surrogates(data, current_value, idx_list, n_perm,
-                         perm_range='max'):
+                         perm_settings=None, rng=None, return_index=False,
+                         permute_replications=None):
     """Generate surrogate data for statistical testing.
 
     The method for data generation depends on whether sufficient replications
@@ -677,6 +1505,12 @@ def _generate_surrogates(data, current_value, idx_list, n_perm,
     number of replications is too low, samples are shuffled over time (while
     keeping the order of replications intact).
 
+    Permutations for all surrogates are drawn at once (see
+    _permutation_index()) and surrogates are created by a single gather from
+    the original realisations. Alternatively, the original realisations and
+    the permutation index can be returned, such that surrogates can be
+    created later on.
+
     Args:
         data : Data instance
             raw data for analysis
@@ -687,34 +1521,143 @@ def _generate_surrogates(data, current_value, idx_list, n_perm,
             list of variables, for which surrogates have to be created
         n_perm : int
             number of permutations
-        perm_range : int [optional]
-            permutation range if permutation over samples is used to create
-            surrogates (default='max')
+        perm_settings : dict [optional]
+            permutation type and parameters used if samples are permuted over
+            time, see _time_permutation_settings() (default=None, permute
+            samples at random)
+        rng : numpy.random.Generator [optional]
+            random number generator used to draw permutations, if None, a
+            generator is seeded from numpy's global random state
+            (default=None)
+        return_index : bool [optional]
+            return original realisations and permutation index instead of
+            surrogate data (default=False)
+        permute_replications : bool [optional]
+            if True permute replications, else permute samples, if None
+            replications are permuted if reps! > n_perm (default=None)
 
     Returns:
         numpy array
             surrogate data with dimensions
             (realisations * n_perm) x len(idx_list)
+        OR
+        numpy array
+            original realisations with dimensions realisations x
+            len(idx_list), if return_index is True
+        numpy array
+            permutation index with dimensions n_perm x realisations, row i
+            holds the realisation indices of the i-th surrogate, if
+            return_index is True
     """
-    # Allocate memory for surrogates
-    n_realisations = data.n_realisations(current_value)
-    surrogates = np.empty((n_realisations * n_perm, len(idx_list)))
+    if perm_settings is None:
+        perm_settings = {}
+    if permute_replications is None:
+        permute_replications = _sufficient_replications(data, n_perm)
+    realisations = data.get_realisations(current_value, idx_list)[0]
+    perm_idx = _permutation_index(
+                        data, current_value, n_perm,
+                        permute_replications=permute_replications,
+                        rng=rng, **perm_settings)
+    if return_index:
+        return realisations, perm_idx
+    return realisations[perm_idx.ravel(), :]
+
+
+def _surrogate_view(data, current_value, idx_list, n_perm, perm_settings=None,
+                    rng=None, permute_replications=None):
+    """Return surrogate data as a view on the original realisations.
+
+    Generate surrogates as in _generate_surrogates(), but return a
+    realisation_views.Permuted_realisations instead of creating the surrogate
+    data. The view holds the original realisations and one permutation index
+    per surrogate, which estimators apply chunk by chunk.
 
-    # Generate surrogates by permuting over replications if possible (no.
-    # replications needs to be sufficient); else permute samples over time.
-    i_1 = 0
-    i_2 = n_realisations
-    if _sufficient_replications(data, n_perm):  # permute replications
-        for perm in range(n_perm):
-            surrogates[i_1:i_2, ] = data.permute_replications(current_value,
-                                                              idx_list)[0]
-            i_1 = i_2
-            i_2 += n_realisations
-    else:  # permute samples
-        for perm in range(n_perm):
-            surrogates[i_1:i_2, ] = data.permute_samples(current_value,
-                                                         idx_list,
-                                                         perm_range)[0]
-            i_1 = i_2
-            i_2 += n_realisations
-    return surrogates
+    Returns:
+        Permuted_realisations
+            surrogate data with shape (realisations * n_perm) x len(idx_list)
+    """
+    realisations, perm_idx = _generate_surrogates(
+                                        data, current_value, idx_list, n_perm,
+                                        perm_settings, rng, return_index=True,
+                                        permute_replications=(
+                                            permute_replications))
+    return rv.Permuted_realisations(realisations, perm_idx)
+
+
+def _time_permutation_settings(options, perm_range=None):
+    """Return the settings for permutations over time from the options.
+
+    Args:
+        options : dict
+            analysis options, can contain 'perm_type' ('random', 'local',
+            'blocks', or 'circular', default='local') and the parameters
+            'perm_range', 'block_size', 'swap_range', and 'max_shift', see
+            surrogates.permute_over_time()
+        perm_range : int or str [optional]
+            permutation range, overrides options['perm_range']
+            (default=None)
+
+    Returns:
+        dict
+            keyword arguments for _permutation_index()
+    """
+    settings = {k: options[k] for k in surrogates.PERM_OPTIONS
+                if k in options}
+    if perm_range is not None:
+        settings['perm_range'] = perm_range
+    settings['perm_type'] = options.get('perm_type', 'local')
+    return settings
+
+
+def _permutation_index(data, current_value, n_perm, permute_replications=True,
+                       rng=None, perm_type='local', **kwargs):
+    """Draw permutations of realisations for the generation of surrogates.
+
+    Return indices that permute realisations as returned by
+    Data.get_realisations(). Realisations are either permuted over
+    replications (the temporal order of samples within replications stays
+    intact, see Data.permute_replications()) or over samples (the order of
+    replications stays intact and the same permutation is applied to each
+    replication, see surrogates.permute_over_time()). Permutations for all
+    surrogates are drawn in one call to the random number generator.
+
+    Args:
+        data : Data instance
+            raw data for analysis
+        current_value : tuple
+            index of the current value in current analysis, has to have the
+            form (idx process, idx sample)
+        n_perm : int
+            number of permutations
+        permute_replications : bool [optional]
+            if True permute replications, else permute samples (default=True)
+        rng : numpy.random.Generator [optional]
+            random number generator, if None, a generator is seeded from
+            numpy's global random state (default=None)
+        perm_type : str [optional]
+            type of permutation over samples, 'random', 'local', 'blocks', or
+            'circular' (default='local')
+        **kwargs
+            parameters of the permutation over samples, e.g., 'perm_range',
+            range over which samples are permuted if perm_type is 'local' (if
+            'max' samples are permuted over the whole replication,
+            default='max'), see surrogates.permute_over_time()
+
+    Returns:
+        numpy array
+            permutation index with dimensions n_perm x realisations
+    """
+    rng = utils.get_rng(rng)
+    n_per_repl = data.n_realisations_samples(current_value)
+    n_repl = data.n_realisations_repl()
+
+    if permute_replications:
+        order = np.argsort(rng.random((n_perm, n_repl)), axis=1)
+        perm_idx = (order[:, :, np.newaxis] * n_per_repl +
+                    np.arange(n_per_repl))
+    else:
+        order = surrogates.time_permutation_index(n_per_repl, n_perm,
+                                                  perm_type, rng, **kwargs)
+        perm_idx = (np.arange(n_repl)[:, np.newaxis] * n_per_repl +
+                    order[:, np.newaxis, :])
+    return perm_idx.reshape(n_perm, n_per_repl * n_repl)
@@ -1,15 +1,31 @@
 """Create surrogate data.
 
+Surrogates are created by permuting realisations over replications or over
+samples (time) within replications. Realisations are expected in the order
+returned by Data.get_realisations(), i.e., ordered by replication with the
+same number of realisations per replication. Permutations are applied to all
+replications at once by reshaping realisations to (no. replications x no.
+samples x no. variables).
+
+Permutations over time are drawn by time_permutation_index(), which can draw
+permutations for many surrogates in a single call. Samples can be permuted
+at random ('random'), within blocks of a given range ('local'), by swapping
+blocks of samples ('blocks'), or by a circular shift ('circular').
+
 Created on Tue Apr  5 16:40:40 2016
 
 @author: patricia
 """
-import copy as cp
 import numpy as np
 from . import idtxl_exceptions as ex
+from . import idtxl_utils as utils
+
+# Options that parametrise permutations over time.
+PERM_OPTIONS = ('perm_range', 'block_size', 'swap_range', 'max_shift')
 
 
-def create_surrogates(realisations, replication_idx, n_perm, options=None):
+def create_surrogates(realisations, replication_idx, n_perm, options=None,
+                      rng=None):
     """Create appropriate surrogate data from realisations.
 
     Create surrogates by either permuting replications or samples in time,
@@ -41,23 +57,27 @@ def create_surrogates(realisations, replication_idx, n_perm, options=None):
             this defines the method used for permuting data over time, can be
             'random' (swaps samples at random), 'blocks' (swaps blocks of
             samples), 'local' (swaps samples within a given range), or
-            'circular' (circular shift with given maximum)
+            'circular' (circular shift with given maximum) (default='random')
             - depending on the shuffling method, further options may be
             defined, see help for function 'permute_over_time()' in this module
+        rng : numpy Generator, int, or SeedSequence [optional]
+            random number generator or seed, see idtxl_utils.get_rng()
+            (default=None)
+
+    Returns:
+        numpy array
+            permuted realisations
     """
     if options is None:
         options = {}
-    try:
-        perm_type = options['perm_type']
-    except KeyError:
-        perm_type = None
+    perm_type = options.get('perm_type')
 
     # Check if there are enough data to create a sufficient number of
     # permutations.
     n_repl = np.unique(replication_idx).shape[0]
     samples_per_repl = sum(replication_idx == replication_idx[0])
-    if (np.math.factorial(samples_per_repl) <= n_perm and
-            np.math.factorial(n_repl) <= n_perm):
+    if (n_permutations(samples_per_repl, limit=n_perm) <= n_perm and
+            n_permutations(n_repl, limit=n_perm) <= n_perm):
         raise RuntimeError('Number of samples per replication ({0}) and '
                            'number of replications ({1}) are each to small to '
                            'generate generate the requested number of '
@@ -71,7 +91,7 @@ def create_surrogates(realisations, replication_idx, n_perm, options=None):
         # permutations. If not permute samples over time and warn the user
         # (if no. replications is low an explicit strategy for permuting
         # over time should be used, e.g. swapping blocks or circular shift).
-        if np.math.factorial(n_repl) > n_perm:
+        if n_permutations(n_repl, limit=n_perm) > n_perm:
             permute_replications = True
         else:
             ex.n_replications_low('The number of replications is too low to '
@@ -79,30 +99,32 @@ def create_surrogates(realisations, replication_idx, n_perm, options=None):
                                   ' consider specifying an alternative '
                                   'permutation scheme.')
             permute_replications = False
-    elif (perm_type == 'permute_replications' and
-          np.math.factorial(n_repl) <= n_perm):
-        raise ValueError('Number of replications ({0}) is not high enough to '
-                         'create the sufficient number of permutations for '
-                         'surrogate testing.')
-    elif (perm_type == 'permute_samples' and
-          np.math.factorial(samples_per_repl) <= n_perm):
-        raise ValueError('Number of samples per replications ({0}) is not high'
-                         ' enough to create the sufficient number of '
-                         'permutations for surrogate testing.')
-    # Add further checks as elifs here if required.
+    elif perm_type == 'permute_replications':
+        if n_permutations(n_repl, limit=n_perm) <= n_perm:
+            raise ValueError('Number of replications ({0}) is not high enough '
+                             'to create the sufficient number of permutations '
+                             'for surrogate testing.'.format(n_repl))
+        permute_replications = True
+    elif perm_type == 'permute_samples':
+        if n_permutations(samples_per_repl, limit=n_perm) <= n_perm:
+            raise ValueError('Number of samples per replications ({0}) is not '
+                             'high enough to create the sufficient number of '
+                             'permutations for surrogate testing.'.format(
+                                                            samples_per_repl))
+        permute_replications = False
+    else:
+        raise ValueError('Unknown permutation type ({0}).'.format(perm_type))
 
     if permute_replications:
-        return permute_over_replications(realisations, replication_idx)
+        return permute_over_replications(realisations, replication_idx, rng)
     else:
-        try:
-            shuffle_samples = options['shuffle_samples']
-        except KeyError:
-            shuffle_samples = None
-        return permute_over_time(realisations, replication_idx,
-                                 shuffle_samples, options)
+        return permute_over_time(
+                    realisations, replication_idx,
+                    options.get('shuffle_samples', 'random'), rng,
+                    **{k: options[k] for k in PERM_OPTIONS if k in options})
 
 
-def permute_over_replications(realisations, replication_idx):
+def permute_over_replications(realisations, replication_idx, rng=None):
     """Permute replications while keeping temporal structure intact.
 
     Permute whole replications while keeping the temporal order of samples
@@ -113,40 +135,42 @@ def permute_over_replications(realisations, replication_idx):
             shape[0] realisations of shape[1] variables
         replication_idx : numpy array
             index of replication a realisation came from
+        rng : numpy Generator, int, or SeedSequence [optional]
+            random number generator or seed, see idtxl_utils.get_rng()
+            (default=None)
 
     Returns:
         numpy array
             permuted realisations
     """
-    samples_per_repl = sum(replication_idx == replication_idx[0])
-    replications_perm = np.random.permutation(max(replication_idx))
-    replication_idx_perm = np.repeat(replications_perm, samples_per_repl)
-    realisations_perm = cp.copy(realisations)
-    realisations_perm = realisations[replication_idx_perm, :]
-    return realisations_perm
+    replications = _split_replications(realisations, replication_idx)
+    order = utils.get_rng(rng).permutation(replications.shape[0])
+    return replications[order].reshape(realisations.shape)
 
 
-# TODO the following with all subfunctions should got into the Data class
-def permute_over_time(realisations, replication_idx, perm_type, *kwargs):
+def permute_over_time(realisations, replication_idx, perm_type='random',
+                      rng=None, **kwargs):
     """Permute realisations in time within each replication.
 
     Permute realisations in time but within each replication. This is the
     fall-back option if the number of replications is too small to allow a
-    sufficient number of permutations for the generation of surrogate data. If
-    no permutation type is given, samples are randomly permuted over the
-    whole replication, i.e., over all time indices in the replication.
+    sufficient number of permutations for the generation of surrogate data.
+    The same permutation is applied to all replications.
 
     Args:
         realisations : numpy array
             shape[0] realisations of shape[1] variables
         replication_idx : numpy array
             index of replication a realisation came from
-        perm_type : str
+        perm_type : str [optional]
             type of permutation, can be 'random' (swaps samples at random),
             'blocks' (swaps blocks of samples), 'local' (swaps samples within
             a given range), or 'circular' (shifts time series by a random
-            number of samples)
-        *kwargs
+            number of samples) (default='random')
+        rng : numpy Generator, int, or SeedSequence [optional]
+            random number generator or seed, see idtxl_utils.get_rng()
+            (default=None)
+        **kwargs
             Arbitrary keyword arguments depending on the perm_type:
 
             - if perm_type = 'blocks': 'block_size' in samples, 'swap_range' in
@@ -160,57 +184,142 @@ def permute_over_time(realisations, replication_idx, perm_type, *kwargs):
         numpy array
             realisations permuted over time
     """
-    assert (replication_idx.shape[0] == realisations.shape[0]), (
-        'Array "replication" index must have as many entries as the first '
-        'dimension of array "realisations".')
+    replications = _split_replications(realisations, replication_idx)
+    perm = time_permutation_index(replications.shape[1], None, perm_type,
+                                  rng, **kwargs)
+    return np.take(replications, perm, axis=1).reshape(realisations.shape)
 
-    samples_per_repl = sum(replication_idx == replication_idx[0])
 
-    # Get the permutaion 'mask' for one replication (the same mask is then
-    # applied to each replication).
-    if perm_type == 'random':
-        perm = np.random.permutation(samples_per_repl)
+def time_permutation_index(n_per_repl, n_perm=None, perm_type='random',
+                           rng=None, **kwargs):
+    """Draw permutations of the samples in one replication.
 
+    Return the sample indices of one or more permuted time series of length
+    n_per_repl. Permutations for all surrogates are drawn at once.
+
+    Args:
+        n_per_repl : int
+            number of samples in one replication
+        n_perm : int [optional]
+            number of permutations, if None a single permutation is returned
+            as 1D array (default=None)
+        perm_type : str [optional]
+            type of permutation, 'random', 'blocks', 'local', or 'circular',
+            see permute_over_time() (default='random')
+        rng : numpy Generator, int, or SeedSequence [optional]
+            random number generator or seed, see idtxl_utils.get_rng()
+            (default=None)
+        **kwargs
+            parameters of the permutation type, see permute_over_time()
+
+    Returns:
+        numpy array
+            permuted sample indices with dimensions n_perm x n_per_repl
+    """
+    rng = utils.get_rng(rng)
+    if perm_type == 'random':
+        return _swap_local(n_per_repl, n_per_repl, n_perm, rng)
+    elif perm_type == 'local':
+        perm_range = kwargs.get('perm_range', 'max')
+        if type(perm_range) is str:
+            if perm_range != 'max':
+                raise ValueError('Unkown value for "perm_range": {0}'.format(
+                                                                perm_range))
+            perm_range = n_per_repl
+        return _swap_local(n_per_repl, perm_range, n_perm, rng)
     elif perm_type == 'blocks':
         try:
             block_size = kwargs['block_size']
         except KeyError:
             raise KeyError('No block size provided.')
-        try:
-            swap_range = kwargs['swap_range']
-        except KeyError:
-            swap_range = np.ceil(samples_per_repl / block_size).astype(int)
-        perm = _swap_blocks(realisations, replication_idx,
-                            block_size, swap_range)
+        swap_range = kwargs.get(
+                    'swap_range', np.ceil(n_per_repl / block_size).astype(int))
+        return _swap_blocks(n_per_repl, block_size, swap_range, n_perm, rng)
+    elif perm_type == 'circular':
+        max_shift = kwargs.get('max_shift', n_per_repl - 1)
+        return _circular_shift(n_per_repl, max_shift, n_perm, rng)
+    else:
+        raise ValueError('Unknown permutation type ({0}).'.format(perm_type))
 
+
+def n_permutations(n_per_repl, perm_type='random', limit=None, **kwargs):
+    """Return the number of distinct permutations of a time series.
+
+    Count the permutations that can be drawn by time_permutation_index() for
+    a time series of length n_per_repl, including the identity. The number of
+    permutations of replications is obtained for perm_type 'random', where
+    n_per_repl is the number of replications. Counting stops as soon as the
+    count exceeds limit, such that factorials of large numbers are never
+    computed.
+
+    Args:
+        n_per_repl : int
+            number of samples in one replication
+        perm_type : str [optional]
+            type of permutation, 'random', 'blocks', 'local', or 'circular',
+            see permute_over_time() (default='random')
+        limit : int [optional]
+            stop counting once the count exceeds limit (default=None)
+        **kwargs
+            parameters of the permutation type, see permute_over_time()
+
+    Returns:
+        int
+            number of permutations, a number larger than limit if counting
+            was stopped
+    """
+    if perm_type == 'random':
+        return _count_local(n_per_repl, n_per_repl, limit)
     elif perm_type == 'local':
+        perm_range = kwargs.get('perm_range', 'max')
+        if perm_range == 'max':
+            perm_range = n_per_repl
+        return _count_local(n_per_repl, perm_range, limit)
+    elif perm_type == 'blocks':
         try:
-            perm_range = kwargs['perm_range']
+            block_size = kwargs['block_size']
         except KeyError:
-            perm_range = samples_per_repl
-        perm = _swap_local(samples_per_repl, perm_range)
-
+            raise KeyError('No block size provided.')
+        n_blocks = int(np.ceil(n_per_repl / block_size))
+        return _count_local(n_blocks, kwargs.get('swap_range', n_blocks),
+                            limit)
     elif perm_type == 'circular':
-        try:
-            max_shift = kwargs['max_shift']
-        except KeyError:
-            max_shift = samples_per_repl - 1
-        perm = _circular_shift(realisations, replication_idx, max_shift)
-
+        return kwargs.get('max_shift', n_per_repl - 1) + 1
     else:
         raise ValueError('Unknown permutation type ({0}).'.format(perm_type))
 
-    # Apply the permutation to data from each replication.
-    realisations_perm = cp.copy(realisations)
-    for replication in range(max(replication_idx) + 1):
-        data_idx = replication_idx == replication
-        d = realisations_perm[data_idx, :]
-        realisations_perm[data_idx, :] = d[perm, :]
 
-    return realisations_perm
+def _count_local(n, perm_range, limit=None):
+    """Count permutations of n elements within blocks of length perm_range.
+
+    The count is the product of the factorials of all block lengths, i.e.,
+    the product of each element's position within its block (counting from
+    1).
+    """
+    count = 1
+    for i in range(n):
+        count *= i % perm_range + 1
+        if limit is not None and count > limit:
+            break
+    return count
 
 
-def _swap_local(n_per_repl, perm_range):
+def _split_replications(realisations, replication_idx):
+    """Reshape realisations to replications x samples x variables."""
+    assert (replication_idx.shape[0] == realisations.shape[0]), (
+        'Array "replication" index must have as many entries as the first '
+        'dimension of array "realisations".')
+    n_repl = np.unique(replication_idx).shape[0]
+    assert replication_idx.shape[0] % n_repl == 0, (
+        'Replications must have equal numbers of realisations.')
+    n_per_repl = replication_idx.shape[0] // n_repl
+    assert (replication_idx.reshape(n_repl, n_per_repl) ==
+            replication_idx[::n_per_repl, np.newaxis]).all(), (
+        'Realisations must be ordered by replication.')
+    return realisations.reshape(n_repl, n_per_repl, -1)
+
+
+def _swap_local(n_per_repl, perm_range, n_perm=None, rng=None):
     """Permute samples in a time series within a given range.
 
     If a permutation range is given, samples are shuffled within blocks of
@@ -221,40 +330,37 @@ def _swap_local(n_per_repl, perm_range):
             number of samples in one replication
         perm_range : int
             range over which realisations are permuted
+        n_perm : int [optional]
+            number of permutations, if None a single permutation is returned
+            (default=None)
+        rng : numpy Generator, int, or SeedSequence [optional]
+            random number generator or seed (default=None)
 
     Returns:
         numpy array
-            permuted indices with length n_per_repl
+            permuted indices with dimensions n_perm x n_per_repl
     """
-    assert (perm_range > 1), ('Permutation range has to be larger than 1',
+    assert (perm_range > 1), ('Permutation range has to be larger than 1 '
                               'otherwise there is nothing to permute.')
     assert (n_per_repl >= perm_range), ('Not enough realisations per '
                                         'replication ({0}) to allow for the '
                                         'requested "perm_range" of {1}.'
                                         .format(n_per_repl, perm_range))
 
-    # Create a permutation of the data that respects the requested permutation
-    # range and can be applied to the realisations from each replication in
-    # turn.
-    if perm_range == n_per_repl:  # permute all realisations in one replication
-        perm = np.random.permutation(n_per_repl)
-    else:  # build a permutation that permutes only within the perm_range
-        perm = np.empty(n_per_repl, dtype=int)
-        remainder = n_per_repl % perm_range
-        i = 0
-        for p in range(n_per_repl // perm_range):
-            perm[i:i + perm_range] = np.random.permutation(perm_range) + i
-            i += perm_range
-        if remainder > 0:
-            perm[-remainder:] = np.random.permutation(remainder) + i
-    return perm
-
-
-def _swap_blocks(n_per_repl, block_size, swap_range):
+    # Permute within blocks of length perm_range by sorting random keys
+    # offset by the block index.
+    block = np.arange(n_per_repl) // perm_range
+    return np.argsort(block + utils.get_rng(rng).random(
+                                            _size(n_per_repl, n_perm)),
+                      axis=-1)
+
+
+def _swap_blocks(n_per_repl, block_size, swap_range, n_perm=None, rng=None):
     """Permute blocks of samples in a time series within a given range.
 
     Blocks of samples are permuted within a time series. If a swap range is
-    given, blocks are only swapped with other blocks within that range.
+    given, blocks are only swapped with other blocks within that range. The
+    last block is shorter if n_per_repl is not a multiple of block_size.
 
     Args:
         n_per_repl : int
@@ -263,56 +369,61 @@ def _swap_blocks(n_per_repl, block_size, swap_range):
             number of samples in a block
         swap_range : int
             range over which blocks can be swapped
+        n_perm : int [optional]
+            number of permutations, if None a single permutation is returned
+            (default=None)
+        rng : numpy Generator, int, or SeedSequence [optional]
+            random number generator or seed (default=None)
 
     Returns:
         numpy array
-            permuted indices with length n_per_repl
+            permuted indices with dimensions n_perm x n_per_repl
     """
     n_blocks = np.ceil(n_per_repl / block_size).astype(int)
-    rem_samples = n_per_repl % block_size
-
-    # First permute block(!) indices.
-    if swap_range == n_blocks:  # permute all realisations in one replication
-        perm = np.random.permutation(n_blocks)
-    else:  # build a permutation that permutes only within the perm_range
-        perm = np.empty(n_blocks, dtype=int)
-        rem_blocks = n_blocks % swap_range
-        i = 0
-        for p in range(n_blocks // swap_range):
-            perm[i:i + swap_range] = np.random.permutation(swap_range) + i
-            i += swap_range
-        if rem_blocks > 0:
-            perm[-rem_blocks:] = np.random.permutation(rem_blocks) + i
-
-    # Blow up block indices so we get one permuted index for each samples in a
-    # block.
-    return np.hstack((np.repeat(perm[:-1], block_size),
-                      np.repeat(perm[-1:], rem_samples)))
-
-
-def _circular_shift(n_per_repl, max_shift):
+    assert n_blocks > 1, ('Block size ({0}) has to be smaller than the number '
+                          'of samples ({1}).'.format(block_size, n_per_repl))
+
+    # Permute block(!) indices, then sort samples by the new position of their
+    # block, keeping the order of samples within blocks.
+    perm = _swap_local(n_blocks, swap_range, n_perm, rng)
+    position = np.take(np.argsort(perm, axis=-1),
+                       np.arange(n_per_repl) // block_size, axis=-1)
+    return np.argsort(position, axis=-1, kind='stable')
+
+
+def _circular_shift(n_per_repl, max_shift, n_perm=None, rng=None):
     """Permute a time series through shifting by a random number of samples.
 
     A time series is shifted circularly by a random number of samples. A
     circular shift of n means, that the last n samples are included at the
     beginning of the time series and all other sample indices are increased
-    by n steps. max_shift is an upper limit for n.
+    by n steps. max_shift is an upper limit for n, n is at least 1 (a shift
+    by 0 samples returns the original time series).
 
     Args:
         n_per_repl : int
             number of samples in one replication
         max_shift: int
             maximum possible shift (default=n_per_repl)
+        n_perm : int [optional]
+            number of permutations, if None a single permutation is returned
+            (default=None)
+        rng : numpy Generator, int, or SeedSequence [optional]
+            random number generator or seed (default=None)
 
     Returns:
         numpy array
-            permuted indices with length n_per_repl
+            permuted indices with dimensions n_perm x n_per_repl
     """
-    assert (max_shift < n_per_repl), ('Max_shift ({0}) has to be smaller than'
-                                      'the number of samples in the time '
-                                      'series ({1}).'.format(max_shift,
-                                                             n_per_repl))
-    shift = np.random.randint(max_shift + 1)
-
-    return np.hstack((np.arange(n_per_repl - shift, n_per_repl),
-                      np.arange(n_per_repl - shift)))
+    assert (0 < max_shift < n_per_repl), (
+        'Max_shift ({0}) has to be larger than 0 and smaller than the number '
+        'of samples in the time series ({1}).'.format(max_shift, n_per_repl))
+    shift = utils.get_rng(rng).integers(1, max_shift + 1, size=n_perm)
+    return (np.arange(n_per_repl) - np.expand_dims(shift, -1)) % n_per_repl
+
+
+def _size(n_per_repl, n_perm):
+    """Return the shape of an array of permutations."""
+    if n_perm is None:
+        return n_per_repl
+    return (n_perm, n_per_repl)
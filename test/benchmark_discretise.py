@@ -0,0 +1,50 @@
+"""Benchmark discretisation of continuous data.
+
+Measure the throughput of the discretisation functions in idtxl_utils, which
+are called by every discrete estimator on continuous input data. By default,
+data of 1e6 samples x 10 dimensions are discretised, pass a different number
+of samples as first command line argument.
+
+Usage:
+    python benchmark_discretise.py [n_samples]
+"""
+import sys
+import time
+import numpy as np
+from idtxl import idtxl_utils as utils
+
+N_DIM = 10
+N_BINS = 4
+N_REPEAT = 3
+
+
+def benchmark(func, *args):
+    """Return the best run time in seconds over N_REPEAT runs."""
+    times = []
+    for r in range(N_REPEAT):
+        t = time.perf_counter()
+        func(*args)
+        times.append(time.perf_counter() - t)
+    return min(times)
+
+
+def run(n_samples):
+    data = np.random.randn(n_samples, N_DIM)
+    discrete = utils.discretise(data, N_BINS)
+    print('Discretising {0} samples x {1} dimensions into {2} bins'.format(
+                                                n_samples, N_DIM, N_BINS))
+    for (name, func, args) in [
+            ('discretise', utils.discretise, (data, N_BINS)),
+            ('discretise_max_ent', utils.discretise_max_ent, (data, N_BINS)),
+            ('combine_discrete_dimensions', utils.combine_discrete_dimensions,
+             (discrete, N_BINS))]:
+        t = benchmark(func, *args)
+        print('{0:<28} {1:8.3f} s {2:10.2f} Msamples/s'.format(
+                                            name, t, n_samples / t / 1e6))
+
+
+if __name__ == '__main__':
+    if len(sys.argv) > 1:
+        run(int(float(sys.argv[1])))
+    else:
+        run(int(1e6))
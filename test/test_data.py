@@ -81,6 +81,32 @@ def test_data_normalisation():
                                                       'target did not work.')
 
 
+def test_out_of_core_data(tmp_path, monkeypatch):
+    """Test memory-mapped data against data held in memory."""
+    dat = np.random.rand(3, 200, 4) * np.array([1, 10, 100])[:, None, None]
+    file_name = str(tmp_path / 'data.npy')
+    np.save(file_name, np.swapaxes(dat, 0, 1))
+    d_mem = Data(dat, dim_order='psr')
+    d_file = Data(file_name, dim_order='spr')
+    assert d_file.out_of_core, 'Data from file should not be loaded.'
+    assert isinstance(d_file.data, np.memmap), 'Data are not memory-mapped.'
+    current_value = (1, 5)
+    idx_list = [(0, 1), (1, 3), (2, 4), (1, 5)]
+    [real_mem, repl_mem] = d_mem.get_realisations(current_value, idx_list)
+    [real_file, repl_file] = d_file.get_realisations(current_value, idx_list)
+    assert np.allclose(real_mem, real_file), (
+                'Realisations from file are not normalised correctly.')
+    assert (repl_mem == repl_file).all(), 'Replication index is incorrect.'
+
+    # Statistics combined over chunks of 7 samples equal statistics over all
+    # data.
+    monkeypatch.setattr('idtxl.data._CHUNK_BYTES', 8 * 3 * 4 * 7)
+    [mean, std] = d_file._streaming_statistics(d_file.data)
+    assert np.allclose(mean, dat.reshape(3, -1).mean(axis=1)), 'Wrong mean.'
+    assert np.allclose(std, dat.reshape(3, -1).std(axis=1, ddof=1)), (
+                                                        'Wrong std.')
+
+
 def test_get_data():
     """Test low-level function for data retrieval."""
     dat = Data()
@@ -112,6 +138,131 @@ def test_get_data():
     dat = d._get_data([current_value], current_value)[0]
 
 
+def test_get_data_gather():
+    """Test retrieval of realisations in one gather against slicing."""
+    n_samples = 30
+    n_repl = 4
+    dat = Data(np.random.rand(3, n_samples, n_repl), 'psr', normalise=False)
+    current_value = (1, 6)
+    idx_list = [(0, 2), (2, 6), (1, 0), (0, 2)]
+    real = dat.get_realisations(current_value, idx_list)[0]
+    n_real_time = n_samples - current_value[1]
+    for (i, idx) in enumerate(idx_list):
+        for r in range(n_repl):
+            assert (real[r * n_real_time:(r + 1) * n_real_time, i] ==
+                    dat.data[idx[0], idx[1]:idx[1] + n_real_time, r]).all(), (
+                        'Wrong realisations for index {0}.'.format(idx))
+
+    # A single index from a single replication is a read-only view.
+    dat = Data(np.random.rand(2, n_samples), 'ps')
+    real = dat.get_realisations(current_value, [(0, 3)])[0]
+    assert np.shares_memory(real, dat.data), 'Realisations are not a view.'
+    assert real.shape == (n_samples - current_value[1], 1), 'Wrong shape.'
+    with pytest.raises(ValueError):
+        real[0, 0] = 0
+
+    # NaNs are found when the data are set.
+    d = np.random.rand(2, n_samples, n_repl)
+    d[0, 10, 2] = np.nan
+    dat = Data(d, 'psr', normalise=False)
+    current_value = (1, 12)
+    dat.get_realisations(current_value, [(0, 11), (1, 3)])
+    with pytest.raises(AssertionError):
+        dat.get_realisations(current_value, [(0, 4)])
+
+
+def test_realisation_cache():
+    """Test caching of realisations."""
+    n_samples = 50
+    n_repl = 3
+    d = np.random.rand(2, n_samples, n_repl)
+    dat = Data(d, 'psr')
+    dat_uncached = Data(d, 'psr', cache_bytes=0)
+    current_value = (1, 5)
+    idx_list = [(0, 1), (1, 2), (0, 4)]
+    real = dat.get_realisations(current_value, idx_list)[0]
+    assert dat.cache_info()['misses'] == 3, 'Wrong no. cache misses.'
+    real_cached = dat.get_realisations((0, 5), [(0, 4), (1, 2)])[0]
+    assert dat.cache_info()['hits'] == 2, 'Wrong no. cache hits.'
+    assert (real[:, [2, 1]] == real_cached).all(), 'Wrong cached data.'
+    assert (real == dat_uncached.get_realisations(current_value,
+                                                  idx_list)[0]).all(), (
+                'Cached and uncached realisations differ.')
+    assert dat_uncached.cache_info()['n_entries'] == 0, 'Cache not disabled.'
+
+    # The least recently used realisations are removed first.
+    n_bytes = (n_samples - current_value[1]) * n_repl * 8
+    dat = Data(d, 'psr', cache_bytes=2 * n_bytes)
+    dat.get_realisations(current_value, [(0, 1), (1, 2)])
+    dat.get_realisations(current_value, [(0, 1)])
+    dat.get_realisations(current_value, [(0, 4)])
+    assert dat.cache_info()['n_bytes'] == 2 * n_bytes, 'Cache is too large.'
+    dat.get_realisations(current_value, [(0, 1), (0, 4)])
+    assert dat.cache_info()['hits'] == 3, 'Wrong realisations removed.'
+
+    # Indices with non-tuple entries (e.g., the target as a list) use the
+    # same cache entries.
+    real = dat.get_realisations(current_value, [(0, 1), (0, 4)])[0]
+    real_list = dat.get_realisations([[1], 5], [[[0], 1], [np.int64(0), 4]])[0]
+    assert (real == real_list).all(), 'Wrong realisations for list indices.'
+    assert dat.cache_info()['hits'] == 7, 'Cache not used for list indices.'
+
+    # Setting new data clears the cache.
+    dat.set_data(d[:, :, :2], 'psr')
+    assert dat.cache_info()['n_entries'] == 0, 'Cache was not cleared.'
+
+
+def test_float32_data():
+    """Test single precision storage and realisations."""
+    d = np.random.rand(2, 50, 3)
+    dat_64 = Data(d, 'psr')
+    dat_32 = Data(d, 'psr', dtype=np.float32)
+    assert dat_32.data.dtype == np.float32, 'Data not stored as float32.'
+    assert dat_32.data.nbytes == dat_64.data.nbytes // 2, (
+                                        'Data do not use half the memory.')
+    assert np.allclose(dat_32.data, dat_64.data, atol=1e-6), (
+                                        'Normalised data differ.')
+    current_value = (1, 5)
+    for idx_list in [[(0, 1)], [(0, 1), (1, 2)]]:
+        real = dat_32.get_realisations(current_value, idx_list)[0]
+        assert real.dtype == np.float32, 'Realisations are not float32.'
+    dat_32 = Data(d[:, :, :1], 'psr', normalise=False, dtype=np.float32)
+    assert dat_32.get_realisations(current_value, [(0, 1)])[0].dtype == (
+                                np.float32), 'Realisation view is not float32.'
+    with pytest.raises(TypeError):
+        Data(d, 'psr', dtype=int)
+
+
+def test_append_data():
+    """Test appending samples and replications against setting all data."""
+    d = np.random.rand(2, 60, 5) * np.array([1, 10])[:, None, None]
+    current_value = (1, 5)
+    idx_list = [(0, 1), (1, 2), (0, 4)]
+    for normalise in [True, False]:
+        dat = Data(d[:, :30, :3], 'psr', normalise=normalise)
+        dat.get_realisations(current_value, idx_list)
+        for i in range(30, 60, 10):  # several appends reuse the storage
+            dat.append_samples(d[:, i:i + 10, :3])
+        dat.append_replications(d[:, :, 3:])
+        dat_all = Data(d, 'psr', normalise=normalise)
+        assert dat.data.shape == dat_all.data.shape, 'Wrong data shape.'
+        real = dat.get_realisations(current_value, idx_list)[0]
+        real_all = dat_all.get_realisations(current_value, idx_list)[0]
+        assert np.allclose(real, real_all), (
+                    'Realisations from appended data are incorrect.')
+        assert dat.cache_info()['extensions'] == 3, (
+                    'Cached realisations were not extended.')
+        real = dat.get_realisations(current_value, [(1, 2)])[0]
+        assert np.allclose(real[:, 0], real_all[:, 1]), (
+                    'Extended cached realisations are incorrect.')
+
+    # Appended data must match the existing data.
+    with pytest.raises(RuntimeError):
+        dat.append_samples(d[:, :10, :3])
+    with pytest.raises(RuntimeError):
+        dat.append_replications(d[:1, :, :])
+
+
 def test_permute_replications():
     """Test surrogate creation by permuting replications."""
     n = 20
@@ -171,9 +322,29 @@ def test_permute_replications():
 def test_permute_samples():
     pass
 
+
+def test_permutation_seed():
+    """Test reproducibility of permutations for a given generator or seed."""
+    data = Data(np.arange(200).reshape(1, 20, 10), 'psr', normalise=False)
+    current_value = (0, 5)
+    l = [(0, 1), (0, 3)]
+    for method in [data.permute_replications, data.permute_samples]:
+        [perm_1, idx_1] = method(current_value, l, rng=42)
+        [perm_2, idx_2] = method(current_value, l,
+                                 rng=np.random.default_rng(42))
+        assert (perm_1 == perm_2).all() and (idx_1 == idx_2).all(), (
+                                'Permutation not reproducible for a seed.')
+        assert not (method(current_value, l, rng=43)[0] == perm_1).all(), (
+                                'Permutation identical for different seeds.')
+
 if __name__ == '__main__':
     test_get_data()
+    test_get_data_gather()
+    test_realisation_cache()
+    test_float32_data()
+    test_append_data()
     test_data_normalisation()
     test_set_data()
     test_permute_replications()
     test_data_properties()
+    test_permutation_seed()
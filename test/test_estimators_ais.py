@@ -53,6 +53,24 @@ def test_ais_local_values():
                                analysis_opts)
     assert ais_res.shape[0] == n, 'Local AIS estimator did not return an array'
 
+
+def test_ais_discrete():
+    """Test native discrete AIS estimation."""
+    n = 1000
+    process = np.arange(n) % 2  # perfectly predictable from its past
+    est = Estimator_ais('discrete')
+    opts = {'history': 1, 'num_discrete_bins': 2}
+    assert np.isclose(est.estimate(process, opts=opts), 1), (
+                'AIS calculation for periodic process failed.')
+    process = np.random.randint(0, 4, n * 2)
+    opts = {'history': 2, 'tau': 2, 'num_discrete_bins': 4}
+    res = est.estimate(process, n_chunks=2, opts=opts)
+    assert res.shape[0] == 2, 'Wrong no. AIS estimates for chunks.'
+    assert np.all(np.abs(res) < 0.1), (
+                'AIS calculation for random process failed.')
+
+
 if __name__ == '__main__':
+    test_ais_discrete()
     test_ais_local_values()
     test_ais_gaussian()
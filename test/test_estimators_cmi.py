@@ -309,12 +309,188 @@ def test_cmi_estimator_jidt_discrete_discretisation():
     with pytest.raises(AssertionError):
         est.estimate(var1=source_2, var2=target, conditional=None, opts=opts)
 
+
+def test_cmi_estimator_kraskov():
+    """Test CPU Kraskov CMI estimation on Gaussian random data.
+
+    The first test set is correlated, the second uncorrelated. Multiple
+    chunks are estimated in parallel, results for individual chunks should
+    differ for random data.
+    """
+    rn.seed(0)
+    n = 4001  # needs to be odd as we loose one sample when shifting signals
+    cov = 0.4
+    source_1 = [rn.normalvariate(0, 1) for r in range(n)]  # correlated src
+    source_2 = [rn.normalvariate(0, 1) for r in range(n)]  # uncorrelated src
+    target = [sum(pair) for pair in zip(
+        [cov * y for y in source_1],
+        [(1 - cov) * y for y in [rn.normalvariate(0, 1) for r in range(n)]])]
+    # Cast everything to numpy so the idtxl estimator understands it.
+    source_1 = np.expand_dims(np.array(source_1), axis=1)
+    source_2 = np.expand_dims(np.array(source_2), axis=1)
+    target = np.expand_dims(np.array(target), axis=1)
+
+    opts = {'kraskov_k': 4, 'theiler_t': 0}
+    n_chunks = 2
+    est = Estimator_cmi('kraskov')
+    assert est.is_parallel, 'CPU Kraskov estimator should be parallel.'
+    res_1 = est.estimate(var1=source_1[1:], var2=target[1:],
+                         conditional=target[:-1], n_chunks=n_chunks, opts=opts)
+    res_2 = est.estimate(var1=source_2[1:], var2=target[1:],
+                         conditional=target[:-1], n_chunks=n_chunks, opts=opts)
+    # The past of the target is independent of the source, the expected CMI
+    # equals the MI between the Gaussians with correlation coefficient corr.
+    corr = cov / math.sqrt(math.pow(cov, 2) + math.pow(1 - cov, 2))
+    expected_res = -0.5 * math.log(1 - math.pow(corr, 2))
+    print('Example 1: CMI result for first chunk {0:.4f} nats; expected to be '
+          'close to {1:.4f} nats for these correlated Gaussians.'.format(
+                                                    res_1[0], expected_res))
+    print('Example 2: CMI result for first chunk {0:.4f} nats; expected to be '
+          'close to 0 nats for these uncorrelated Gaussians.'.format(
+                                                                res_2[0]))
+    assert res_1.shape[0] == n_chunks, 'Wrong number of results returned.'
+    assert (np.abs(res_1[0] - expected_res) < 0.1), ('CMI calculation for '
+                                                     'correlated Gaussians '
+                                                     'failed (error > 0.1).')
+    assert (np.abs(res_2[0]) < 0.07), ('CMI calculation for uncorrelated '
+                                       'Gaussians failed (error > 0.07).')
+    assert(res_1[0] != res_1[1]), ('CMI results for chunk 1 and 2 are '
+                                   'identical, this  is unlikely for random '
+                                   'data.')
+
+    # Without conditional, the estimator should fall back to MI estimation.
+    res_3 = est.estimate(var1=source_1[1:], var2=target[1:],
+                         conditional=None, n_chunks=n_chunks, opts=opts)
+    assert (np.abs(res_3[0] - expected_res) < 0.1), (
+                                'MI calculation for correlated Gaussians '
+                                'failed (error > 0.1).')
+
+
+def test_kraskov_theiler_window():
+    """Test neighbour searches on the CPU against a brute-force search."""
+    from idtxl import neighbour_search_cpu as nscpu
+    n_chunks = 3
+    theiler_t = 2
+    knn_k = 4
+    points = np.random.rand(90, 3)
+    chunksize = points.shape[0] // n_chunks
+    indexes, distances = nscpu.knn_search(points, 3, knn_k, theiler_t,
+                                          n_chunks)
+    count = nscpu.range_search(points[:, :2], 2, distances[-1, :], theiler_t,
+                               n_chunks)
+    for i in range(points.shape[0]):
+        c = i // chunksize
+        chunk = points[c * chunksize:(c + 1) * chunksize, :]
+        pos = i - c * chunksize
+        dist = np.max(np.abs(chunk - points[i, :]), axis=1)
+        dist[np.abs(np.arange(chunksize) - pos) <= theiler_t] = np.inf
+        assert np.allclose(np.sort(dist)[:knn_k], distances[:, i]), (
+                                    'KNN search returned wrong distances.')
+        dist = np.max(np.abs(chunk[:, :2] - points[i, :2]), axis=1)
+        dist[np.abs(np.arange(chunksize) - pos) <= theiler_t] = np.inf
+        assert np.sum(dist < distances[-1, i]) == count[i], (
+                                    'Range search returned wrong counts.')
+
+
+def test_kraskov_chunks():
+    """Test if estimation over chunks equals estimation per chunk."""
+    n_chunks = 4
+    chunksize = 200
+    source_1 = np.random.randn(n_chunks * chunksize, 1)
+    source_2 = source_1 + np.random.randn(n_chunks * chunksize, 1)
+    target = source_2 + np.random.randn(n_chunks * chunksize, 1)
+    cmi_est = Estimator_cmi('kraskov')
+    opts = {'noise_level': 0, 'theiler_t': 1}
+    cmi_chunks = cmi_est.estimate(var1=source_1, var2=target,
+                                  conditional=source_2, n_chunks=n_chunks,
+                                  opts=opts)
+    for c in range(n_chunks):
+        i = slice(c * chunksize, (c + 1) * chunksize)
+        cmi = cmi_est.estimate(var1=source_1[i], var2=target[i],
+                               conditional=source_2[i], opts=opts)
+        assert np.isclose(cmi_chunks[c], cmi), (
+            'CMI for chunk {0} differs from single estimate.'.format(c))
+
+
+def test_cmi_estimator_discrete():
+    """Test native discrete CMI estimation against plug-in entropies."""
+    def entropy(*variables):
+        states = np.unique(np.column_stack(variables), axis=0,
+                           return_counts=True)[1]
+        p = states / states.sum()
+        return -np.sum(p * np.log2(p))
+
+    n = 2000
+    var1 = np.random.randint(0, 3, (n, 2))
+    var2 = (var1[:, :1] + np.random.randint(0, 2, (n, 1))) % 3
+    conditional = np.random.randint(0, 3, (n, 1))
+    cmi_expected = (entropy(var1, conditional) + entropy(var2, conditional) -
+                    entropy(var1, var2, conditional) - entropy(conditional))
+    est = Estimator_cmi('discrete')
+    opts = {'num_discrete_bins': 3}
+    cmi = est.estimate(var1, var2, conditional, opts=opts)
+    assert np.isclose(cmi, cmi_expected), 'CMI calculation failed.'
+    cmi_chunks = est.estimate_mult(
+                    n_chunks=3, options=opts, re_use=['var2', 'conditional'],
+                    var1=np.vstack((var1, var1, var1)), var2=var2,
+                    conditional=conditional)
+    assert np.allclose(cmi_chunks, cmi_expected), (
+                'CMI calculation for multiple chunks failed.')
+    opts['local_values'] = True
+    local_cmi = est.estimate(var1, var2, conditional, opts=opts)
+    assert np.isclose(np.mean(local_cmi), cmi_expected), (
+                'Mean of local CMI does not match average CMI.')
+
+
+def test_cmi_estimator_gaussian():
+    """Test Gaussian CMI estimation against the analytic solution."""
+    n = 10000
+    cov = 0.4
+    source = np.random.randn(n, 1)
+    conditional = np.random.randn(n, 1)
+    target = (cov * source + (1 - cov) * np.random.randn(n, 1) +
+              conditional)
+    cmi_est = Estimator_cmi('gaussian')
+    res = cmi_est.estimate(source, target, conditional)
+    expected_cmi = -0.5 * math.log(1 - cov ** 2 / (cov ** 2 + (1 - cov) ** 2))
+    print('Gaussian CMI result {0:.4f} nats; expected to be close to {1:.4f} '
+          'nats.'.format(res[0], expected_cmi))
+    assert np.abs(res[0] - expected_cmi) < 0.05, (
+                        'CMI calculation for correlated Gaussians failed.')
+    res_mi = cmi_est.estimate(source, target)
+    corr = np.corrcoef(source[:, 0], target[:, 0])[0, 1]
+    assert np.isclose(res_mi[0], -0.5 * math.log(1 - corr ** 2)), (
+                        'MI calculation for correlated Gaussians failed.')
+
+    # Estimate surrogates in one call, re-using target and conditional.
+    n_chunks = 5
+    chunksize = 1000
+    surrogates = np.vstack([np.random.permutation(source[:chunksize])
+                            for c in range(n_chunks)])
+    res_mult = cmi_est.estimate_mult(n_chunks=n_chunks, options={},
+                                     re_use=['var2', 'conditional'],
+                                     var1=surrogates,
+                                     var2=target[:chunksize],
+                                     conditional=conditional[:chunksize])
+    assert res_mult.shape[0] == n_chunks, 'Wrong number of results returned.'
+    for c in range(n_chunks):
+        res_c = cmi_est.estimate(surrogates[c * chunksize:(c + 1) * chunksize],
+                                 target[:chunksize], conditional[:chunksize])
+        assert np.isclose(res_mult[c], res_c[0]), (
+                        'Result for chunk {0} does not match.'.format(c))
+
+
 # TODO: add assertions for the right values
 
 if __name__ == '__main__':
+    test_cmi_estimator_gaussian()
     test_cmi_estimator_jidt_discrete_discretisation()
     test_compare_opencl_jidt_implementation()
     test_cmi_estimator_jidt_kraskov()
     test_cmi_estimator_ocl()
     test_cmi_no_c_estimator_ocl()
     test_cmi_estimator_jidt_discrete()
+    test_cmi_estimator_kraskov()
+    test_kraskov_theiler_window()
+    test_kraskov_chunks()
+    test_cmi_estimator_discrete()
@@ -36,6 +36,23 @@ def test_mi_estimator_jidt_discrete():
     assert (res_2 == 0), ('MI calculation for no correlation failed.')
 
 
+def test_mi_estimator_discrete():
+    """Test native discrete MI estimation on two sets of discrete data."""
+    n = 1000
+    source_1 = (np.arange(n) >= n / 2).astype(int)
+    source_2 = np.arange(n) % 2
+    target = source_1.copy()
+    opts = {'num_discrete_bins': 2, 'discretise_method': 'none'}
+    est = Estimator_mi('discrete')
+    res_1 = est.estimate(var1=source_1, var2=target, opts=opts)
+    res_2 = est.estimate(var1=source_2, var2=target, opts=opts)
+    assert np.isclose(res_1, 1), ('MI calculation for copy failed.')
+    assert np.isclose(res_2, 0), ('MI calculation for no correlation failed.')
+    res = est.estimate_mult(n_chunks=2, options=opts, re_use=['var2'],
+                            var1=np.hstack((source_1, source_2)), var2=target)
+    assert np.allclose(res, [1, 0]), ('MI calculation for chunks failed.')
+
+
 def test_mi_local_values():
     """Test local MI estimation."""
     n = 1000
@@ -58,8 +75,49 @@ def test_mi_local_values():
     mi_res = mi_est.estimate(source, target, analysis_opts)
     assert mi_res.shape[0] == n, 'Local MI estimator did not return an array.'
 
+
+def test_mi_estimator_kraskov():
+    """Test CPU Kraskov MI estimation on correlated Gaussian data."""
+    n = 4000
+    cov = 0.4
+    source = [rn.normalvariate(0, 1) for r in range(n)]
+    target = [sum(pair) for pair in zip(
+        [cov * y for y in source],
+        [(1 - cov) * y for y in [rn.normalvariate(0, 1) for r in range(n)]])]
+    source = np.expand_dims(np.array(source), axis=1)
+    target = np.expand_dims(np.array(target), axis=1)
+    opts = {'kraskov_k': 4, 'theiler_t': 0, 'noise_level': 0}
+    mi_est = Estimator_mi('kraskov')
+    mi_res = mi_est.estimate(source, target, n_chunks=2, opts=opts)
+    corr = np.corrcoef(source[:, 0], target[:, 0])[0, 1]
+    expected_mi = -0.5 * math.log(1 - math.pow(corr, 2))
+    print('MI result {0:.4f} nats; expected to be close to {1:.4f} nats for '
+          'correlated Gaussians.'.format(mi_res[0], expected_mi))
+    assert mi_res.shape[0] == 2, 'Wrong number of results returned.'
+    assert (np.abs(mi_res[0] - expected_mi) < 0.1), (
+                        'MI calculation for correlated Gaussians failed.')
+
+
+def test_mi_estimator_gaussian():
+    """Test Gaussian MI estimation on correlated Gaussian data."""
+    n = 4000
+    cov = 0.4
+    source = np.random.randn(n, 1)
+    target = cov * source + (1 - cov) * np.random.randn(n, 1)
+    mi_est = Estimator_mi('gaussian')
+    mi_res = mi_est.estimate(source, target, n_chunks=2)
+    assert mi_res.shape[0] == 2, 'Wrong number of results returned.'
+    for c in range(2):
+        s = slice(c * n // 2, (c + 1) * n // 2)
+        corr = np.corrcoef(source[s, 0], target[s, 0])[0, 1]
+        assert np.isclose(mi_res[c], -0.5 * math.log(1 - math.pow(corr, 2))), (
+                        'MI calculation for correlated Gaussians failed.')
+
 # TODO: add assertions for the right values
 
 if __name__ == '__main__':
+    test_mi_estimator_gaussian()
     test_mi_local_values()
+    test_mi_estimator_discrete()
     test_mi_estimator_jidt_discrete()
+    test_mi_estimator_kraskov()
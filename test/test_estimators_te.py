@@ -138,6 +138,74 @@ def test_te_estimator_jidt_discrete():
                                          'failed.')
 
 
+def test_te_estimator_discrete():
+    """Test native discrete TE estimation against the JIDT examples."""
+    opts = {'num_discrete_bins': 2,
+            'history_target': 1,
+            'discretise_method': 'none'}
+    est = Estimator_te('discrete')
+    n = 1001
+    source_1 = np.array([math.floor(t / 2) % 2 for t in range(n)])
+    target = np.zeros(n, np.int_)
+    target[0] = 1
+    target[1:] = source_1[:-1]
+    res_1 = est.estimate(source_1, target, opts=opts)
+    assert (np.abs(res_1 - 1) < 0.0001), ('TE calculation for copy failed.')
+    opts['history_target'] = 2
+    res_2 = est.estimate(source_1, target, opts=opts)
+    assert (np.abs(res_2 - 0) < 0.0001), ('TE calculation for k=2 dependent '
+                                          'copy failed.')
+
+    # Target is an XOR of source and target past, test source delay 2.
+    opts['history_target'] = 1
+    source_2 = np.random.randint(0, 2, n)
+    for t in range(2, n):
+        target[t] = target[t-1] ^ source_2[t-2]
+    res_3a = est.estimate(source_2, target, opts=opts)
+    assert (np.abs(res_3a - 0) < 0.01), ('TE calculation for delayed XOR '
+                                         'failed.')
+    opts['source_target_delay'] = 2
+    res_3b = est.estimate(source_2, target, opts=opts)
+    assert (np.abs(res_3b - 1) < 0.01), ('TE calculation for delayed XOR '
+                                         'failed.')
+
+    # Estimate TE for multiple chunks in parallel.
+    res_chunks = est.estimate(np.tile(source_2, 3), np.tile(target, 3),
+                              n_chunks=3, opts=opts)
+    assert np.allclose(res_chunks, res_3b), (
+                'TE calculation for multiple chunks failed.')
+    opts['local_values'] = True
+    local_te = est.estimate(source_2, target, opts=opts)
+    assert local_te.shape[0] == n - 2, 'Wrong no. local TE values.'
+    assert np.isclose(np.mean(local_te), res_3b), (
+                'Mean of local TE does not match average TE.')
+
+
+def test_te_estimator_gaussian():
+    """Test Gaussian TE estimation on a coupled linear process."""
+    n = 10000
+    coupling = 0.5
+    noise = 0.5
+    source = np.random.randn(n)
+    target = np.zeros(n)
+    target[1:] = coupling * source[:-1] + noise * np.random.randn(n - 1)
+    opts = {'history_target': 2}
+    est = Estimator_te('gaussian')
+    res = est.estimate(source, target, opts=opts)
+    expected_te = 0.5 * math.log((coupling ** 2 + noise ** 2) / noise ** 2)
+    print('Gaussian TE result {0:.4f} nats; expected to be close to {1:.4f} '
+          'nats.'.format(res[0], expected_te))
+    assert np.abs(res[0] - expected_te) < 0.05, (
+                                'TE calculation for coupled process failed.')
+    res_reverse = est.estimate(target, source, opts=opts)
+    assert np.abs(res_reverse[0]) < 0.01, (
+                                'TE calculation for uncoupled direction failed.')
+    res_chunks = est.estimate(np.tile(source, 2), np.tile(target, 2),
+                              n_chunks=2, opts=opts)
+    assert np.allclose(res_chunks, res[0]), (
+                'TE calculation for multiple chunks failed.')
+
+
 def test_te_local_values():
     """Test local TE estimation."""
     n = 1000
@@ -166,5 +234,7 @@ def test_te_local_values():
 
 if __name__ == '__main__':
     test_te_local_values()
+    test_te_estimator_discrete()
+    test_te_estimator_gaussian()
     test_te_estimator_jidt_discrete()
     test_multivariate_te_corr_gaussian()
@@ -24,6 +24,13 @@ def test_combine_discrete_dimensions():
     combined = utils.combine_discrete_dimensions(np.array([[1,0,1],[0,1,0]]), 3)
     assert combined[0] == 10
     assert combined[1] == 3
+    # Test detection of overflows
+    try:
+        utils.combine_discrete_dimensions(np.zeros((2, 64), dtype=int), 2)
+    except ArithmeticError:
+        pass
+    else:
+        assert False, 'Overflow was not detected.'
 
 
 def test_discretise():
@@ -51,6 +58,9 @@ def test_discretise():
     assert discretised.shape[1] == 2
     assert (type(discretised[0,0]) == np.int32) or (type(discretised[0,0]) == np.int64)
     assert check_all_bools_true_2d(discretised == np.array([[1,0],[1,0],[1,0],[ 0,1],[0,1]]))
+    # Test discretisation of a constant dimension
+    discretised = utils.discretise(np.array([[1,0.5],[1,0],[1,1]]), 2)
+    assert check_all_bools_true_2d(discretised == np.array([[0,1],[0,0],[0,1]]))
 
 
 def test_discretise_max_ent():
@@ -74,6 +84,32 @@ def test_discretise_max_ent():
     assert check_all_bools_true_2d(discretised == np.array([[1,0],[1,0],[0,0],[0,1]]))
 
 
+def test_seed_sequence():
+    """Test identification of independent random streams."""
+    assert utils.seed_sequence(None, 1, 2) is None, 'Expected None.'
+    children = np.random.SeedSequence(42).spawn(3)
+    grandchild = children[2].spawn(2)[1]
+    for (ss, key) in [(children[0], (0,)), (grandchild, (2, 1))]:
+        assert (utils.seed_sequence(42, *key).generate_state(4) ==
+                ss.generate_state(4)).all(), 'Stream does not match spawn().'
+    assert (utils.seed_sequence(children[2], 1).generate_state(4) ==
+            grandchild.generate_state(4)).all(), 'Wrong nested stream.'
+
+    # Generators for identical keys are identical, for different keys they
+    # are not.
+    assert (utils.get_rng(42, 3, 1).random(10) ==
+            utils.get_rng(42, 3, 1).random(10)).all(), 'Not reproducible.'
+    assert (utils.get_rng(42, 3, 1).random(10) !=
+            utils.get_rng(42, 1, 3).random(10)).all(), 'Streams not distinct.'
+    rng = np.random.default_rng(1)
+    assert utils.get_rng(rng) is rng, 'Generator not returned as is.'
+    np.random.seed(0)
+    r = utils.get_rng().random(10)
+    np.random.seed(0)
+    assert (utils.get_rng().random(10) == r).all(), (
+                            'Unseeded generator not drawn from global state.')
+
+
 def check_all_bools_true(bool_array):
     for ind in range(bool_array.shape[0]):
         if not(bool_array[ind]):
@@ -93,3 +129,4 @@ if __name__ == '__main__':
     test_combine_discrete_dimensions()
     test_discretise()
     test_discretise_max_ent()
+    test_seed_sequence()
@@ -0,0 +1,69 @@
+"""Unit tests for the JIDT calculator cache."""
+import numpy as np
+from idtxl import jidt_calculators as jidt
+from idtxl.set_estimator import Estimator_cmi
+
+
+def test_calculator_cache():
+    """Test re-use of cached calculators."""
+    jidt.clear_cache()
+    jidt.reset_stats()
+    package = 'infodynamics.measures.continuous.kraskov'
+    class_name = 'ConditionalMutualInfoCalculatorMultiVariateKraskov1'
+    properties = {'k': 4, 'NOISE_LEVEL_TO_ADD': 0}
+    calc_1 = jidt.get_calculator(package, class_name, properties, (1, 1, 1))
+    calc_2 = jidt.get_calculator(package, class_name, properties, (1, 1, 1))
+    calc_3 = jidt.get_calculator(package, class_name, properties, (2, 1, 1))
+    assert calc_1 is calc_2, 'Calculator was not re-used.'
+    assert calc_1 is not calc_3, 'Calculator was re-used for other dims.'
+    stats = jidt.get_stats()
+    assert stats['hits'] == 1, 'Wrong no. cache hits.'
+    assert stats['misses'] == 2, 'Wrong no. cache misses.'
+    assert stats['n_calculators'] == 2, 'Wrong no. cached calculators.'
+    assert stats['jvm_time'] > 0, 'JVM time was not recorded.'
+
+
+def test_cached_estimates():
+    """Test if estimates are unchanged when calculators are re-used."""
+    jidt.clear_cache()
+    cmi_estimator = Estimator_cmi('jidt_kraskov')
+    var1 = np.random.randn(1000, 1)
+    var2 = var1 + np.random.randn(1000, 1)
+    conditional = np.random.randn(1000, 1)
+    opts = {'noise_level': 0}
+    cmi_1 = cmi_estimator.estimate(var1, var2, conditional, opts=opts)
+    cmi_2 = cmi_estimator.estimate(var1, var2, conditional, opts=opts)
+    jidt.clear_cache()
+    cmi_3 = cmi_estimator.estimate(var1, var2, conditional, opts=opts)
+    assert cmi_1 == cmi_2 == cmi_3, 'Estimates differ for cached calculators.'
+
+
+def test_java_arrays():
+    """Test conversion of numpy arrays into Java arrays."""
+    jidt.start_jvm()
+    values = np.random.randint(0, 5, size=(100, 3))
+    java_1d = jidt.to_java_int_array(values[:, 0])
+    java_2d = jidt.to_java_int_array(values)
+    assert list(java_1d) == values[:, 0].tolist(), 'Int conversion failed.'
+    assert [list(row) for row in java_2d] == values.tolist(), (
+                'Int conversion failed for 2D array.')
+    values = np.random.rand(100, 2)
+    java_2d = jidt.to_java_double_array(values)
+    assert [list(row) for row in java_2d] == values.tolist(), (
+                'Double conversion failed for 2D array.')
+
+
+def test_jvm_timer():
+    """Test recording of time spent in the JVM."""
+    jidt.reset_stats()
+    assert jidt.get_stats()['jvm_time'] == 0, 'JVM time was not reset.'
+    with jidt.jvm_timer():
+        sum(range(1000))
+    assert jidt.get_stats()['jvm_time'] > 0, 'JVM time was not recorded.'
+
+
+if __name__ == '__main__':
+    test_jvm_timer()
+    test_calculator_cache()
+    test_cached_estimates()
+    test_java_arrays()
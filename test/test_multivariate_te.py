@@ -146,6 +146,58 @@ def test_include_target_candidates():
     pass
 
 
+def test_incremental_mode():
+    """Test incremental Gaussian CMI against estimation from realisations."""
+    analysis_opts = {'cmi_calc_name': 'jidt_kraskov',
+                     'incremental_mode': True}
+    with pytest.raises(RuntimeError):
+        Multivariate_te(5, 1, 5, analysis_opts)
+
+    analysis_opts['cmi_calc_name'] = 'gaussian'
+    dat = Data()
+    dat.generate_mute_data(200, 3)
+    nw = Multivariate_te(5, 1, 5, analysis_opts)
+    nw._initialise(dat, 'all', 0)
+    candidates = nw._define_candidates([1, 2, 3, 4], [4, 3, 2])
+    nw._append_selected_vars_idx([(0, 4)])
+    nw._append_selected_vars_realisations(
+                            dat.get_realisations(nw.current_value, [(0, 4)])[0])
+    cmi_state = nw._init_incremental_cmi(candidates, dat)
+    assert np.allclose(cmi_state.cmi(candidates),
+                       nw._estimate_candidates_te(candidates, dat)), (
+                'Incremental CMI does not match estimate from realisations.')
+
+    # Add candidates to the conditioning set and test the rank-one updates.
+    for c in [(1, 4), (3, 2)]:
+        candidates.pop(candidates.index(c))
+        nw._append_selected_vars_idx([c])
+        nw._append_selected_vars_realisations(
+                                dat.get_realisations(nw.current_value, [c])[0])
+        cmi_state.condition([c])
+        assert np.allclose(cmi_state.cmi(candidates),
+                           nw._estimate_candidates_te(candidates, dat)), (
+                'Incremental CMI does not match after adding {0}.'.format(c))
+
+    # Remove candidates from the conditioning set as during pruning.
+    candidates.pop(candidates.index((2, 3)))
+    nw._append_selected_vars_idx([(2, 3)])
+    nw._append_selected_vars_realisations(
+                        dat.get_realisations(nw.current_value, [(2, 3)])[0])
+    cmi_state.condition([(2, 3)])
+    assert np.allclose(cmi_state.cmi_conditional(nw.selected_vars_sources),
+                       nw._estimate_selected_te(dat)), (
+                'Incremental CMI does not match for the conditional set.')
+    nw._remove_candidate((1, 4))
+    cmi_state.remove((1, 4))
+    candidates.append((1, 4))
+    assert np.allclose(cmi_state.cmi_conditional(nw.selected_vars_sources),
+                       nw._estimate_selected_te(dat)), (
+                'Incremental CMI does not match after removing a candidate.')
+    assert np.allclose(cmi_state.cmi(candidates),
+                       nw._estimate_candidates_te(candidates, dat)), (
+                'Partial covariance does not match after removal.')
+
+
 def test_test_final_conditional():
     pass
 
@@ -170,3 +222,4 @@ if __name__ == '__main__':
     test_multivariate_te_initialise()  # my own function _initialise
     test_multivariate_te_init()  # init function of the Class
     test_check_source_set()
+    test_incremental_mode()
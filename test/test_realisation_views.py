@@ -0,0 +1,151 @@
+"""Unit tests for views on realisations.
+
+Test the representation of re-used realisations without replicating data.
+"""
+import numpy as np
+from idtxl import realisation_views as rv
+from idtxl.set_estimator import Estimator_cmi
+
+
+def test_broadcast_realisations():
+    """Test broadcast realisations against replicated arrays."""
+    n_chunks = 5
+    base = np.random.rand(20, 3)
+    view = rv.Broadcast_realisations(base, n_chunks)
+    tiled = np.tile(base, (n_chunks, 1))
+    assert view.shape == tiled.shape, 'Shape of view is incorrect.'
+    assert view.nbytes == base.nbytes, 'View should not copy data.'
+    assert np.array_equal(np.asarray(view), tiled), (
+                'Conversion into array failed.')
+    assert np.asarray(view, dtype=np.float32).dtype == np.float32, (
+                'Conversion into requested dtype failed.')
+    for c in range(n_chunks):
+        assert np.array_equal(rv.get_chunk(view, c, n_chunks),
+                              rv.get_chunk(tiled, c, n_chunks)), (
+                'Chunk {0} of view is incorrect.'.format(c))
+
+
+def test_permuted_realisations():
+    """Test permuted realisations against permuted arrays."""
+    n_chunks = 5
+    base = np.random.rand(20, 3)
+    index = np.vstack([np.random.permutation(20) for c in range(n_chunks)])
+    view = rv.Permuted_realisations(base, index)
+    permuted = np.vstack([base[index[c], :] for c in range(n_chunks)])
+    assert view.shape == permuted.shape, 'Shape of view is incorrect.'
+    assert view.n_chunks == n_chunks, 'No. chunks is incorrect.'
+    assert view.nbytes == base.nbytes + index.size * 4, (
+                'View should hold realisations and an int32 index only.')
+    assert np.array_equal(np.asarray(view), permuted), (
+                'Conversion into array failed.')
+    for c in range(n_chunks):
+        assert np.array_equal(rv.get_chunk(view, c, n_chunks),
+                              rv.get_chunk(permuted, c, n_chunks)), (
+                'Chunk {0} of view is incorrect.'.format(c))
+    assert np.array_equal(np.asarray(view.chunks(1, 3)), permuted[20:60]), (
+                'Selection of chunks failed.')
+
+
+def test_stacked_realisations():
+    """Test stacking of views and arrays."""
+    n_chunks = 4
+    var1 = np.random.rand(40, 2)
+    var2 = rv.Broadcast_realisations(np.random.rand(10, 1), n_chunks)
+    var3 = rv.Broadcast_realisations(np.random.rand(10, 2), n_chunks)
+    stacked = rv.hstack((var1, var2, var3), n_chunks)
+    expected = np.hstack((var1, np.asarray(var2), np.asarray(var3)))
+    assert stacked.shape == expected.shape, 'Shape of view is incorrect.'
+    assert np.array_equal(np.asarray(stacked), expected), (
+                'Conversion into array failed.')
+    for c in range(n_chunks):
+        assert np.array_equal(rv.get_chunk(stacked, c, n_chunks),
+                              rv.get_chunk(expected, c, n_chunks)), (
+                'Chunk {0} of view is incorrect.'.format(c))
+    # Stacking broadcast variables only should return a broadcast view.
+    stacked = rv.hstack((var2, var3), n_chunks)
+    assert isinstance(stacked, rv.Broadcast_realisations), (
+                'Stacking broadcast views should return a broadcast view.')
+    assert stacked.shape == (40, 3), 'Shape of view is incorrect.'
+    # Stacking arrays only should return an array.
+    assert isinstance(rv.hstack((var1, var1), n_chunks), np.ndarray), (
+                'Stacking arrays should return an array.')
+
+
+def test_view_dtype():
+    """Test if views keep the data type of their realisations."""
+    n_chunks = 3
+    for dtype in [np.float32, np.int64]:
+        base = (np.random.rand(10, 2) * 10).astype(dtype)
+        views = [rv.Broadcast_realisations(base, n_chunks),
+                 rv.Permuted_realisations(
+                    base, np.vstack([np.random.permutation(10)
+                                     for c in range(n_chunks)])),
+                 rv.hstack((np.tile(base, (n_chunks, 1)),
+                            rv.Broadcast_realisations(base, n_chunks)),
+                           n_chunks)]
+        for view in views:
+            assert np.asarray(view).dtype == dtype, (
+                'Conversion into array changed the data type of {0}.'.format(
+                                                        type(view).__name__))
+
+
+def test_estimate_mult_re_use():
+    """Test parallel estimation on re-used realisations."""
+    n_chunks = 6
+    chunk_size = 300
+    var1 = np.random.randn(n_chunks * chunk_size, 1)
+    var2 = np.random.randn(chunk_size, 2)
+    conditional = np.random.randn(chunk_size, 1)
+    cmi_estimator = Estimator_cmi('kraskov')
+    options = {'noise_level': 0, 'theiler_t': 1}
+    cmi_view = cmi_estimator.estimate_mult(
+                    n_chunks=n_chunks, options=options,
+                    re_use=['var2', 'conditional'], var1=var1, var2=var2,
+                    conditional=conditional)
+    cmi_tiled = cmi_estimator.estimate(
+                    var1=var1, var2=np.tile(var2, (n_chunks, 1)),
+                    conditional=np.tile(conditional, (n_chunks, 1)),
+                    n_chunks=n_chunks, opts=options)
+    assert np.allclose(cmi_view, cmi_tiled), (
+                'Estimates on broadcast realisations differ from estimates on '
+                'replicated realisations.')
+
+
+def test_estimate_mult_permuted():
+    """Test estimation on permuted realisations for native estimators."""
+    n_chunks = 4
+    chunk_size = 200
+    base = np.random.randn(chunk_size, 1)
+    var2 = base + np.random.randn(chunk_size, 1)
+    conditional = np.random.randn(chunk_size, 1)
+    index = np.vstack([np.random.permutation(chunk_size)
+                       for c in range(n_chunks)])
+    index[0] = np.arange(chunk_size)  # first chunk holds the original data
+    view = rv.Permuted_realisations(base, index)
+    for (name, options) in [
+            ('kraskov', {'noise_level': 0, 'theiler_t': 1}),
+            ('gaussian', {}),
+            ('discrete', {'discretise_method': 'max_ent'})]:
+        cmi_estimator = Estimator_cmi(name)
+        cmi_view = cmi_estimator.estimate_mult(
+                    n_chunks=n_chunks, options=options,
+                    re_use=['var2', 'conditional'], var1=view, var2=var2,
+                    conditional=conditional)
+        cmi_array = cmi_estimator.estimate_mult(
+                    n_chunks=n_chunks, options=options,
+                    re_use=['var2', 'conditional'], var1=np.asarray(view),
+                    var2=var2, conditional=conditional)
+        assert np.allclose(cmi_view, cmi_array), (
+                'Estimates of {0} estimator on permuted realisations differ '
+                'from estimates on permuted arrays.'.format(name))
+        assert cmi_view[0] > max(cmi_view[1:]), (
+                'Estimate for original data should exceed surrogates.')
+
+
+if __name__ == '__main__':
+    test_permuted_realisations()
+    test_estimate_mult_permuted()
+    test_broadcast_realisations()
+    test_stacked_realisations()
+    test_view_dtype()
+    test_estimate_mult_re_use()
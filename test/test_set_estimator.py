@@ -9,11 +9,14 @@ Created on Fri Sep 30 14:39:06 2016
 @author: patricia
 """
 import math
+import pickle
 import random
 import numpy as np
 from idtxl.set_estimator import Estimator_te
 from idtxl.set_estimator import Estimator_cmi
 from idtxl.set_estimator import Estimator_mi
+from idtxl.set_estimator import _SharedArray
+from idtxl import set_estimator
 
 
 def test_estimators_correlated_gauss_data():
@@ -90,7 +93,77 @@ def test_estimator_change():
     assert mi_estimator_1.estimator_name == estimator_name_1, (
                 'The estimator was not set correctly')
 
+
+def test_estimate_mult_n_jobs():
+    """Test estimation of multiple chunks using worker processes."""
+    n_chunks = 8
+    chunk_size = 500
+    cmi_estimator = Estimator_cmi('jidt_kraskov')
+    var1 = np.random.randn(n_chunks * chunk_size, 1)
+    var2 = np.random.randn(chunk_size, 2)
+    conditional = np.random.randn(chunk_size, 1)
+    options = {'noise_level': 0, 'num_threads': 1}
+    cmi_serial = cmi_estimator.estimate_mult(
+                    n_chunks=n_chunks, options=options,
+                    re_use=['var2', 'conditional'], var1=var1, var2=var2,
+                    conditional=conditional)
+    options['n_jobs'] = 2
+    cmi_pool = cmi_estimator.estimate_mult(
+                    n_chunks=n_chunks, options=options,
+                    re_use=['var2', 'conditional'], var1=var1, var2=var2,
+                    conditional=conditional)
+    assert np.allclose(cmi_serial, cmi_pool), (
+                'Estimates using worker processes differ from serial run.')
+
+
+def test_estimate_mult_jobs():
+    """Test concurrent estimation of independent jobs."""
+    n_chunks = 5
+    chunk_size = 300
+    cmi_estimator = Estimator_cmi('kraskov')
+    var2 = np.random.randn(chunk_size, 1)
+    conditional = np.random.randn(chunk_size, 1)
+    jobs = [(n_chunks, seed, {'var1': np.random.randn(n_chunks * chunk_size,
+                                                      1)})
+            for seed in range(4)]
+    results = {}
+    for n_jobs in [1, 2]:
+        results[n_jobs] = [None] * len(jobs)
+        for (i, cmi) in cmi_estimator.estimate_mult_jobs(
+                    jobs, n_jobs, options={'noise_level': 1e-8},
+                    re_use=['var2', 'conditional'], var2=var2,
+                    conditional=conditional):
+            results[n_jobs][i] = cmi
+    for i in range(len(jobs)):
+        assert results[1][i].shape == (n_chunks,), 'Wrong no. estimates.'
+        assert np.array_equal(results[1][i], results[2][i]), (
+                'Concurrent estimates differ from serial run.')
+    cmi = cmi_estimator.estimate_mult(
+                    n_chunks=n_chunks,
+                    options={'noise_level': 1e-8, 'noise_seed': 0},
+                    re_use=['var2', 'conditional'], var1=jobs[0][2]['var1'],
+                    var2=var2, conditional=conditional)
+    assert np.array_equal(cmi, results[1][0]), 'Noise seed was not used.'
+    set_estimator.shutdown_pools()
+    assert not set_estimator._pools, 'Worker pools were not shut down.'
+
+
+def test_shared_array():
+    """Test the transport of re-used realisations in shared memory."""
+    data = np.random.rand(100, 3)
+    shared = _SharedArray.from_array(data)
+    descriptor = pickle.loads(pickle.dumps(shared.descriptor()))
+    view = descriptor.attach()
+    assert np.array_equal(view, data), 'Shared array does not match data.'
+    del view
+    descriptor.close()
+    shared.close(unlink=True)
+
+
 if __name__ == '__main__':
+    test_shared_array()
+    test_estimate_mult_jobs()
+    test_estimate_mult_n_jobs()
     test_estimator_change()
     test_estimators_correlated_gauss_data()
     test_estimators_uncorrelated_random_data()
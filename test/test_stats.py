@@ -4,6 +4,7 @@ Created on Fri Mar 25 13:46:09 2016
 
 @author: patricia
 """
+import copy as cp
 import pytest
 import numpy as np
 from idtxl import stats
@@ -122,6 +123,54 @@ def test_find_pvalue():
         stats._find_pvalue(test_val, distribution, alpha, tail='foo')
 
 
+def test_find_pvalues():
+    """Test batched p-values against individually computed p-values."""
+    table = np.random.rand(4, 200)
+    statistics = np.random.rand(4, 6) * 1.2
+    statistics[0, 0] = table[0, 10]  # ties with surrogate values
+    for tail in ['one', 'two']:
+        [s, p] = stats._find_pvalues(statistics, table, 0.05, tail)
+        [s_1d, p_1d] = stats._find_pvalues(statistics, table[0], 0.05, tail)
+        for i in range(statistics.shape[0]):
+            for j in range(statistics.shape[1]):
+                assert (s[i, j], p[i, j]) == stats._find_pvalue(
+                        statistics[i, j], table[i], 0.05, tail), (
+                                    'Batched p-value differs.')
+                assert (s_1d[i, j], p_1d[i, j]) == stats._find_pvalue(
+                        statistics[i, j], table[0], 0.05, tail), (
+                                    'Batched p-value differs.')
+
+
+def test_network_fdr_order():
+    """Test if FDR correction removes the links with the largest p-values."""
+    res = {}
+    pvalues = [0.04, 0.0001, 0.03, 0.0002]
+    for t in range(len(pvalues)):
+        res[t] = {'omnibus_sign': True,
+                  'omnibus_pval': pvalues[t],
+                  'selected_vars_sources': [(t + 1, 1), (t + 1, 2)],
+                  'selected_vars_target': [(t, 1)],
+                  'selected_vars_full': [(t, 1), (t + 1, 1), (t + 1, 2)],
+                  'cond_sources_pval': np.array([pvalues[t], 0.0001]),
+                  'cond_sources_te': np.array([0.1, 0.5])}
+    res_pruned = stats.network_fdr(cp.deepcopy(res), 0.05,
+                                   correct_by_target=True)
+    for t in range(len(pvalues)):
+        assert res_pruned[t]['omnibus_sign'] == (pvalues[t] < 0.01), (
+                                    'Wrong target removed.')
+    res_pruned = stats.network_fdr(cp.deepcopy(res), 0.05,
+                                   correct_by_target=False)
+    for t in range(len(pvalues)):
+        if pvalues[t] < 0.01:
+            assert res_pruned[t]['selected_vars_sources'] == [(t + 1, 1),
+                                                              (t + 1, 2)]
+        else:
+            assert res_pruned[t]['selected_vars_sources'] == [(t + 1, 2)]
+            assert res_pruned[t]['selected_vars_full'] == [(t, 1), (t + 1, 2)]
+            assert np.array_equal(res_pruned[t]['cond_sources_pval'],
+                                  [0.0001]), 'Wrong p-value removed.'
+
+
 def test_find_table_max():
     tab = np.array([[0, 2, 1], [3, 4, 5], [10, 8, 1]])
     res = stats._find_table_max(tab)
@@ -156,7 +205,310 @@ def test_sort_table_min():
                                                          'return maximum for '
                                                          'last row.')
 
+
+def test_permutation_index():
+    """Test batched permutation indices for surrogate creation."""
+    n_samples = 20
+    n_repl = 5
+    n_perm = 50
+    dat = Data(np.arange(n_samples * n_repl).reshape(1, n_samples, n_repl),
+               'psr', normalise=False)
+    current_value = (0, 4)
+    real = dat.get_realisations(current_value, [(0, 2)])[0]
+    n_per_repl = n_samples - current_value[1]
+
+    # Permutation over replications keeps the order of samples intact.
+    perm_idx = stats._permutation_index(dat, current_value, n_perm,
+                                        permute_replications=True,
+                                        rng=np.random.default_rng(1))
+    assert perm_idx.shape == (n_perm, real.shape[0]), 'Wrong index shape.'
+    surr = real[perm_idx.ravel(), :].reshape(n_perm, n_repl, n_per_repl)
+    assert (np.diff(surr, axis=2) == n_repl).all(), (
+                                    'Sample order changed within replication.')
+    assert (np.sort(perm_idx, axis=1) == np.arange(real.shape[0])).all(), (
+                                                'Index is not a permutation.')
+
+    # Permutation over samples keeps replications intact and permutes within
+    # the permutation range.
+    perm_range = 4
+    perm_idx = stats._permutation_index(dat, current_value, n_perm,
+                                        permute_replications=False,
+                                        perm_range=perm_range,
+                                        rng=np.random.default_rng(1))
+    repl = perm_idx // n_per_repl
+    assert (repl == np.repeat(np.arange(n_repl), n_per_repl)).all(), (
+                                    'Samples were permuted over replications.')
+    sample = perm_idx % n_per_repl
+    assert (sample // perm_range ==
+            np.tile(np.arange(n_per_repl) // perm_range, n_repl)).all(), (
+                                    'Samples were permuted over perm_range.')
+    assert (sample[:, :n_per_repl] == sample[:, n_per_repl:2 * n_per_repl]
+            ).all(), 'Replications were permuted differently.'
+    assert len(np.unique(sample[:, :n_per_repl], axis=0)) > 1, (
+                                    'Permutations are not random.')
+
+    # Identical seeds yield identical permutations.
+    perm_idx_2 = stats._permutation_index(dat, current_value, n_perm,
+                                          permute_replications=False,
+                                          perm_range=perm_range,
+                                          rng=np.random.default_rng(1))
+    assert (perm_idx == perm_idx_2).all(), 'Permutations are not seeded.'
+
+    # Circular shifts over samples, set via the analysis options.
+    perm_settings = stats._time_permutation_settings({'perm_type': 'circular',
+                                                      'max_shift': 3})
+    perm_idx = stats._permutation_index(dat, current_value, n_perm,
+                                        permute_replications=False,
+                                        **perm_settings)
+    sample = perm_idx % n_per_repl
+    shift = (np.arange(n_per_repl) - sample[:, :n_per_repl]) % n_per_repl
+    assert ((shift == shift[:, :1]).all() and (shift >= 1).all() and
+            (shift <= 3).all()), 'Wrong circular shift.'
+
+
+def test_plan_permutation_tests():
+    """Test the feasibility check of permutation tests."""
+    dat = Data()
+    dat.generate_mute_data(100, 4)  # 4! = 24 permutations of replications
+    current_value = (0, 5)
+    tests = {'max_stat': (21, 0.05), 'omnibus': (200, 0.05)}
+    plan = stats.plan_permutation_tests(dat, current_value, tests)
+    assert plan['max_stat']['permutation'] == 'replications', (
+                                    'Replications should be permuted.')
+    assert plan['max_stat']['n_available'] == 24, 'Wrong no. permutations.'
+    assert plan['omnibus']['permutation'] == 'local', (
+                                    'Samples should be permuted.')
+
+    # Too few circular shifts and too few permutations for alpha.
+    with pytest.raises(RuntimeError):
+        stats.plan_permutation_tests(dat, current_value, tests,
+                                     {'perm_type': 'circular',
+                                      'max_shift': 50})
+    with pytest.raises(RuntimeError):
+        stats.plan_permutation_tests(dat, current_value,
+                                     {'max_stat': (10, 0.05)})
+
+    # Analytic tests need no permutations.
+    plan = stats.plan_permutation_tests(dat, current_value,
+                                        {'max_stat': (10, 0.05)},
+                                        {'analytic_null': True})
+    assert plan['max_stat']['n_perm'] == 0, 'Analytic test uses surrogates.'
+
+
+def test_clopper_pearson():
+    """Test Clopper-Pearson intervals against known values."""
+    [lower, upper] = stats._clopper_pearson(0, 20, conf=0.95)
+    assert lower == 0, 'Lower bound for k=0 should be 0.'
+    assert np.isclose(upper, 1 - 0.025 ** (1 / 20)), 'Upper bound incorrect.'
+    [lower, upper] = stats._clopper_pearson(20, 20, conf=0.95)
+    assert upper == 1, 'Upper bound for k=n should be 1.'
+    assert np.isclose(lower, 0.025 ** (1 / 20)), 'Lower bound incorrect.'
+    [lower, upper] = stats._clopper_pearson(5, 50)
+    assert lower < 0.1 < upper, 'Interval does not contain the estimate.'
+    assert stats._ci_decision(10, 20, 0.05) is False, (
+                            'Obviously non-significant result not detected.')
+    assert stats._ci_decision(0, 200, 0.05) is True, (
+                            'Obviously significant result not detected.')
+    assert stats._ci_decision(1, 20, 0.05) is None, (
+                            'Undecided result not detected.')
+    # The error of an adaptive test is split over all checks.
+    assert np.isclose(stats._look_conf(0.99, 500, 20), 1 - 0.01 / 25), (
+                            'Error is not split over all checks.')
+    assert stats._look_conf(0.99, 10, 20) == 0.99, (
+                            'Confidence level of a single check changed.')
+
+
+def test_permutation_test_adaptive():
+    """Test early stopping of permutation tests."""
+    n_perm = 500
+    opts = {'adaptive_perm': True, 'adaptive_batch_size': 20}
+    n_calls = []
+
+    def create_table(n, first):
+        assert first == sum(n_calls), 'Wrong index of first surrogate.'
+        n_calls.append(n)
+        return np.random.rand(3, n)
+
+    # Non-significant statistic, testing should stop after the first batch.
+    [s, p, table, info] = stats._permutation_test(
+                0.5, create_table, stats._find_table_max, n_perm, 0.05, opts)
+    assert not s, 'Statistic should not be significant.'
+    assert info['decision'] == 'ci_not_significant', 'Wrong decision rule.'
+    assert info['n_perm'] == 20 and table.shape == (3, 20), (
+                                        'Wrong no. surrogates used.')
+    assert np.isclose(p, np.sum(table.max(axis=0) > 0.5) / 20), (
+                                        'Wrong p-value.')
+
+    # Significant statistic, testing should stop before n_perm.
+    n_calls.clear()
+    [s, p, table, info] = stats._permutation_test(
+                1.5, create_table, stats._find_table_max, n_perm, 0.05, opts)
+    assert s, 'Statistic should be significant.'
+    assert info['decision'] == 'ci_significant', 'Wrong decision rule.'
+    assert info['n_perm'] < n_perm, 'Testing did not stop early.'
+    assert sum(n_calls) == info['n_perm'] == table.shape[1], (
+                                        'Wrong no. surrogates used.')
+    assert p == 1 / info['n_perm'], 'Wrong p-value.'
+
+    # Non-adaptive testing uses all permutations.
+    n_calls.clear()
+    [s, p, table, info] = stats._permutation_test(
+                1.5, create_table, stats._find_table_max, n_perm, 0.05, {})
+    assert info == {'n_perm': n_perm, 'decision': 'fixed'}, (
+                                        'Wrong decision rule.')
+    assert s and p == 1 / n_perm, 'Wrong test result.'
+
+
+def test_surrogate_cache():
+    """Test re-use of surrogates for different cache policies."""
+    n_calls = []
+
+    def estimate(n, first):
+        n_calls.append((n, first))
+        return np.arange(first, first + n) + 0.5 * len(n_calls)
+
+    # Exact policy: re-use surrogates for identical signatures only.
+    cache = stats.Surrogate_cache('exact')
+    surr = cache.get((0, 1), 'a', 0, 10, estimate)
+    assert (cache.get((0, 1), 'a', 0, 10, estimate) == surr).all(), (
+                                        'Cached surrogates not re-used.')
+    assert len(n_calls) == 1 and cache.n_hits == 10, 'Cache was not hit.'
+    surr_ext = cache.get((0, 1), 'a', 5, 10, estimate)
+    assert n_calls[-1] == (5, 10), 'Table was not extended correctly.'
+    assert (surr_ext[:5] == surr[5:]).all(), 'Wrong surrogates returned.'
+    cache.get((0, 1), 'b', 0, 10, estimate)
+    assert n_calls[-1] == (10, 0), 'Surrogates re-used for new signature.'
+    assert cache.n_estimated == 25, 'Wrong no. estimated surrogates.'
+
+    # Re-use policy: re-use surrogates across signatures.
+    n_calls.clear()
+    cache = stats.Surrogate_cache('reuse')
+    surr = cache.get((0, 1), 'a', 0, 10, estimate)
+    assert (cache.get((0, 1), 'b', 0, 10, estimate) == surr).all(), (
+                                        'Surrogates not re-used.')
+    assert len(n_calls) == 1, 'Surrogates were re-estimated.'
+
+    # Refresh policy: re-estimate a fraction of surrogates in each round,
+    # round robin.
+    n_calls.clear()
+    cache = stats.Surrogate_cache('refresh', refresh_fraction=0.3)
+    surr = cache.get((0, 1), 'a', 0, 10, estimate)
+    surr_2 = cache.get((0, 1), 'b', 0, 10, estimate)
+    assert n_calls[-1] == (3, 0), 'Wrong surrogates refreshed.'
+    assert (surr_2[3:] == surr[3:]).all() and (surr_2[:3] != surr[:3]).all()
+    cache.get((0, 1), 'c', 0, 10, estimate)
+    assert n_calls[-1] == (3, 3), 'Wrong surrogates refreshed.'
+    cache.get((0, 1), 'd', 0, 10, estimate)
+    cache.get((0, 1), 'e', 0, 10, estimate)
+    assert n_calls[-2:] == [(1, 9), (2, 0)], 'Refresh did not wrap around.'
+
+    # Off: always estimate.
+    n_calls.clear()
+    cache = stats.Surrogate_cache('off')
+    cache.get((0, 1), 'a', 0, 10, estimate)
+    cache.get((0, 1), 'a', 0, 10, estimate)
+    assert len(n_calls) == 2 and cache.n_hits == 0, 'Cache was used.'
+
+    # Surrogates of a different scheme are never re-used.
+    n_calls.clear()
+    for policy in ['exact', 'reuse']:
+        cache = stats.Surrogate_cache(policy)
+        cache.get((0, 1), 'a', 0, 10, estimate, scheme=True)
+        cache.get((0, 1), 'a', 0, 20, estimate, scheme=False)
+        assert n_calls[-1] == (20, 0), 'Surrogates of another scheme re-used.'
+
+
+def test_surrogate_cache_permutation_type():
+    """Test min. and max. statistics with different permutation types."""
+    # With 5 replications, 21 surrogates are created by permuting
+    # replications, 500 surrogates by permuting samples.
+    dat = Data(np.random.randn(2, 100, 5), 'psr')
+    opts = {
+        'cmi_calc_name': 'gaussian',
+        'n_perm_min_stat': 21,
+        'n_perm_max_seq': 500,
+        }
+    setup = Multivariate_te(max_lag_sources=5, min_lag_sources=1,
+                            max_lag_target=5, options=opts)
+    setup.current_value = (0, 4)
+    setup.selected_vars_sources = [(1, 1), (1, 2)]
+    setup.selected_vars_full = [(0, 1), (1, 1), (1, 2)]
+    setup._selected_vars_realisations = dat.get_realisations(
+                            setup.current_value, setup.selected_vars_full)[0]
+    setup._current_value_realisations = dat.get_realisations(
+                            setup.current_value, [setup.current_value])[0]
+    setup._min_stats_surr_table = None
+    stats.min_statistic(setup, dat, setup.selected_vars_sources, 0.01, opts)
+    n_hits = setup._surr_cache.n_hits
+    stats.max_statistic_sequential(setup, dat, opts)
+    assert setup._surr_cache.n_hits == n_hits, (
+                'Surrogates permuting replications were extended by '
+                'surrogates permuting samples.')
+    assert setup._surr_cache.n_estimated == 2 * (21 + 500), (
+                'Wrong no. estimated surrogates.')
+
+
+def test_analytic_null():
+    """Test significance tests against analytic null distributions."""
+    n = 1000
+    opts = {'cmi_calc_name': 'gaussian', 'analytic_null': True}
+    nw = Multivariate_te(5, 1, 5, opts)
+    nw._current_value_realisations = np.random.randn(n, 1)
+    nw.selected_vars_full = [(0, 1)]
+    nw._selected_vars_realisations = np.random.randn(n, 1)
+
+    # P-values of independent variables are uniformly distributed.
+    pvalues = np.empty(200)
+    for i in range(pvalues.shape[0]):
+        mi = nw._cmi_calculator.estimate(
+                            np.random.randn(n, 1),
+                            nw._current_value_realisations, opts=opts)
+        pvalues[i] = stats._analytic_test(nw, mi, (1, 1, 0), 0.05)[1]
+    assert 0 < np.mean(pvalues < 0.05) < 0.12, (
+                                'Wrong false positive rate under the null.')
+    [s, p] = stats._analytic_test(nw, 0.05, (1, 1, 0), 0.05)
+    assert s and p < 1e-10, 'Dependent variables not significant.'
+
+    # Order statistics: maximum and minimum of 10 independent estimates.
+    p_single = stats._analytic_test(nw, 0.002, (1, 1, 1), 0.05)[1]
+    p_max = stats._analytic_test(nw, 0.002, (1, 1, 1), 0.05, rank=1,
+                                 n_tests=10)[1]
+    p_min = stats._analytic_test(nw, 0.002, (1, 1, 1), 0.05, rank=10,
+                                 n_tests=10)[1]
+    assert np.isclose(p_max, 1 - (1 - p_single) ** 10), 'Wrong max. p-value.'
+    assert np.isclose(p_min, p_single ** 10), 'Wrong min. p-value.'
+
+    # Tests run without surrogates.
+    [s, p, table] = stats.max_statistic(nw, None, [(0, 2), (0, 3)], 0.05,
+                                        opts)
+    assert s and table is None, 'Max. statistic not tested analytically.'
+    assert nw._perm_tests[-1]['decision'] == 'analytic', 'Test not logged.'
+    [mi, s, p] = stats.mi_against_surrogates(nw, None)
+    assert np.isclose(p, stats._analytic_test(nw, mi, (1, 1, 0), 0.05)[1])
+
+    # Discrete estimates are given in bits, degrees of freedom depend on the
+    # alphabet sizes.
+    nw._cmi_calculator = Multivariate_te(
+                5, 1, 5, {'cmi_calc_name': 'discrete'})._cmi_calculator
+    nw.options = {'num_discrete_bins': 3}
+    p = stats._analytic_test(nw, 0.01, (1, 1, 2), 0.05)[1]
+    assert np.isclose(p, stats.chi2.sf(2 * n * 0.01 * np.log(2), 2 * 2 * 9))
+    nw._cmi_calculator = Multivariate_te(
+                5, 1, 5, {'cmi_calc_name': 'kraskov'})._cmi_calculator
+    with pytest.raises(RuntimeError):
+        stats._analytic_test(nw, 0.01, (1, 1, 0), 0.05)
+
+
 if __name__ == '__main__':
+    test_find_pvalues()
+    test_network_fdr_order()
+    test_analytic_null()
+    test_plan_permutation_tests()
+    test_surrogate_cache()
+    test_surrogate_cache_permutation_type()
+    test_clopper_pearson()
+    test_permutation_test_adaptive()
+    test_permutation_index()
     test_network_fdr()
     test_find_pvalue()
     test_find_table_max()
@@ -18,7 +18,17 @@ def test_swap_blocks():
     block_size = 5
     swap_range = 3
     surr = surrogates._swap_blocks(n, block_size, swap_range)
-    assert (sum(surr == 0) == block_size), ('Incorrect block size.')
+    assert (np.sort(surr) == np.arange(n)).all(), 'Index is not a permutation.'
+    blocks = surr.reshape(n // block_size, block_size)
+    assert (np.diff(blocks, axis=1) == 1).all(), ('Incorrect block size.')
+    assert (np.abs(blocks[:, 0] // block_size - np.arange(n // block_size)) <
+            swap_range).all(), 'Blocks were swapped over swap_range.'
+
+    # The last block is shorter if n is not a multiple of block_size.
+    surr = surrogates._swap_blocks(n + 2, block_size, swap_range, n_perm=10)
+    assert surr.shape == (10, n + 2), 'Wrong no. permutations.'
+    assert (np.sort(surr, axis=1) == np.arange(n + 2)).all(), (
+                                                'Index is not a permutation.')
 
 
 def test_circular_shift():
@@ -30,11 +40,60 @@ def test_circular_shift():
 
 
 def test_swap_local():
-    pass
+    """Test swapping of samples within a permutation range."""
+    n = 50
+    perm_range = 7
+    surr = surrogates._swap_local(n, perm_range, n_perm=20)
+    assert (surr // perm_range == np.arange(n) // perm_range).all(), (
+                                    'Samples were permuted over perm_range.')
+    assert len(np.unique(surr, axis=0)) > 1, 'Permutations are not random.'
+
+
+def test_permute_over_time():
+    """Test application of one permutation to all replications."""
+    n_repl = 4
+    n = 10
+    realisations = np.arange(n_repl * n * 2).reshape(n_repl * n, 2)
+    replication_idx = np.repeat(np.arange(n_repl), n)
+    for (perm_type, kwargs) in [('random', {}),
+                                ('local', {'perm_range': 3}),
+                                ('blocks', {'block_size': 3}),
+                                ('circular', {'max_shift': 4})]:
+        surr = surrogates.permute_over_time(realisations, replication_idx,
+                                            perm_type, rng=1, **kwargs)
+        perm = surrogates.time_permutation_index(n, None, perm_type, rng=1,
+                                                 **kwargs)
+        for r in range(n_repl):
+            repl = realisations[replication_idx == r]
+            assert (surr[replication_idx == r] == repl[perm]).all(), (
+                    'Wrong permutation for type {0}.'.format(perm_type))
+
+    # Permuting replications keeps the order of samples intact.
+    surr = surrogates.permute_over_replications(realisations, replication_idx)
+    assert (np.sort(surr[::n, 0]) == realisations[::n, 0]).all(), (
+                                            'Replications were not permuted.')
+    assert (np.diff(surr[:, 0].reshape(n_repl, n), axis=1) == 2).all(), (
+                                    'Sample order changed within replication.')
+
+
+def test_n_permutations():
+    """Test counting of permutations over time."""
+    assert surrogates.n_permutations(5) == 120, 'Wrong no. permutations.'
+    assert surrogates.n_permutations(7, 'local', perm_range=3) == 36, (
+                                    'Wrong no. local permutations.')
+    assert surrogates.n_permutations(10, 'blocks', block_size=3) == 24, (
+                                    'Wrong no. block permutations.')
+    assert surrogates.n_permutations(10, 'circular', max_shift=4) == 5, (
+                                    'Wrong no. circular shifts.')
+    # Counting stops above the limit.
+    assert 100 < surrogates.n_permutations(10 ** 6, limit=100) <= 1000, (
+                                    'Counting did not stop at the limit.')
 
 
 if __name__ == '__main__':
     test_swap_blocks()
     test_circular_shift()
     test_swap_local()
+    test_permute_over_time()
+    test_n_permutations()
     test_create_surrogates()